@@ -3,73 +3,236 @@ import threading
 from typing import Dict, Any, Optional
 import uuid
 
+from app.analysis_store import (
+    AnalysisStore,
+    create_analysis_store,
+    discard_pdf,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_DONE,
+    JOB_FAILED
+)
+from app.config import (
+    ANALYSIS_CACHE_BACKEND,
+    ANALYSIS_CACHE_DIR,
+    ANALYSIS_CACHE_REDIS_URL,
+    ANALYSIS_CACHE_REDIS_PREFIX,
+    ANALYSIS_CACHE_TTL_SECONDS,
+    ANALYSIS_CACHE_MAX_BYTES,
+    ANALYSIS_CACHE_MAX_ENTRIES
+)
+from app.document_io import PdfSource
+from app.progress import STAGES
+
 # ---------------------------------------
 # Config
 # ---------------------------------------
 
-DEFAULT_TTL_SECONDS = 15 * 60  # 15 minutes
+DEFAULT_TTL_SECONDS = ANALYSIS_CACHE_TTL_SECONDS
 
 # ---------------------------------------
-# In-memory cache
+# Backend
 # ---------------------------------------
+#
+# Entries live in an AnalysisStore (app/analysis_store.py) chosen by
+# ANALYSIS_CACHE_BACKEND: "memory" is per process, "disk" is shared by
+# the workers on one host and "redis" by workers on any host.
+
+_store: Optional[AnalysisStore] = None
+_STORE_LOCK = threading.Lock()
 
-_ANALYSIS_CACHE: Dict[str, Dict[str, Any]] = {}
+# PDFs of jobs still running in this process. The job reads the spooled
+# file directly; it is handed to the store once the job completes.
+_JOB_PDFS: Dict[str, str] = {}
 _LOCK = threading.Lock()
 
+
+def get_store() -> AnalysisStore:
+    global _store
+    with _STORE_LOCK:
+        if _store is None:
+            _store = create_analysis_store(
+                ANALYSIS_CACHE_BACKEND,
+                ANALYSIS_CACHE_MAX_BYTES,
+                ANALYSIS_CACHE_MAX_ENTRIES,
+                directory=ANALYSIS_CACHE_DIR,
+                redis_url=ANALYSIS_CACHE_REDIS_URL,
+                redis_prefix=ANALYSIS_CACHE_REDIS_PREFIX
+            )
+        return _store
+
+
+def set_store(store: AnalysisStore) -> None:
+    """Use `store` instead of the configured backend."""
+    global _store
+    with _STORE_LOCK:
+        _store = store
+
+
+def _take_job_pdf(analysis_id: str) -> Optional[str]:
+    with _LOCK:
+        return _JOB_PDFS.pop(analysis_id, None)
+
 # ---------------------------------------
 # Public API
 # ---------------------------------------
+#
+# Entries hold the uploaded PDF (see main._spool_pdf_upload). The cache
+# owns that file from then on and deletes it with the entry.
 
 def create_analysis_entry(
-    pdf_bytes: bytes,
+    pdf_path: str,
     analysis_result: Dict[str, Any],
     ttl_seconds: int = DEFAULT_TTL_SECONDS
 ) -> str:
     """
     Store analysis result and return analysis_id.
+    Takes ownership of the PDF file at `pdf_path`.
     """
     analysis_id = str(uuid.uuid4())
     expires_at = time.time() + ttl_seconds
 
-    with _LOCK:
-        _ANALYSIS_CACHE[analysis_id] = {
-            "pdf_bytes": pdf_bytes,
+    get_store().put(
+        analysis_id,
+        {
             "result": analysis_result,
+            "status": JOB_DONE,
             "expires_at": expires_at
-        }
+        },
+        pdf_path=pdf_path
+    )
 
     return analysis_id
 
 
-def get_analysis_entry(analysis_id: str) -> Optional[Dict[str, Any]]:
+# ---------------------------------------
+# Background jobs
+# ---------------------------------------
+
+def create_job_entry(
+    pdf_path: str,
+    ttl_seconds: int = DEFAULT_TTL_SECONDS
+) -> str:
     """
-    Retrieve cached analysis if valid.
+    Register a queued analysis job and return its analysis_id.
+    The entry becomes a regular analysis entry once the job completes.
+    Takes ownership of the PDF file at `pdf_path`.
     """
+    analysis_id = str(uuid.uuid4())
     now = time.time()
 
     with _LOCK:
-        entry = _ANALYSIS_CACHE.get(analysis_id)
-        if not entry:
-            return None
+        _JOB_PDFS[analysis_id] = pdf_path
+
+    get_store().put(
+        analysis_id,
+        {
+            "result": None,
+            "status": JOB_QUEUED,
+            "stage": None,
+            "stages": {stage: "pending" for stage in STAGES},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "ttl_seconds": ttl_seconds,
+            "expires_at": now + ttl_seconds
+        }
+    )
+
+    return analysis_id
+
+
+def update_job_stage(analysis_id: str, stage: str, stage_status: str) -> None:
+    """Record pipeline progress (stage -> "running" / "done")."""
+    def _update(entry):
+        if entry["status"] in (JOB_DONE, JOB_FAILED):
+            return
+        entry["status"] = JOB_RUNNING
+        entry["stage"] = stage
+        entry["stages"][stage] = stage_status
+        entry["updated_at"] = time.time()
+        # a job that is still making progress must not expire mid-run
+        entry["expires_at"] = entry["updated_at"] + entry["ttl_seconds"]
+
+    get_store().update(analysis_id, _update)
 
-        if entry["expires_at"] < now:
-            # expired → cleanup
-            del _ANALYSIS_CACHE[analysis_id]
-            return None
 
-        return entry
+def complete_job(analysis_id: str, analysis_result: Dict[str, Any]) -> None:
+    """Store the result; the TTL restarts so clients have time to fetch it."""
+    now = time.time()
+
+    def _update(entry):
+        entry["result"] = analysis_result
+        entry["status"] = JOB_DONE
+        entry["stage"] = None
+        entry["stages"] = {stage: "done" for stage in STAGES}
+        entry["updated_at"] = now
+        entry["expires_at"] = now + entry["ttl_seconds"]
+
+    get_store().update(analysis_id, _update, pdf_path=_take_job_pdf(analysis_id))
+
+
+def fail_job(analysis_id: str, error: str) -> None:
+    now = time.time()
+    discard_pdf(_take_job_pdf(analysis_id))
 
+    def _update(entry):
+        entry["status"] = JOB_FAILED
+        entry["error"] = error
+        entry["updated_at"] = now
+        entry["expires_at"] = now + entry["ttl_seconds"]
 
-def cleanup_expired_entries() -> None:
+    get_store().update(analysis_id, _update)
+
+
+def get_analysis_entry(analysis_id: str) -> Optional[Dict[str, Any]]:
     """
-    Optional manual cleanup (can be called periodically).
+    Retrieve cached analysis if valid and mark it most recently used.
     """
-    now = time.time()
+    return get_store().get(analysis_id)
+
+
+def get_analysis_pdf(analysis_id: str) -> Optional[PdfSource]:
+    """A copy of the uploaded PDF of a finished analysis."""
+    return get_store().pdf(analysis_id)
+
+
+def get_job_status(analysis_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Snapshot of a job's status fields (no PDF or result payload).
+    """
+    entry = get_analysis_entry(analysis_id)
+    if not entry:
+        return None
+
+    return {
+        "analysis_id": analysis_id,
+        "status": entry["status"],
+        "stage": entry.get("stage"),
+        "stages": dict(entry.get("stages") or {stage: "done" for stage in STAGES}),
+        "error": entry.get("error"),
+        "created_at": entry.get("created_at"),
+        "updated_at": entry.get("updated_at")
+    }
+
+
+def delete_analysis_entry(analysis_id: str) -> None:
+    discard_pdf(_take_job_pdf(analysis_id))
+    get_store().delete(analysis_id)
+
+
+def cleanup_expired_entries() -> int:
+    """
+    Drop expired entries and enforce the size budget.
+    Run periodically by the sweeper in the app lifespan.
+    Returns the number of entries removed.
+    """
+    return get_store().cleanup()
+
 
+def cache_stats() -> Dict[str, Any]:
+    """Gauges and counters for /metrics."""
+    stats = get_store().stats()
     with _LOCK:
-        expired_keys = [
-            k for k, v in _ANALYSIS_CACHE.items()
-            if v["expires_at"] < now
-        ]
-        for k in expired_keys:
-            del _ANALYSIS_CACHE[k]
+        stats["running_job_pdfs"] = len(_JOB_PDFS)
+    return stats
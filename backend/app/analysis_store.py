@@ -0,0 +1,657 @@
+# app/analysis_store.py
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.document_io import PdfSource
+from app.exceptions import ConfigurationError
+
+logger = logging.getLogger(__name__)
+
+# Job status values
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+EntryUpdate = Callable[[Dict[str, Any]], None]
+
+
+def discard_pdf(pdf_path: Optional[str]) -> None:
+    """Delete a spooled PDF, ignoring files that are already gone."""
+    if not pdf_path:
+        return
+    try:
+        os.remove(pdf_path)
+    except FileNotFoundError:
+        pass
+
+
+def _is_active(entry: Dict[str, Any]) -> bool:
+    # a queued / running job may still be written by its worker
+    return entry["status"] in (JOB_QUEUED, JOB_RUNNING)
+
+
+def _is_expired(entry: Dict[str, Any], now: float) -> bool:
+    """
+    Past its TTL and finished. Queued and running jobs never expire, or a
+    job that waits or runs longer than the TTL would lose its entry (and
+    its result) before completing; its TTL restarts when it finishes.
+    """
+    return not _is_active(entry) and entry["expires_at"] < now
+
+
+def _estimate_result_bytes(result: Optional[Dict[str, Any]]) -> int:
+    """
+    Size of the result as serialized JSON. The live objects take a few
+    times more, but the ratio is stable enough for a budget.
+    """
+    if result is None:
+        return 0
+    return len(json.dumps(result, default=str))
+
+
+def _file_size(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _read_pdf(path: str) -> Optional[bytes]:
+    """
+    A copy of a stored PDF, or None if it was removed first. Readers get
+    the bytes rather than the path, so an eviction or blob collection
+    right after the lookup can't delete the file under them.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AnalysisStore:
+    """
+    Where analysis entries and their PDFs live.
+
+    An entry is a JSON-serializable dict (status, result, job progress,
+    "expires_at"). `put` / `update` may hand over a spooled PDF, which the
+    store then owns and deletes when it no longer needs it. `pdf` returns
+    a copy of the PDF's bytes, which stays valid after the entry is gone.
+    """
+
+    name = "base"
+
+    def put(self, analysis_id: str, entry: Dict[str, Any], pdf_path: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, analysis_id: str, fn: EntryUpdate, pdf_path: Optional[str] = None) -> bool:
+        """Apply `fn` to the stored entry in place. False if it is gone."""
+        raise NotImplementedError
+
+    def delete(self, analysis_id: str) -> None:
+        raise NotImplementedError
+
+    def pdf(self, analysis_id: str) -> Optional[PdfSource]:
+        raise NotImplementedError
+
+    def cleanup(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# ---------------------------------------
+# In-process memory
+# ---------------------------------------
+
+class MemoryAnalysisStore(AnalysisStore):
+    """
+    Process-local LRU. Every entry carries the bytes it holds
+    ("result_bytes" in memory, "pdf_bytes" on disk) so the store can stay
+    within `max_bytes` / `max_entries`; finished entries are evicted least
+    recently used first.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_held = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---- accounting (caller holds _lock) ----
+
+    def _set_sizes(self, entry: Dict[str, Any], result_bytes: int, pdf_bytes: int) -> None:
+        self._bytes_held += (result_bytes + pdf_bytes) - (entry.get("result_bytes", 0) + entry.get("pdf_bytes", 0))
+        entry["result_bytes"] = result_bytes
+        entry["pdf_bytes"] = pdf_bytes
+
+    def _pop(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.pop(analysis_id, None)
+        if entry:
+            self._bytes_held -= entry["result_bytes"] + entry["pdf_bytes"]
+        return entry
+
+    def _evict_over_budget(self, keep: str) -> List[Dict[str, Any]]:
+        """
+        Pop least recently used finished entries until within budget.
+        `keep` is the entry just stored; it is never evicted, so the
+        caller's analysis_id stays valid.
+        """
+        evicted = []
+        for analysis_id in list(self._entries):
+            if self._bytes_held <= self.max_bytes and len(self._entries) <= self.max_entries:
+                break
+            if analysis_id == keep or _is_active(self._entries[analysis_id]):
+                continue
+            evicted.append(self._pop(analysis_id))
+        self.evictions += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _discard(entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            discard_pdf(entry.get("pdf_path"))
+
+    # ---- AnalysisStore ----
+
+    def put(self, analysis_id, entry, pdf_path=None):
+        result_bytes = _estimate_result_bytes(entry.get("result"))
+        pdf_bytes = _file_size(pdf_path)
+        with self._lock:
+            old = self._pop(analysis_id)
+            entry["pdf_path"] = pdf_path
+            self._set_sizes(entry, result_bytes, pdf_bytes)
+            self._entries[analysis_id] = entry
+            evicted = self._evict_over_budget(keep=analysis_id)
+        if old and old.get("pdf_path") != pdf_path:
+            evicted.append(old)
+        self._discard(evicted)
+
+    def get(self, analysis_id):
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if not entry:
+                return None
+            if _is_expired(entry, time.time()):
+                self._pop(analysis_id)
+                self.expirations += 1
+            else:
+                self._entries.move_to_end(analysis_id)
+                return entry
+        discard_pdf(entry.get("pdf_path"))
+        return None
+
+    def update(self, analysis_id, fn, pdf_path=None):
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry:
+                fn(entry)
+                old_pdf = entry.get("pdf_path")
+                if pdf_path is not None:
+                    entry["pdf_path"] = pdf_path
+                self._set_sizes(
+                    entry,
+                    _estimate_result_bytes(entry.get("result")),
+                    _file_size(entry["pdf_path"]) if pdf_path is not None else entry["pdf_bytes"]
+                )
+                self._entries.move_to_end(analysis_id)
+                evicted = self._evict_over_budget(keep=analysis_id)
+        if not entry:
+            discard_pdf(pdf_path)
+            return False
+        if pdf_path is not None and old_pdf != pdf_path:
+            discard_pdf(old_pdf)
+        self._discard(evicted)
+        return True
+
+    def delete(self, analysis_id):
+        with self._lock:
+            entry = self._pop(analysis_id)
+        if entry:
+            discard_pdf(entry.get("pdf_path"))
+
+    def pdf(self, analysis_id):
+        entry = self.get(analysis_id)
+        if not entry or not entry.get("pdf_path"):
+            return None
+        return _read_pdf(entry["pdf_path"])
+
+    def cleanup(self):
+        now = time.time()
+        with self._lock:
+            expired = [k for k, v in self._entries.items() if _is_expired(v, now)]
+            removed = [self._pop(k) for k in expired]
+            self.expirations += len(removed)
+            evicted = self._evict_over_budget(keep="")
+        self._discard(removed + evicted)
+        return len(removed) + len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "active_jobs": sum(1 for e in self._entries.values() if _is_active(e)),
+                "bytes": self._bytes_held,
+                "result_bytes": sum(e["result_bytes"] for e in self._entries.values()),
+                "pdf_bytes": sum(e["pdf_bytes"] for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+# ---------------------------------------
+# Local disk (shared by workers on one host)
+# ---------------------------------------
+
+# LRU order on disk is kept to this granularity, so that most reads
+# don't need a write
+_TOUCH_INTERVAL_SECONDS = 60
+
+
+class DiskAnalysisStore(AnalysisStore):
+    """
+    Entries in a SQLite index, PDFs as content-addressed blobs:
+
+        <dir>/index.sqlite
+        <dir>/blobs/<sha[:2]>/<sha256>.pdf
+
+    Every uvicorn worker on the host opens the same directory, so an
+    analysis stored by one worker can be highlighted by another. Blobs are
+    shared by entries with the same PDF and removed with the last one.
+    File moves and deletes happen inside the SQLite write transaction, so
+    concurrent workers never remove a blob another one is adding. Reads
+    don't take that lock: WAL lets them run alongside a writer, and
+    last_access is refreshed at most every _TOUCH_INTERVAL_SECONDS.
+    """
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._blob_dir = os.path.join(directory, "blobs")
+        os.makedirs(self._blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+            isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " analysis_id TEXT PRIMARY KEY,"
+            " entry TEXT NOT NULL,"
+            " active INTEGER NOT NULL,"
+            " pdf_sha TEXT,"
+            " result_bytes INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_lru ON analyses (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_pdf ON analyses (pdf_sha)")
+        self.evictions = 0
+        self.expirations = 0
+        logger.info(f"Analysis cache stored in {directory}")
+
+    # ---- blobs (caller holds the write transaction) ----
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self._blob_dir, sha[:2], f"{sha}.pdf")
+
+    def _adopt_pdf(self, pdf_path: str, sha: str) -> None:
+        target = self._blob_path(sha)
+        if os.path.exists(target):
+            discard_pdf(pdf_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(pdf_path, target)
+        self._db.execute(
+            "INSERT OR IGNORE INTO blobs (sha, size) VALUES (?, ?)",
+            (sha, _file_size(target))
+        )
+
+    def _collect_blobs(self) -> None:
+        orphans = self._db.execute(
+            "SELECT sha FROM blobs WHERE sha NOT IN "
+            "(SELECT pdf_sha FROM analyses WHERE pdf_sha IS NOT NULL)"
+        ).fetchall()
+        for (sha,) in orphans:
+            discard_pdf(self._blob_path(sha))
+            self._db.execute("DELETE FROM blobs WHERE sha = ?", (sha,))
+
+    def _bytes_held(self) -> int:
+        (result_bytes,) = self._db.execute("SELECT COALESCE(SUM(result_bytes), 0) FROM analyses").fetchone()
+        (blob_bytes,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return result_bytes + blob_bytes
+
+    def _evict_over_budget(self, keep: str) -> None:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        held = self._bytes_held()
+        if held <= self.max_bytes and count <= self.max_entries:
+            return
+        candidates = self._db.execute(
+            "SELECT a.analysis_id, a.result_bytes, a.pdf_sha, b.size FROM analyses a "
+            "LEFT JOIN blobs b ON b.sha = a.pdf_sha "
+            "WHERE a.active = 0 AND a.analysis_id != ? ORDER BY a.last_access",
+            (keep,)
+        ).fetchall()
+        evicted = []
+        for analysis_id, result_bytes, sha, size in candidates:
+            if held <= self.max_bytes and count <= self.max_entries:
+                break
+            evicted.append(analysis_id)
+            count -= 1
+            # a shared blob only frees space with its last entry; close enough
+            held -= result_bytes + (size or 0)
+        self._db.executemany("DELETE FROM analyses WHERE analysis_id = ?", [(k,) for k in evicted])
+        self.evictions += len(evicted)
+
+    def _write(self, analysis_id: str, entry: Dict[str, Any], pdf_sha: Optional[str]) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO analyses "
+            "(analysis_id, entry, active, pdf_sha, result_bytes, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                analysis_id,
+                json.dumps(entry),
+                int(_is_active(entry)),
+                pdf_sha,
+                _estimate_result_bytes(entry.get("result")),
+                entry["expires_at"],
+                time.time()
+            )
+        )
+
+    def _transaction(self, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return out
+
+    # ---- AnalysisStore ----
+
+    def put(self, analysis_id, entry, pdf_path=None):
+        sha = _sha256_file(pdf_path) if pdf_path else None
+
+        def _put():
+            if pdf_path:
+                self._adopt_pdf(pdf_path, sha)
+            self._write(analysis_id, entry, sha)
+            self._evict_over_budget(keep=analysis_id)
+            self._collect_blobs()
+
+        self._transaction(_put)
+
+    def _read(self, analysis_id: str, columns: str) -> Optional[tuple]:
+        """
+        Columns of a live entry, read without the write lock. An expired
+        entry is removed (a rare write) and reads as missing; active jobs
+        don't expire (see _is_expired).
+        """
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT expires_at, last_access, active, {columns} FROM analyses WHERE analysis_id = ?",
+                (analysis_id,)
+            ).fetchone()
+        if not row:
+            return None
+        now = time.time()
+        if not row[2] and row[0] < now:
+            self._transaction(lambda: self._expire(analysis_id, now))
+            return None
+        if now - row[1] > _TOUCH_INTERVAL_SECONDS:
+            with self._lock:
+                self._db.execute(
+                    "UPDATE analyses SET last_access = ? WHERE analysis_id = ?", (now, analysis_id)
+                )
+        return row[3:]
+
+    def _expire(self, analysis_id: str, now: float) -> None:
+        # another worker may have refreshed or removed it since the read
+        removed = self._db.execute(
+            "DELETE FROM analyses WHERE analysis_id = ? AND active = 0 AND expires_at < ?",
+            (analysis_id, now)
+        ).rowcount
+        if removed:
+            self._collect_blobs()
+            self.expirations += 1
+
+    def get(self, analysis_id):
+        row = self._read(analysis_id, "entry")
+        return json.loads(row[0]) if row else None
+
+    def update(self, analysis_id, fn, pdf_path=None):
+        sha = _sha256_file(pdf_path) if pdf_path else None
+
+        def _update():
+            row = self._db.execute(
+                "SELECT entry, pdf_sha FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone()
+            if not row:
+                return False
+            entry = json.loads(row[0])
+            fn(entry)
+            if pdf_path:
+                self._adopt_pdf(pdf_path, sha)
+            self._write(analysis_id, entry, sha if pdf_path else row[1])
+            self._evict_over_budget(keep=analysis_id)
+            self._collect_blobs()
+            return True
+
+        found = self._transaction(_update)
+        if not found:
+            discard_pdf(pdf_path)
+        return found
+
+    def delete(self, analysis_id):
+        def _delete():
+            self._db.execute("DELETE FROM analyses WHERE analysis_id = ?", (analysis_id,))
+            self._collect_blobs()
+
+        self._transaction(_delete)
+
+    def pdf(self, analysis_id):
+        row = self._read(analysis_id, "pdf_sha")
+        if not row or not row[0]:
+            return None
+        # once open, the copy survives another worker collecting the blob
+        return _read_pdf(self._blob_path(row[0]))
+
+    def cleanup(self):
+        def _cleanup():
+            now = time.time()
+            removed = self._db.execute(
+                "DELETE FROM analyses WHERE active = 0 AND expires_at < ?", (now,)
+            ).rowcount
+            self.expirations += removed
+            before = self.evictions
+            self._evict_over_budget(keep="")
+            self._collect_blobs()
+            return removed + self.evictions - before
+
+        return self._transaction(_cleanup)
+
+    def stats(self):
+        with self._lock:
+            (entries, active, result_bytes) = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(active), 0), COALESCE(SUM(result_bytes), 0) FROM analyses"
+            ).fetchone()
+            (blobs, pdf_bytes) = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        return {
+            "backend": self.name,
+            "entries": entries,
+            "active_jobs": active,
+            "bytes": result_bytes + pdf_bytes,
+            "result_bytes": result_bytes,
+            "pdf_bytes": pdf_bytes,
+            "pdf_blobs": blobs,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+# ---------------------------------------
+# Redis (shared across hosts)
+# ---------------------------------------
+
+class RedisAnalysisStore(AnalysisStore):
+    """
+    Entries and PDFs in Redis, for workers spread over several hosts:
+
+        <prefix>entry:<analysis_id>   JSON entry
+        <prefix>pdf:<sha256>          PDF bytes, shared by identical uploads
+
+    Both keys expire with the entry (a job's only once it finishes), so
+    Redis does the cleanup; size is bounded by the server's maxmemory
+    policy. `client` may be any object with the redis-py get / set /
+    delete / scan_iter methods, which lets a local stand-in replace a
+    server. A job's entry is only written by the worker running it, so
+    updates are plain read-modify-write.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ConfigurationError(
+                    "ANALYSIS_CACHE_BACKEND=redis requires the 'redis' package"
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        logger.info(f"Analysis cache stored in Redis ({prefix}*)")
+
+    def _entry_key(self, analysis_id: str) -> str:
+        return f"{self.prefix}entry:{analysis_id}"
+
+    def _pdf_key(self, sha: str) -> str:
+        return f"{self.prefix}pdf:{sha}"
+
+    @staticmethod
+    def _ttl(entry: Dict[str, Any]) -> int:
+        return max(1, math.ceil(entry["expires_at"] - time.time()))
+
+    def _store_pdf(self, entry: Dict[str, Any], pdf_path: str) -> None:
+        with open(pdf_path, "rb") as f:
+            data = f.read()
+        sha = hashlib.sha256(data).hexdigest()
+        self.client.set(self._pdf_key(sha), data, ex=self._ttl(entry))
+        entry["pdf_sha"] = sha
+        discard_pdf(pdf_path)
+
+    def _write(self, analysis_id: str, entry: Dict[str, Any]) -> None:
+        # an active job's key persists until the job's last update sets a TTL
+        ttl = None if _is_active(entry) else self._ttl(entry)
+        self.client.set(self._entry_key(analysis_id), json.dumps(entry), ex=ttl)
+
+    # ---- AnalysisStore ----
+
+    def put(self, analysis_id, entry, pdf_path=None):
+        if pdf_path:
+            self._store_pdf(entry, pdf_path)
+        self._write(analysis_id, entry)
+
+    def get(self, analysis_id):
+        raw = self.client.get(self._entry_key(analysis_id))
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        # key TTLs are whole seconds (at least one); expires_at is exact
+        return None if _is_expired(entry, time.time()) else entry
+
+    def update(self, analysis_id, fn, pdf_path=None):
+        entry = self.get(analysis_id)
+        if entry is None:
+            discard_pdf(pdf_path)
+            return False
+        fn(entry)
+        if pdf_path:
+            self._store_pdf(entry, pdf_path)
+        self._write(analysis_id, entry)
+        return True
+
+    def delete(self, analysis_id):
+        # the PDF key may be shared; it expires on its own
+        self.client.delete(self._entry_key(analysis_id))
+
+    def pdf(self, analysis_id):
+        entry = self.get(analysis_id)
+        if not entry or not entry.get("pdf_sha"):
+            return None
+        return self.client.get(self._pdf_key(entry["pdf_sha"]))
+
+    def stats(self):
+        entries = sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}entry:*"))
+        return {"backend": self.name, "entries": entries}
+
+
+def create_analysis_store(
+    kind: str,
+    max_bytes: int,
+    max_entries: int,
+    directory: str = "",
+    redis_url: str = "",
+    redis_prefix: str = "",
+    redis_client=None
+) -> AnalysisStore:
+    if kind == "memory":
+        return MemoryAnalysisStore(max_bytes, max_entries)
+    if kind == "disk":
+        return DiskAnalysisStore(directory, max_bytes, max_entries)
+    if kind == "redis":
+        return RedisAnalysisStore(redis_url, redis_prefix, client=redis_client)
+    raise ConfigurationError(
+        f"ANALYSIS_CACHE_BACKEND must be 'memory', 'disk' or 'redis', got {kind!r}"
+    )
@@ -0,0 +1,387 @@
+"""
+Offline build of the reference artifacts from a labeled clause corpus.
+
+Each build is published as a generation directory,
+<out>/generations/<generation>/, holding:
+    clauses.index     FAISS IndexFlatIP over [primary | CONTEXT:] vectors
+    primary_embs.npy  primary vectors used for identity scoring
+    metadata.jsonl    one {"label", "answer_text", "source_title"} per row
+    metadata_store/   columnar form of metadata.jsonl (app.metadata_store)
+    manifest.json     model name, dims, count, checksums, generation
+and then made current by atomically rewriting <out>/CURRENT to name it.
+The previous generation is kept for services still loading it; older
+ones are removed.
+
+The corpus is a JSONL file with one labeled clause per line. The clause
+text is read from "answer_text" (or "clause_text" / "text").
+
+Embedding is checkpointed in shards under <out>/.build/, so an interrupted
+build resumes where it stopped when re-run with the same corpus and model.
+
+With --append, the corpus is added to an existing build instead: only the
+new clauses are embedded, existing rows keep their index_id, and the
+manifest generation is bumped so a running service hot-swaps to it
+(see models.reload_reference_set).
+
+Usage (from backend/):
+    python -m app.build_index --corpus data/reference_corpus.jsonl --out FAISS
+    python -m app.build_index --corpus data/new_clauses.jsonl --out FAISS --append
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional
+
+import faiss
+import numpy as np
+
+from app import models
+from app.config import DEFAULT_FAISS_DIR, EMBED_MODEL_NAME
+from app.models import (
+    GENERATIONS_DIR,
+    CURRENT_NAME,
+    ArtifactPaths,
+    current_generation_dir,
+    file_sha256,
+    generation_paths,
+    read_manifest
+)
+from app.metadata_store import MetadataStore, normalize_label
+from app.scoring import _encode_sorted
+
+logger = logging.getLogger("build_index")
+
+PRIMARY_EMBS_STAGING = "primary_embs.npy.tmp"
+# Generations kept on disk: the current one and the one before it
+KEEP_GENERATIONS = 2
+
+_TEXT_KEYS = ("answer_text", "clause_text", "text")
+
+
+# ---------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------
+
+def write_json_atomic(path: str, payload: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def published_paths(out_dir: str) -> ArtifactPaths:
+    """Artifacts currently published in `out_dir` (its top level if no generation exists yet)."""
+    return generation_paths(current_generation_dir(out_dir) or out_dir)
+
+
+def normalize_record(row: Dict) -> Dict:
+    text = next((row[k] for k in _TEXT_KEYS if row.get(k)), "")
+    return {
+        "label": normalize_label(row.get("label", "")),
+        "answer_text": text,
+        "source_title": row.get("source_title") or ""
+    }
+
+
+def iter_corpus(path: str, skip: int = 0) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        n = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if n >= skip:
+                yield normalize_record(json.loads(line))
+            n += 1
+
+
+def embed_reference_texts(texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Dual embedding identical to scoring.embed_clause:
+    [primary | "CONTEXT:\\n" + text], each L2-normalized. Shape (n, 2d).
+    """
+    vecs = _encode_sorted(list(texts) + ["CONTEXT:\n" + t for t in texts], batch_size=batch_size)
+    n = len(texts)
+    return np.hstack([vecs[:n], vecs[n:]]).astype("float32")
+
+
+# ---------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------
+
+def _fsync_tree(directory: str):
+    for parent, _, names in os.walk(directory):
+        for name in names:
+            with open(os.path.join(parent, name), "rb") as f:
+                os.fsync(f.fileno())
+
+
+def _switch_current(out_dir: str, name: str):
+    """Point <out>/CURRENT at generation directory `name` with one rename."""
+    fd, tmp = tempfile.mkstemp(prefix=f".{CURRENT_NAME}.", dir=out_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(out_dir, CURRENT_NAME))
+
+
+def _prune_generations(out_dir: str, current: str):
+    root = os.path.join(out_dir, GENERATIONS_DIR)
+    older = sorted(name for name in os.listdir(root) if name < current)
+    for name in older[:max(len(older) - (KEEP_GENERATIONS - 1), 0)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def publish_artifacts(
+    out_dir: str,
+    index: faiss.Index,
+    primary_embs_path: str,
+    records: Iterator[Dict],
+    reference_id: str,
+    generation: int,
+    extra: Optional[Dict] = None
+) -> Dict:
+    """
+    Write index, metadata and manifest into a new generation directory,
+    move the already written primary_embs temp file next to them, then
+    repoint <out>/CURRENT at the directory.
+
+    Until that last rename, services keep loading the previous
+    generation; a crash before it leaves only an unreferenced directory,
+    which the next publish of the same generation replaces.
+    """
+    name = f"{generation:06d}"
+    gen_dir = os.path.join(out_dir, GENERATIONS_DIR, name)
+    shutil.rmtree(gen_dir, ignore_errors=True)
+    os.makedirs(gen_dir)
+    paths = generation_paths(gen_dir)
+
+    faiss.write_index(index, paths.faiss_index)
+
+    count = 0
+    with open(paths.metadata, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            count += 1
+
+    if count != index.ntotal:
+        raise RuntimeError(f"Metadata rows ({count}) do not match index size ({index.ntotal})")
+
+    os.replace(primary_embs_path, paths.primary_embs)
+
+    # The store records the stat of metadata.jsonl it was built from, so
+    # models.load_metadata_and_embeddings will not rebuild it.
+    MetadataStore.from_jsonl(paths.metadata, paths.metadata_store)
+
+    primary = np.load(paths.primary_embs, mmap_mode="r")
+    manifest = {
+        "model_name": EMBED_MODEL_NAME,
+        "dim": int(primary.shape[1]),
+        "index_dim": int(index.d),
+        "count": int(index.ntotal),
+        "reference_id": reference_id,
+        "generation": generation,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": {
+            os.path.basename(path): file_sha256(path)
+            for path in (paths.faiss_index, paths.primary_embs, paths.metadata)
+        }
+    }
+    manifest["checksum"] = hashlib.sha256(
+        json.dumps(manifest["files"], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    if extra:
+        manifest.update(extra)
+
+    write_json_atomic(paths.manifest, manifest)
+    _fsync_tree(gen_dir)
+
+    _switch_current(out_dir, os.path.join(GENERATIONS_DIR, name))
+    _prune_generations(out_dir, name)
+    return manifest
+
+
+# ---------------------------------------------------------
+# Build
+# ---------------------------------------------------------
+
+def build(corpus_path: str, out_dir: str, batch_size: int, shard_size: int) -> Dict:
+    os.makedirs(out_dir, exist_ok=True)
+    work_dir = os.path.join(out_dir, ".build")
+    progress_path = os.path.join(work_dir, "progress.json")
+
+    corpus_sha = file_sha256(corpus_path)
+    job = {"corpus_sha256": corpus_sha, "model_name": EMBED_MODEL_NAME}
+
+    progress = None
+    if os.path.exists(progress_path):
+        with open(progress_path, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+        if progress.get("job") != job:
+            logger.info("Checkpoint belongs to a different corpus/model; starting over")
+            progress = None
+    if progress is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        progress = {"job": job, "rows_done": 0, "shards": []}
+        write_json_atomic(progress_path, progress)
+    else:
+        logger.info(f"Resuming build after {progress['rows_done']} rows ({len(progress['shards'])} shards)")
+
+    # ---- 1. Embed in shards (checkpointed) ----
+    buf: List[str] = []
+
+    def _flush():
+        vecs = embed_reference_texts(buf, batch_size)
+        name = f"shard_{len(progress['shards']):05d}.npy"
+        tmp = os.path.join(work_dir, name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, vecs)
+        os.replace(tmp, os.path.join(work_dir, name))
+        progress["shards"].append({"name": name, "rows": len(buf)})
+        progress["rows_done"] += len(buf)
+        write_json_atomic(progress_path, progress)
+        logger.info(f"Embedded {progress['rows_done']} rows")
+        buf.clear()
+
+    for rec in iter_corpus(corpus_path, skip=progress["rows_done"]):
+        buf.append(rec["answer_text"])
+        if len(buf) >= shard_size:
+            _flush()
+    if buf:
+        _flush()
+
+    total = progress["rows_done"]
+    if total == 0:
+        raise ValueError(f"Corpus {corpus_path} has no records")
+
+    # ---- 2. Assemble index + primary_embs from shards ----
+    first = np.load(os.path.join(work_dir, progress["shards"][0]["name"]), mmap_mode="r")
+    index_dim = first.shape[1]
+    dim = index_dim // 2
+
+    index = faiss.IndexFlatIP(index_dim)
+    embs_tmp = os.path.join(out_dir, PRIMARY_EMBS_STAGING)
+    primary = np.lib.format.open_memmap(embs_tmp, mode="w+", dtype="float32", shape=(total, dim))
+
+    row = 0
+    for shard in progress["shards"]:
+        vecs = np.load(os.path.join(work_dir, shard["name"]))
+        index.add(vecs)
+        primary[row:row + len(vecs)] = vecs[:, :dim]
+        row += len(vecs)
+    primary.flush()
+    del primary
+
+    # ---- 3. Publish ----
+    # A rebuild reassigns index_ids, so it gets a new reference_id, but the
+    # generation keeps counting up so running services pick it up.
+    previous = read_manifest(published_paths(out_dir).manifest)
+    manifest = publish_artifacts(
+        out_dir,
+        index,
+        embs_tmp,
+        iter_corpus(corpus_path),
+        reference_id=corpus_sha[:16],
+        generation=int((previous or {}).get("generation", 0)) + 1,
+        extra={"corpus_sha256": corpus_sha}
+    )
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return manifest
+
+
+# ---------------------------------------------------------
+# Incremental append
+# ---------------------------------------------------------
+
+def append(corpus_path: str, out_dir: str, batch_size: int) -> Dict:
+    """
+    Add the clauses in `corpus_path` to the build in `out_dir`.
+
+    Only the new clauses are embedded. They get index_ids after the
+    existing rows, so cached rerank scores and label ids stay valid and
+    the manifest keeps its reference_id.
+    """
+    published = published_paths(out_dir)
+    current = read_manifest(published.manifest)
+    if current is None:
+        raise ValueError(f"No manifest in {out_dir}; run a full build first")
+    if current.get("model_name") != EMBED_MODEL_NAME:
+        raise ValueError(
+            f"{out_dir} was built with {current.get('model_name')!r}, "
+            f"EMBED_MODEL_NAME is {EMBED_MODEL_NAME!r}; rebuild instead"
+        )
+
+    new_records = list(iter_corpus(corpus_path))
+    if not new_records:
+        logger.info("No new clauses to append")
+        return current
+
+    vecs = embed_reference_texts([r["answer_text"] for r in new_records], batch_size)
+
+    # Read fully (not memory-mapped): the index is modified in place.
+    index = faiss.read_index(published.faiss_index)
+    if index.d != vecs.shape[1]:
+        raise ValueError(f"Index dim {index.d} != embedding dim {vecs.shape[1]}")
+    index.add(vecs)
+
+    old = np.load(published.primary_embs, mmap_mode="r")
+    n_old, dim = old.shape
+    embs_tmp = os.path.join(out_dir, PRIMARY_EMBS_STAGING)
+    primary = np.lib.format.open_memmap(
+        embs_tmp, mode="w+", dtype="float32", shape=(n_old + len(vecs), dim)
+    )
+    for start in range(0, n_old, 65536):
+        end = min(start + 65536, n_old)
+        primary[start:end] = old[start:end]
+    primary[n_old:] = vecs[:, :dim]
+    primary.flush()
+    del primary, old
+
+    records = itertools.chain(iter_corpus(published.metadata), new_records)
+    return publish_artifacts(
+        out_dir,
+        index,
+        embs_tmp,
+        records,
+        reference_id=current["reference_id"],
+        generation=int(current.get("generation", 0)) + 1,
+        extra={
+            "corpus_sha256": current.get("corpus_sha256"),
+            "parent_checksum": current.get("checksum"),
+            "appended": len(new_records)
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build FAISS index, primary_embs and metadata from a labeled corpus.")
+    parser.add_argument("--corpus", required=True, help="JSONL with label, answer_text, source_title per line")
+    parser.add_argument("--out", default=DEFAULT_FAISS_DIR, help="Output directory")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embedding forward pass")
+    parser.add_argument("--shard-size", type=int, default=8192, help="Rows per checkpoint shard")
+    parser.add_argument("--append", action="store_true", help="Append the corpus to the existing build in --out")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    models.load_embedding_model()
+    if args.append:
+        manifest = append(args.corpus, args.out, args.batch_size)
+    else:
+        manifest = build(args.corpus, args.out, args.batch_size, args.shard_size)
+    logger.info(
+        f"Published generation {manifest['generation']}: {manifest['count']} clauses, "
+        f"dim={manifest['dim']}, checksum={manifest['checksum'][:12]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# app/bulk_analyze.py
+"""
+Offline bulk analysis of a directory of PDFs, without the HTTP server.
+
+Extraction and chunking run in a pool of worker processes; this process
+owns the models and scores finished documents together in large batches
+(clauses shared across documents are scored once). Each document becomes
+one line of the output JSONL.
+
+Documents are identified by their path relative to --input. Each id is
+appended to the --processed file after its line is written, so re-running
+the same command skips documents that are already done. A run that died
+between the two writes is repaired on resume: ids already in the output
+are treated as processed, and a torn last line is cut off.
+
+Usage (from backend/):
+    python -m app.bulk_analyze --input contracts/ --out data/bulk_results.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+# Only light imports here: worker processes import this module, and
+# must not pull in torch / the models.
+from app.chunking import chunk_pages, deduplicate_chunks
+from app.document_io import extract_pages_from_pdf, set_ocr_workers
+
+logger = logging.getLogger("bulk_analyze")
+
+
+# ---------------------------------------------------------
+# Resume bookkeeping
+# ---------------------------------------------------------
+
+def load_skip_ids(file_path: Path) -> set:
+    """Loads processed document ids from a file into a set."""
+    if not file_path.exists():
+        return set()
+    with file_path.open("r", encoding="utf-8") as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+def save_skip_ids(file_path: Path, doc_ids: List[str]):
+    """Appends document ids to the skip file."""
+    with file_path.open("a", encoding="utf-8") as f:
+        for doc_id in doc_ids:
+            f.write(f"{doc_id}\n")
+
+
+def recover_output(out_path: Path, skip_path: Path) -> set:
+    """
+    Ids of the documents that already have a line in `out_path`.
+
+    Drops a partial last line left by a crash mid-write, and records ids
+    whose line was written but never made it to `skip_path`.
+    """
+    if not out_path.exists():
+        return set()
+
+    ids = []
+    with out_path.open("r+b") as f:
+        good_end = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            good_end += len(raw)
+            if raw.strip():
+                ids.append(json.loads(raw)["id"])
+        if good_end < f.seek(0, os.SEEK_END):
+            logger.warning(f"Dropping a partial last line from {out_path}")
+            f.truncate(good_end)
+
+    marked = load_skip_ids(skip_path)
+    missing = [doc_id for doc_id in ids if doc_id not in marked]
+    if missing:
+        logger.info(f"{len(missing)} documents were written but not marked processed; marking them now")
+        save_skip_ids(skip_path, missing)
+    return set(ids)
+
+
+def iter_pdfs(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(".pdf"):
+                yield Path(dirpath) / name
+
+
+# ---------------------------------------------------------
+# Worker side: extraction + chunking
+# ---------------------------------------------------------
+
+def _init_worker():
+    # Documents are already spread over the worker processes; OCR inline
+    # instead of every worker starting its own OCR pool.
+    set_ocr_workers(1)
+
+
+def extract_document(root: str, path: str) -> Dict:
+    """Runs in a worker process. Never raises; failures are returned."""
+    doc_id = os.path.relpath(path, root)
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        pages = extract_pages_from_pdf(path)
+        chunks = deduplicate_chunks(chunk_pages(pages))
+        return {
+            "id": doc_id,
+            "sha256": digest.hexdigest(),
+            "pages": len(pages),
+            "chunks": chunks
+        }
+    except Exception as e:
+        return {"id": doc_id, "error": f"Failed to process document: {e}"}
+
+
+# ---------------------------------------------------------
+# Main process: scoring + output
+# ---------------------------------------------------------
+
+def _flush(docs: List[Dict], out_f, skip_path: Path) -> int:
+    from app.pipeline import analyze_chunked_documents
+
+    ok = [d for d in docs if "error" not in d]
+    results = analyze_chunked_documents([d["chunks"] for d in ok]) if ok else []
+    by_id = {d["id"]: r for d, r in zip(ok, results)}
+
+    for d in docs:
+        if "error" in d:
+            line = {"id": d["id"], "error": d["error"]}
+        else:
+            line = {"id": d["id"], "sha256": d["sha256"], "pages": d["pages"], **by_id[d["id"]]}
+        out_f.write(json.dumps(line) + "\n")
+    out_f.flush()
+    os.fsync(out_f.fileno())
+    # Only mark documents processed once their lines are on disk
+    save_skip_ids(skip_path, [d["id"] for d in docs])
+    return len(docs)
+
+
+def run(
+    input_dir: str,
+    out_path: str,
+    skip_path: str,
+    workers: int,
+    batch_docs: int,
+    batch_clauses: int
+) -> Dict:
+    from app import models
+
+    root = Path(input_dir)
+    skip_file = Path(skip_path)
+    done = load_skip_ids(skip_file) | recover_output(Path(out_path), skip_file)
+    pending = [p for p in iter_pdfs(root) if os.path.relpath(p, root) not in done]
+    logger.info(f"{len(pending)} PDFs to analyze ({len(done)} already processed)")
+    if not pending:
+        return {"analyzed": 0, "failed": 0}
+
+    models.initialize_models()
+
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    stats = {"analyzed": 0, "failed": 0}
+    started = time.time()
+    # Spawned (not forked) workers: this process already holds the models
+    # and their threads.
+    ctx = multiprocessing.get_context("spawn")
+    max_in_flight = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool, \
+            open(out_path, "a", encoding="utf-8") as out_f:
+        queue = iter(pending)
+        in_flight = set()
+        buffer: List[Dict] = []
+        buffered_clauses = 0
+
+        while True:
+            while len(in_flight) < max_in_flight:
+                path = next(queue, None)
+                if path is None:
+                    break
+                in_flight.add(pool.submit(extract_document, str(root), str(path)))
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                doc = future.result()
+                if "error" in doc:
+                    logger.warning(f"{doc['id']}: {doc['error']}")
+                    stats["failed"] += 1
+                else:
+                    stats["analyzed"] += 1
+                    buffered_clauses += len(doc["chunks"])
+                buffer.append(doc)
+
+            if len(buffer) >= batch_docs or buffered_clauses >= batch_clauses:
+                _flush(buffer, out_f, skip_file)
+                buffer, buffered_clauses = [], 0
+                total = stats["analyzed"] + stats["failed"]
+                rate = total / max(time.time() - started, 1e-9)
+                logger.info(f"Progress: {total}/{len(pending)} documents ({rate:.2f} docs/s)")
+
+        if buffer:
+            _flush(buffer, out_f, skip_file)
+
+    logger.info(
+        f"Done: {stats['analyzed']} analyzed, {stats['failed']} failed "
+        f"in {time.time() - started:.1f}s -> {out_path}"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory of PDFs and write one JSONL line per document.")
+    parser.add_argument("--input", required=True, help="Directory searched recursively for *.pdf")
+    parser.add_argument("--out", required=True, help="Output JSONL (appended to)")
+    parser.add_argument("--processed", default=None, help="Processed-ids file (default: <out>.processed)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Extraction processes")
+    parser.add_argument("--batch-docs", type=int, default=32, help="Documents scored together")
+    parser.add_argument("--batch-clauses", type=int, default=4096, help="Score early once this many clauses are buffered")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    run(
+        args.input,
+        args.out,
+        args.processed or args.out + ".processed",
+        args.workers,
+        args.batch_docs,
+        args.batch_clauses
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import logging
-from typing import List, Dict
+from bisect import bisect_right
+from typing import List, Dict, Optional, Tuple
 import re
 
 # import lexnlp.nlp.en.segments.sections as section_segmenter
@@ -41,11 +42,67 @@ MIN_CHARS = MIN_CLAUSE_LEN
 # ---------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------
+#
+# Clauses are built as fragments: (text, spans), where spans are the
+# [start, end) ranges of the normalized page text the fragment was cut
+# from, in order. Joined fragments are separated by a single space, so
+# the spans are what lets chunk_page_text map a clause back to the word
+# boxes of the page (see document_io.extract_pages_from_pdf).
+
+Fragment = Tuple[str, List[Tuple[int, int]]]
+
+
+def _sub(pattern: str, repl: str, text: str, offsets: Optional[List[int]]):
+    """
+    re.sub that, given `offsets` (the source index of every char of
+    `text`), also returns the source index of every char of the result.
+    Replacement chars map to the start of the text they replace.
+    """
+    if offsets is None:
+        return re.sub(pattern, repl, text), None
+
+    out, out_offsets, pos = [], [], 0
+    for m in re.finditer(pattern, text):
+        out.append(text[pos:m.start()])
+        out_offsets.extend(offsets[pos:m.start()])
+        out.append(repl)
+        out_offsets.extend([offsets[m.start()]] * len(repl))
+        pos = m.end()
+    out.append(text[pos:])
+    out_offsets.extend(offsets[pos:])
+    return "".join(out), out_offsets
+
+
+def _normalize(text: str, offsets: Optional[List[int]] = None):
+    """
+    Collapse whitespace and undo PDF hyphenation. Returns the text and,
+    when `offsets` is given, the source index of each of its chars.
+    """
+    text, offsets = _sub(r"\s+", " ", text, offsets)
+    text, offsets = _sub(r"-\s+", "", text, offsets)  # PDF hyphenation
+    stripped = text.strip()
+    if offsets is not None:
+        lead = len(text) - len(text.lstrip())
+        offsets = offsets[lead:lead + len(stripped)]
+    return stripped, offsets
+
+
+def _split_clauses(text: str) -> List[Fragment]:
+    """CLAUSE_SPLIT_RE.split, keeping non-empty pieces stripped, as fragments."""
+    cuts = [0] + [m.start() for m in CLAUSE_SPLIT_RE.finditer(text)] + [len(text)]
+    fragments = []
+    for start, end in zip(cuts, cuts[1:]):
+        piece = text[start:end]
+        clause = piece.strip()
+        if clause:
+            start += len(piece) - len(piece.lstrip())
+            fragments.append((clause, [(start, start + len(clause))]))
+    return fragments
+
+
+def _join(a: Fragment, b: Fragment) -> Fragment:
+    return a[0] + " " + b[0], a[1] + b[1]
 
-def _normalize(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"-\s+", "", text)  # PDF hyphenation
-    return text.strip()
 
 def _has_exception_prefix(text: str) -> bool:
     """
@@ -56,7 +113,7 @@ def _has_exception_prefix(text: str) -> bool:
     return any(cue in head for cue in EXCEPTION_CUES)
 
 
-def _merge_exceptions(blocks: List[str]) -> List[str]:
+def _merge_exceptions(blocks: List[Fragment]) -> List[Fragment]:
     """
     Merge legal exception fragments in BOTH directions:
     1) Forward merge: if fragment STARTS with exception cue
@@ -67,22 +124,22 @@ def _merge_exceptions(blocks: List[str]) -> List[str]:
     i = 0
 
     while i < len(blocks):
-        cur = blocks[i].strip()
-        if not cur:
+        cur = blocks[i]
+        if not cur[0]:
             i += 1
             continue
 
-        lower = cur.lower()
+        lower = cur[0].lower()
 
         # -------------------------------------------------
         # Case 1: backward-aware forward binding
         # e.g. "EXCEPT UNDER SECTION 11(a), IN NO EVENT..."
         # must bind to the following liability sentence
         # -------------------------------------------------
-        if _has_exception_prefix(cur) and i + 1 < len(blocks):
-            nxt = blocks[i + 1].strip()
-            if nxt:
-                merged.append(cur + " " + nxt)
+        if _has_exception_prefix(cur[0]) and i + 1 < len(blocks):
+            nxt = blocks[i + 1]
+            if nxt[0]:
+                merged.append(_join(cur, nxt))
                 i += 2
                 continue
 
@@ -91,7 +148,7 @@ def _merge_exceptions(blocks: List[str]) -> List[str]:
         # e.g. "provided that", "notwithstanding", etc.
         # -------------------------------------------------
         if merged and any(lower.startswith(c) for c in EXCEPTION_CUES):
-            merged[-1] += " " + cur
+            merged[-1] = _join(merged[-1], cur)
         else:
             merged.append(cur)
 
@@ -101,24 +158,23 @@ def _merge_exceptions(blocks: List[str]) -> List[str]:
 
 
 
-def _pack_clauses(clauses: List[str]) -> List[str]:
+def _pack_clauses(clauses: List[Fragment]) -> List[Fragment]:
     """
     Pack only when a single clause is too short.
     NEVER merge two independent clauses.
     """
     chunks = []
-    buf = ""
+    buf = None
 
     for clause in clauses:
-        clause = clause.strip()
-        if not clause:
+        if not clause[0]:
             continue
 
         # If clause itself is long enough, flush buffer and keep it standalone
-        if len(clause) >= MIN_CLAUSE_LEN:
+        if len(clause[0]) >= MIN_CLAUSE_LEN:
             if buf:
-                chunks.append(buf.strip())
-                buf = ""
+                chunks.append(buf)
+                buf = None
             chunks.append(clause)
             continue
 
@@ -126,42 +182,75 @@ def _pack_clauses(clauses: List[str]) -> List[str]:
         if not buf:
             buf = clause
         else:
-            buf += " " + clause
+            buf = _join(buf, clause)
 
-    if buf.strip():
-        chunks.append(buf.strip())
+    if buf:
+        chunks.append(buf)
 
     return chunks
 
 
+def _clause_boxes(
+    spans: List[Tuple[int, int]],
+    offsets: List[int],
+    words: List[List[float]]
+) -> List[List[float]]:
+    """
+    Page rectangles covering a clause: the union of the boxes of the words
+    its spans touch, one rectangle per visual line, in reading order.
+    """
+    starts = [w[0] for w in words]
+    lines: Dict[int, List[float]] = {}
+    for start, end in spans:
+        src_start, src_end = offsets[start], offsets[end - 1]
+        # words are in text order and do not overlap
+        i = max(bisect_right(starts, src_start) - 1, 0)
+        while i < len(words) and words[i][0] <= src_end:
+            _, word_end, x0, y0, x1, y1, line = words[i]
+            if word_end > src_start:
+                box = lines.get(line)
+                if box is None:
+                    lines[line] = [x0, y0, x1, y1]
+                else:
+                    box[:] = [min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1)]
+            i += 1
+    return [[round(v, 2) for v in box] for box in lines.values()]
 
 
 # ---------------------------------------------------------
 # Page-level chunking
 # ---------------------------------------------------------
 
-def chunk_page_text(text: str, page_no: int) -> List[Dict]:
-    text = _normalize(text)
+def chunk_page_text(text: str, page_no: int, words: Optional[List[List[float]]] = None) -> List[Dict]:
+    """
+    Clauses of one page. Given the page's word boxes (see
+    document_io.extract_pages_from_pdf), each clause also gets "boxes":
+    the [x0, y0, x1, y1] page rectangles it covers, one per line.
+    """
+    offsets = list(range(len(text))) if words else None
+    text, offsets = _normalize(text, offsets)
     if not text:
         return []
 
-    raw_clauses = CLAUSE_SPLIT_RE.split(text)
-    # raw_clauses = [c.strip() for c in raw_clauses if len(c.strip()) >= MIN_CLAUSE_LEN]
-    raw_clauses = [c.strip() for c in raw_clauses if c.strip()]
+    raw_clauses = _split_clauses(text)
     # Merge legal exception fragments
     merged = _merge_exceptions(raw_clauses)
 
     # Pack clauses (recall-first)
     chunks = _pack_clauses(merged)
 
-    return [
-        {
+    page_chunks = []
+    for clause_text, spans in chunks:
+        if len(clause_text) < MIN_CLAUSE_LEN:
+            continue
+        chunk = {
             "page_no": page_no,
-            "clause_text": c
+            "clause_text": clause_text
         }
-        for c in chunks
-        if len(c) >= MIN_CLAUSE_LEN
-    ]
+        if offsets is not None:
+            chunk["boxes"] = _clause_boxes(spans, offsets, words)
+        page_chunks.append(chunk)
+    return page_chunks
 
 
 # ---------------------------------------------------------
@@ -174,7 +263,8 @@ def chunk_pages(pages: List[Dict]) -> List[Dict]:
     for page in pages:
         page_chunks = chunk_page_text(
             page.get("text", ""),
-            page.get("page_no")
+            page.get("page_no"),
+            page.get("words")
         )
         all_chunks.extend(page_chunks)
 
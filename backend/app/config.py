@@ -40,12 +40,29 @@ USE_GPU = get_env_bool("USE_GPU", True)
 # Vector DB / data paths
 # ============================================================
 
-# Default paths (relative to project root)
+# Default paths (relative to project root). Once `python -m app.build_index`
+# has published a generation, the artifacts are read from the generation
+# named by <FAISS_DIR>/CURRENT and the individual paths below are ignored.
 DEFAULT_FAISS_DIR = os.getenv("FAISS_DIR", "FAISS")
 FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", os.path.join(DEFAULT_FAISS_DIR, "clauses.index"))
 METADATA_PATH = os.getenv("METADATA_PATH", os.path.join(DEFAULT_FAISS_DIR, "metadata.jsonl"))
+# Columnar, memory-mapped form of metadata.jsonl (built from it on first start)
+METADATA_STORE_DIR = os.getenv("METADATA_STORE_DIR", os.path.join(DEFAULT_FAISS_DIR, "metadata_store"))
 PRIMARY_EMBS_PATH = os.getenv("PRIMARY_EMBS_PATH", os.path.join(DEFAULT_FAISS_DIR, "primary_embs.npy"))
 
+# Manifest of hand-copied artifacts; validated at startup when present
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(DEFAULT_FAISS_DIR, "manifest.json"))
+# Re-hash artifacts against the manifest checksums at startup (slow for large indexes)
+VERIFY_ARTIFACT_CHECKSUMS = get_env_bool("VERIFY_ARTIFACT_CHECKSUMS", False)
+
+# How often a running service checks <FAISS_DIR>/CURRENT for a newer generation
+# and hot-swaps to it (0 disables)
+REFERENCE_RELOAD_INTERVAL_SECONDS = int(os.getenv("REFERENCE_RELOAD_INTERVAL_SECONDS", "60"))
+
+# Memory-map primary_embs.npy and the FAISS index instead of copying them
+# into each worker's heap; uvicorn workers then share the OS page cache.
+MMAP_ARTIFACTS = get_env_bool("MMAP_ARTIFACTS", True)
+
 # ============================================================
 # Retrieval configuration
 # ============================================================
@@ -53,10 +70,67 @@ PRIMARY_EMBS_PATH = os.getenv("PRIMARY_EMBS_PATH", os.path.join(DEFAULT_FAISS_DI
 # Number of FAISS candidates retrieved
 TOP_K_RETRIEVAL = 25
 
+# Probe vectors per FAISS search call (bounds the (block, k) result buffers)
+FAISS_SEARCH_BLOCK = int(os.getenv("FAISS_SEARCH_BLOCK", "1024"))
+
+# Identity (top-1 cosine vs primary_embs) backend:
+#   "flat"    exact FAISS IndexFlatIP
+#   "hnsw"    approximate FAISS IndexHNSWFlat, for very large reference sets
+#   "blocked" exact numpy matmul over IDENTITY_BLOCK_ROWS references at a time
+#   "auto"    "blocked" up to IDENTITY_MATMUL_MAX_REFS references, else "flat".
+#             Above the threshold the index holds its own copy of the vectors
+#             even when primary_embs is memory-mapped: that memory buys not
+#             scanning every reference for every clause
+IDENTITY_INDEX = os.getenv("IDENTITY_INDEX", "auto").lower()
+IDENTITY_MATMUL_MAX_REFS = int(os.getenv("IDENTITY_MATMUL_MAX_REFS", "20000"))
+IDENTITY_BLOCK_ROWS = int(os.getenv("IDENTITY_BLOCK_ROWS", "8192"))
+IDENTITY_HNSW_M = int(os.getenv("IDENTITY_HNSW_M", "32"))
+IDENTITY_HNSW_EF_SEARCH = int(os.getenv("IDENTITY_HNSW_EF_SEARCH", "128"))
+
 # Number of candidates reranked by cross-encoder
 TOP_K_RERANK = 10
 RERANKER_BATCH_SIZE = 32  # or even 64
 
+# Cross-encoder score cache keyed by (clause fingerprint, index_id).
+# Set RERANK_CACHE_DB_PATH to also persist scores in SQLite.
+RERANK_CACHE_ENABLED = get_env_bool("RERANK_CACHE_ENABLED", True)
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "500000"))
+RERANK_CACHE_DB_PATH = os.getenv("RERANK_CACHE_DB_PATH", "")
+RERANK_CACHE_DB_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_DB_MAX_ENTRIES", "5000000"))
+
+# Texts per embedding forward pass. Probes are sorted by length before
+# batching so each batch pads to a similar sequence length.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# ============================================================
+# Inference scheduler (cross-request micro-batching)
+# ============================================================
+
+# Route embed_model.encode / reranker.predict through one batching thread
+# per model, so concurrent analyses share full batches.
+INFERENCE_SCHEDULER_ENABLED = get_env_bool("INFERENCE_SCHEDULER_ENABLED", True)
+# How long a partial batch waits for other requests to top it up
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+EMBED_SCHEDULER_MAX_BATCH = int(os.getenv("EMBED_SCHEDULER_MAX_BATCH", str(EMBED_BATCH_SIZE)))
+RERANK_SCHEDULER_MAX_BATCH = int(os.getenv("RERANK_SCHEDULER_MAX_BATCH", str(RERANKER_BATCH_SIZE)))
+
+# ============================================================
+# Embedding cache (persistent, content-addressed)
+# ============================================================
+
+EMBED_CACHE_ENABLED = get_env_bool("EMBED_CACHE_ENABLED", True)
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join("cache", "embeddings"))
+# ~4 KB per entry for a 1024-dim model
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "100000"))
+
+# ============================================================
+# Result cache (whole-document results by PDF content hash)
+# ============================================================
+
+RESULT_CACHE_ENABLED = get_env_bool("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_DB_PATH = os.getenv("RESULT_CACHE_DB_PATH", os.path.join("cache", "results.sqlite"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+
 # ============================================================
 # Scoring weights (matches your notebook logic)
 # ============================================================
@@ -94,14 +168,66 @@ RISK_BANDS = {
     "HIGH": "high"
 }
 
-# Minimum total extracted characters required to SKIP OCR
-# If extracted text is shorter than this, OCR fallback is used
-OCR_MIN_CHARS = 200
+# Embedded-text extraction: "pymupdf" (fast, default) or "pdfplumber".
+# The other engine is tried if the first cannot read a file.
+PDF_TEXT_ENGINE = os.getenv("PDF_TEXT_ENGINE", "pymupdf").lower()
+
+# OCR is decided per page: a page with fewer embedded characters than
+# this that contains an image (a scan) is OCRed; other pages keep their text
+OCR_PAGE_MIN_CHARS = int(os.getenv("OCR_PAGE_MIN_CHARS", "100"))
 
 # DPI for rendering PDF pages before OCR
 # Higher = better OCR accuracy, slower performance
 OCR_RESOLUTION = int(os.getenv("OCR_RESOLUTION", "300"))
 
+# Scanned pages are OCRed in a pool of processes (1 = inline, no pool)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+# Pages of one document OCRed at once, so one long scan can't hold every worker
+OCR_MAX_WORKERS_PER_DOC = int(os.getenv("OCR_MAX_WORKERS_PER_DOC", "4"))
+
+# OCR text of scanned pages, keyed by the page's content stream and images
+# plus the DPI and tesseract settings, so recurring scans skip rendering and OCR
+OCR_CACHE_ENABLED = get_env_bool("OCR_CACHE_ENABLED", True)
+OCR_CACHE_DB_PATH = os.getenv("OCR_CACHE_DB_PATH", os.path.join("cache", "ocr.sqlite"))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# ============================================================
+# Analysis worker pool
+# ============================================================
+
+# "thread" shares the loaded models; "process" loads a copy per worker
+ANALYSIS_POOL_KIND = os.getenv("ANALYSIS_POOL_KIND", "thread").lower()
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+# Analyses allowed to wait for a worker before new ones are rejected
+ANALYSIS_QUEUE_MAX = int(os.getenv("ANALYSIS_QUEUE_MAX", "8"))
+
+# ============================================================
+# Streaming analysis
+# ============================================================
+
+# Clauses scored per block by /analyze/stream before results are emitted
+STREAM_BLOCK_CLAUSES = int(os.getenv("STREAM_BLOCK_CLAUSES", "32"))
+
+# ============================================================
+# Analysis cache (results kept for /highlight and /jobs)
+# ============================================================
+
+# "memory" (per process), "disk" (shared by workers on one host) or
+# "redis" (shared across hosts; needs the redis package)
+ANALYSIS_CACHE_BACKEND = os.getenv("ANALYSIS_CACHE_BACKEND", "memory").lower()
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join("cache", "analyses"))
+ANALYSIS_CACHE_REDIS_URL = os.getenv("ANALYSIS_CACHE_REDIS_URL", "redis://localhost:6379/0")
+ANALYSIS_CACHE_REDIS_PREFIX = os.getenv("ANALYSIS_CACHE_REDIS_PREFIX", "legality:analysis:")
+
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(15 * 60)))
+# Budget over result payloads plus their PDFs (memory / disk backends);
+# least recently used finished entries are evicted first once either
+# limit is exceeded
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "512")) * 1024 * 1024
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+# How often the background sweeper drops expired entries (0 = disabled)
+ANALYSIS_CACHE_SWEEP_SECONDS = int(os.getenv("ANALYSIS_CACHE_SWEEP_SECONDS", "60"))
+
 # ============================================================
 # API Configuration
 # ============================================================
@@ -116,6 +242,12 @@ CORS_ALLOW_HEADERS = get_env_list("CORS_ALLOW_HEADERS", ["*"])
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "50"))
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
+# Where uploads are spooled to disk ("" = system temp dir)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "")
+
+# /analyze/batch: max PDFs per request (zip members count individually)
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "100"))
+
 # API settings
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
@@ -1,38 +1,153 @@
 # app/document_io.py
 
 import io
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
 import fitz  # PyMuPDF
-import pdfplumber
 import pytesseract
 from PIL import Image
 import logging
-from app.config import OCR_MIN_CHARS, OCR_RESOLUTION
+from app.config import (
+    PDF_TEXT_ENGINE,
+    OCR_PAGE_MIN_CHARS,
+    OCR_RESOLUTION,
+    OCR_WORKERS,
+    OCR_MAX_WORKERS_PER_DOC,
+    OCR_CACHE_ENABLED,
+    OCR_CACHE_DB_PATH,
+    OCR_CACHE_MAX_BYTES
+)
+from app.ocr_cache import OcrCache, page_key
 
 logger = logging.getLogger(__name__)
 
+# A PDF given either in memory or as a path on disk. Paths are opened
+# directly, so large uploads are never copied into memory.
+PdfSource = Union[bytes, str, os.PathLike]
+
+
+def _is_in_memory(pdf: PdfSource) -> bool:
+    return isinstance(pdf, (bytes, bytearray, memoryview))
+
+
+def open_pdf_plumber(pdf: PdfSource):
+    # optional: only needed for PDF_TEXT_ENGINE=pdfplumber and as a fallback
+    import pdfplumber
+    return pdfplumber.open(io.BytesIO(pdf) if _is_in_memory(pdf) else pdf)
+
+
+def open_pdf_fitz(pdf: PdfSource) -> fitz.Document:
+    if _is_in_memory(pdf):
+        return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf)
+
 # ------------------------------------------------
 # Utility: check text quality
 # ------------------------------------------------
 
-def _is_text_usable(text: str, min_chars: int = OCR_MIN_CHARS) -> bool:
+def _is_text_usable(text: str, min_chars: int = OCR_PAGE_MIN_CHARS) -> bool:
     if not text:
         return False
     return len(text.strip()) >= min_chars
 
 
+def _page_needs_ocr(text: str, has_images: bool) -> bool:
+    """
+    A page is scanned when it has little embedded text but carries an
+    image; a page with neither has nothing for OCR to read.
+    """
+    return has_images and not _is_text_usable(text)
+
+
 # ------------------------------------------------
 # Primary extraction: embedded PDF text
 # ------------------------------------------------
 
-def _extract_with_pdfplumber(pdf_bytes: bytes):
+# Words whose tops are within this many points share a line (as in pdfplumber)
+_LINE_TOLERANCE = 3.0
+
+
+def _page_lines(page: fitz.Page) -> List[List[tuple]]:
+    """
+    Words of a page grouped into lines in reading order, as PyMuPDF word
+    tuples (x0, y0, x1, y1, text, block_no, line_no, word_no).
+
+    PyMuPDF's own lines follow text spans, so a list marker such as "(i)"
+    set apart from its sentence would be a line of its own; grouping
+    words by their top coordinate gives the visual lines instead.
+    """
+    words = sorted(page.get_text("words"), key=lambda w: (w[1], w[0]))
+    lines: List[List[tuple]] = []
+    line_top = None
+    for word in words:
+        if lines and word[1] - line_top <= _LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+            line_top = word[1]
+    return [sorted(line, key=lambda w: w[0]) for line in lines]
+
+
+def _lines_to_text(lines: List[List[tuple]]) -> str:
+    return "\n".join(" ".join(word[4] for word in line) for line in lines)
+
+
+def _word_boxes(lines: List[List[tuple]]) -> List[List[float]]:
+    """
+    Where each word of `_lines_to_text(lines)` sits on the page:
+    [start, end, x0, y0, x1, y1, line] per word, with start/end the word's
+    character offsets in that text and line its visual line index.
+    """
+    boxes = []
+    pos = 0
+    for line_no, line in enumerate(lines):
+        for word in line:
+            end = pos + len(word[4])
+            boxes.append([pos, end, *word[:4], line_no])
+            pos = end + 1  # the joining space or newline
+    return boxes
+
+
+def _extract_with_pymupdf(source: PdfSource, with_boxes: bool = False) -> List[Dict]:
+    """
+    Embedded text per page from one PyMuPDF pass, plus whether it needs OCR
+    and, with `with_boxes`, the word boxes of that text (see _word_boxes).
+    """
+    pages = []
+
+    with open_pdf_fitz(source) as doc:
+        for i, page in enumerate(doc):
+            lines = _page_lines(page)
+            text = _lines_to_text(lines)
+            pages.append({
+                "page_no": i + 1,
+                "text": text,
+                "needs_ocr": _page_needs_ocr(text, bool(page.get_images()))
+            })
+            if with_boxes:
+                pages[-1]["words"] = _word_boxes(lines)
+
+    return pages
+
+
+def _extract_with_pdfplumber(source: PdfSource) -> List[Dict]:
+    """Embedded text per page, plus whether the page needs OCR."""
     pages = []
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+    with open_pdf_plumber(source) as pdf:
         for i, page in enumerate(pdf.pages):
             text = page.extract_text() or ""
             pages.append({
                 "page_no": i + 1,
-                "text": text
+                "text": text,
+                "needs_ocr": _page_needs_ocr(text, bool(page.images))
             })
 
     return pages
@@ -63,27 +178,192 @@ def normalize_ocr_text(text: str) -> str:
 
     return text.strip()
 
-def _extract_with_ocr(pdf_bytes: bytes):
-    pages = []
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+TESSERACT_CONFIG = "--oem 3 --psm 6"
 
-    for i, page in enumerate(doc):
-        pix = page.get_pixmap(dpi=OCR_RESOLUTION)
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
 
-        text = pytesseract.image_to_string(
-            img,
-            config="--oem 3 --psm 6"
-        )
+def _ocr_doc_page(doc: fitz.Document, page_no: int) -> str:
+    """Raw tesseract output of one page; see normalize_ocr_text."""
+    page = doc[page_no - 1]
+    pix = page.get_pixmap(dpi=OCR_RESOLUTION)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
 
-        text = normalize_ocr_text(text)
+    return pytesseract.image_to_string(
+        img,
+        config=TESSERACT_CONFIG
+    )
 
-        pages.append({
-            "page_no": i + 1,
-            "text": text
-        })
 
-    return pages
+def _ocr_page(path: str, page_no: int) -> str:
+    """Runs in an OCR worker process: render and OCR one page."""
+    with fitz.open(path) as doc:
+        return _ocr_doc_page(doc, page_no)
+
+
+# ------------------------------------------------
+# OCR worker pool
+# ------------------------------------------------
+#
+# Tesseract is single-threaded per call, so scanned pages are rendered
+# and OCRed in a pool of processes shared by all requests. One document
+# keeps at most OCR_MAX_WORKERS_PER_DOC pages in flight.
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+_ocr_workers = max(1, OCR_WORKERS)
+
+
+def set_ocr_workers(workers: int) -> None:
+    """Resize the OCR pool; 1 runs OCR inline in the calling process."""
+    global _ocr_workers
+    shutdown_ocr_pool()
+    _ocr_workers = max(1, workers)
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # Spawned (not forked) workers: this process may hold the
+            # models and their threads.
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=_ocr_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"OCR pool: {_ocr_workers} worker process(es)")
+        return _ocr_pool
+
+
+def shutdown_ocr_pool() -> None:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
+
+
+# ------------------------------------------------
+# OCR cache
+# ------------------------------------------------
+#
+# Raw tesseract output is cached by page content (app/ocr_cache.py), so
+# a page OCRed before is neither rendered nor OCRed again. Normalization
+# runs on every read, so changing normalize_ocr_text needs no flush.
+
+_ocr_cache: Optional[OcrCache] = None
+_ocr_cache_loaded = False
+_ocr_cache_lock = threading.Lock()
+_ocr_cache_scope: Optional[str] = None
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """The OCR cache of this process, opened on first use; None if disabled."""
+    global _ocr_cache, _ocr_cache_loaded
+    with _ocr_cache_lock:
+        if not _ocr_cache_loaded:
+            _ocr_cache_loaded = True
+            if OCR_CACHE_ENABLED:
+                try:
+                    _ocr_cache = OcrCache(OCR_CACHE_DB_PATH, OCR_CACHE_MAX_BYTES)
+                except sqlite3.Error as e:
+                    logger.warning(f"OCR cache unavailable ({e}); OCRing without it")
+        return _ocr_cache
+
+
+def set_ocr_cache(cache: Optional[OcrCache]) -> None:
+    """Use `cache` (None disables caching) instead of the configured one."""
+    global _ocr_cache, _ocr_cache_loaded
+    with _ocr_cache_lock:
+        _ocr_cache = cache
+        _ocr_cache_loaded = True
+
+
+def _ocr_scope() -> str:
+    """Everything besides the page that changes tesseract's output."""
+    global _ocr_cache_scope
+    if _ocr_cache_scope is None:
+        try:
+            version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            version = "unknown"
+        _ocr_cache_scope = f"{OCR_RESOLUTION}\0{TESSERACT_CONFIG}\0{version}"
+    return _ocr_cache_scope
+
+
+@contextmanager
+def _pdf_on_disk(source: PdfSource) -> Iterator[str]:
+    """A path workers can open; in-memory PDFs are written to a temp file."""
+    if not _is_in_memory(source):
+        yield os.fspath(source)
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _ocr_in_pool(path: str, page_numbers: List[int], window: int) -> List[str]:
+    pool = _get_ocr_pool()
+    texts: Dict[int, str] = {}
+    queue = iter(page_numbers)
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < window:
+                page_no = next(queue, None)
+                if page_no is None:
+                    break
+                in_flight[pool.submit(_ocr_page, path, page_no)] = page_no
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                texts[in_flight.pop(future)] = future.result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return [texts[page_no] for page_no in page_numbers]
+
+
+def _extract_with_ocr(source: PdfSource, page_numbers: Optional[Sequence[int]] = None):
+    """
+    OCR the given 1-based pages (default: all), in order. Pages found in
+    the OCR cache are not rendered; the rest are OCRed and cached.
+    """
+    cache = get_ocr_cache()
+    texts: Dict[int, str] = {}
+    keys: Dict[int, str] = {}
+
+    with open_pdf_fitz(source) as doc:
+        if page_numbers is None:
+            page_numbers = range(1, doc.page_count + 1)
+        page_numbers = list(page_numbers)
+        if cache is not None:
+            scope = _ocr_scope()
+            keys = {n: page_key(doc, doc[n - 1], scope) for n in page_numbers}
+            cached = cache.get_many(list(set(keys.values())))
+            texts = {n: cached[key] for n, key in keys.items() if key in cached}
+        todo = [n for n in page_numbers if n not in texts]
+
+        window = min(_ocr_workers, OCR_MAX_WORKERS_PER_DOC, len(todo))
+        if window <= 1:
+            texts.update((n, _ocr_doc_page(doc, n)) for n in todo)
+
+    if window > 1:
+        with _pdf_on_disk(source) as path:
+            texts.update(zip(todo, _ocr_in_pool(path, todo, window)))
+
+    if cache is not None and todo:
+        cache.put_many((keys[n], texts[n]) for n in todo)
+    if page_numbers:
+        logger.info(f"OCR: {len(page_numbers) - len(todo)}/{len(page_numbers)} pages from cache")
+
+    return [
+        {"page_no": page_no, "text": normalize_ocr_text(texts[page_no])}
+        for page_no in page_numbers
+    ]
 # def _extract_with_ocr(pdf_bytes: bytes):
 #     pages = []
 
@@ -111,28 +391,69 @@ def _extract_with_ocr(pdf_bytes: bytes):
 # Public API
 # ------------------------------------------------
 
-def extract_pages_from_pdf_bytes(pdf_bytes: bytes):
+def extract_pages_from_pdf_bytes(pdf_bytes: bytes, with_boxes: bool = False):
+    """Kept for callers holding the PDF in memory; see extract_pages_from_pdf."""
+    return extract_pages_from_pdf(pdf_bytes, with_boxes=with_boxes)
+
+
+def _extract_embedded_text(pdf: PdfSource, with_boxes: bool = False) -> List[Dict]:
     """
-    Main entry point used by the pipeline.
+    PDF_TEXT_ENGINE first; the other engine if it cannot read the file.
+    Only the PyMuPDF engine reports word boxes.
+    """
+    engines = [
+        lambda source: _extract_with_pymupdf(source, with_boxes=with_boxes),
+        _extract_with_pdfplumber
+    ]
+    names = ["pymupdf", "pdfplumber"]
+    if PDF_TEXT_ENGINE == "pdfplumber":
+        engines.reverse()
+        names.reverse()
+    try:
+        return engines[0](pdf)
+    except Exception as e:
+        logger.warning(f"{names[0]} extraction failed ({e}); trying {names[1]}")
+        try:
+            return engines[1](pdf)
+        except ImportError:
+            raise e
+
+
+def extract_pages_from_pdf(pdf: PdfSource, with_boxes: bool = False):
+    """
+    Main entry point used by the pipeline. `pdf` is bytes or a file path.
+
+    Embedded text is used wherever a page has it; only scanned pages go
+    through OCR, so OCR cost follows the number of scanned pages.
 
     Returns:
     [
       {"page_no": int, "text": str},
       ...
     ]
+
+    With `with_boxes`, pages whose text came from the PyMuPDF engine also
+    carry "words": [[start, end, x0, y0, x1, y1, line], ...], the page
+    rectangle of every word and its character range in "text". Pages read
+    by pdfplumber or OCR have no "words".
     """
-    
-    # --- Try text-based extraction first ---
-    pages = _extract_with_pdfplumber(pdf_bytes)
-    full_text = " ".join(p["text"] for p in pages)
-    total_chars = len(full_text)
-    logger.info(f"pdfplumber extracted total chars: {total_chars}")
-    if _is_text_usable(full_text):
-        return pages
-    logger.info("Falling back to OCR due to low extracted text.")
 
-    if _is_text_usable(full_text):
+    # --- Text-based extraction for every page ---
+    pages = _extract_embedded_text(pdf, with_boxes=with_boxes)
+    scanned = [p["page_no"] for p in pages if p.pop("needs_ocr")]
+    logger.info(
+        f"Extracted total chars: {sum(len(p['text']) for p in pages)}; "
+        f"{len(scanned)}/{len(pages)} pages need OCR"
+    )
+    if not scanned:
         return pages
 
-    # --- Fallback to OCR ---
-    return _extract_with_ocr(pdf_bytes)
+    # --- OCR only the scanned pages ---
+    for ocr_page in _extract_with_ocr(pdf, scanned):
+        page = pages[ocr_page["page_no"] - 1]
+        # keep the embedded text if OCR recovered less
+        if len(ocr_page["text"].strip()) > len(page["text"].strip()):
+            page["text"] = ocr_page["text"]
+            page.pop("words", None)  # boxes of the replaced text
+
+    return pages
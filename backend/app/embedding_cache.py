@@ -0,0 +1,168 @@
+# app/embedding_cache.py
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Key helpers
+# ---------------------------------------
+
+def normalize_embed_text(text: str) -> str:
+    """
+    Canonical form used for cache keys.
+
+    Only Unicode form and whitespace are normalized: both are invisible to
+    the embedding tokenizer, whereas case and punctuation are not.
+    """
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def embedding_key(text: str, model_name: str) -> bytes:
+    base = model_name + "\0" + normalize_embed_text(text)
+    return hashlib.sha256(base.encode("utf-8")).digest()
+
+
+# ---------------------------------------
+# SQLite store
+# ---------------------------------------
+
+class EmbeddingCache:
+    """
+    Content-addressed, persistent store of float32 embeddings.
+
+    Rows live in `<directory>/embeddings.sqlite`, keyed by the sha256 of
+    model name and normalized text, and are evicted least recently used
+    first beyond `max_entries`. Each row holds its key and vector
+    together, so the workers on one host can share the directory: SQLite
+    serializes their writes and every worker sees the others' entries.
+    """
+
+    def __init__(self, directory: str, model_name: str, dim: int, max_entries: int):
+        self.directory = directory
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "embeddings.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_access)")
+        self._db.commit()
+
+        logger.info(
+            f"Embedding cache at {self.db_path}: "
+            f"{self._count()}/{self.capacity} entries ({self.model_name}, dim={self.dim})"
+        )
+
+    def _count(self) -> int:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    # ---- public API ----
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up texts. Returns (vectors, hit_mask); rows where hit_mask is
+        False are undefined and must be filled by the caller.
+        """
+        keys = [embedding_key(t, self.model_name) for t in texts]
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        hit = np.zeros(len(texts), dtype=bool)
+        if not keys:
+            return out, hit
+
+        found: Dict[bytes, bytes] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(unique), 400):
+                chunk = unique[start:start + 400]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._db.commit()
+
+        for i, key in enumerate(keys):
+            data = found.get(key)
+            # a vector of another width belongs to a different model setup
+            if data is not None and len(data) == self.dim * 4:
+                out[i] = np.frombuffer(data, dtype="float32")
+                hit[i] = True
+
+        n_hits = int(hit.sum())
+        with self._lock:
+            self.hits += n_hits
+            self.misses += len(texts) - n_hits
+
+        return out, hit
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        if len(texts) == 0 or self.capacity == 0:
+            return
+
+        rows = {}
+        for text, vec in zip(texts, vectors):
+            rows[embedding_key(text, self.model_name)] = np.asarray(vec, dtype="float32").tobytes()
+        # A batch larger than the cache only keeps its tail.
+        items = list(rows.items())[-self.capacity:]
+
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, data, now) for key, data in items]
+            )
+            overflow = self._count() - self.capacity
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    " SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._count()
+        return {
+            "entries": entries,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0
+        }
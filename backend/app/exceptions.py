@@ -27,3 +27,10 @@ class ConfigurationError(LegalityAIException):
     """Raised when configuration is invalid."""
     pass
 
+
+class ServiceBusyError(LegalityAIException):
+    """Raised when the analysis queue is full."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
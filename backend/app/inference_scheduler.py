@@ -0,0 +1,169 @@
+# app/inference_scheduler.py
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("items", "future", "results", "next", "remaining", "submitted_at")
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = items
+        self.future: Future = Future()
+        self.results: Optional[np.ndarray] = None
+        self.next = 0  # first item not yet handed to a batch
+        self.remaining = len(items)  # items whose result is still missing
+        self.submitted_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Coalesces inference requests from concurrent callers into batches.
+
+    `submit(items)` queues a request and returns a Future of the
+    (len(items), ...) result array. A single thread drains the queue in
+    FIFO order into batches of up to `max_batch_size` items, waiting at
+    most `max_wait_ms` after the oldest queued request for a batch to
+    fill. A request larger than one batch is split across batches, so a
+    lone caller gets exactly the batches it would have run itself.
+
+    `run_batch(items)` must return one row per item, independent of what
+    else is in the batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], Any],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+
+        self._pending: Deque[_Request] = deque()
+        self._queued = 0  # items not yet handed to a batch
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"{name} scheduler: max batch {self.max_batch_size}, max wait {max_wait_ms:g} ms"
+        )
+
+    # ---- public API ----
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        req = _Request(items)
+        if len(items) == 0:
+            req.future.set_result(np.empty(0))
+            return req.future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} scheduler is closed")
+            self._pending.append(req)
+            self._queued += len(items)
+            self.requests += 1
+            self._cond.notify()
+        return req.future
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "queued_items": self._queued
+            }
+
+    # ---- worker ----
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                # Give concurrent callers until the oldest request's deadline
+                # to top up a partial batch.
+                deadline = self._pending[0].submitted_at + self.max_wait_s
+                while self._queued < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                slices, batch = self._take()
+
+            if batch:
+                self._run(slices, batch)
+
+    def _take(self):
+        """Pop up to max_batch_size items off the queue (caller holds the lock)."""
+        slices = []
+        batch: List[Any] = []
+        while self._pending and len(batch) < self.max_batch_size:
+            req = self._pending[0]
+            if req.future.done():
+                # failed in an earlier batch; drop the rest of it
+                self._queued -= len(req.items) - req.next
+                self._pending.popleft()
+                continue
+            take = min(self.max_batch_size - len(batch), len(req.items) - req.next)
+            slices.append((req, req.next, req.next + take, len(batch)))
+            batch.extend(req.items[req.next:req.next + take])
+            req.next += take
+            self._queued -= take
+            if req.next == len(req.items):
+                self._pending.popleft()
+        return slices, batch
+
+    def _run(self, slices, batch: List[Any]):
+        try:
+            out = np.asarray(self.run_batch(batch))
+        except BaseException as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+            for req, _, _, _ in slices:
+                if not req.future.done():
+                    req.future.set_exception(e)
+            return
+
+        with self._cond:
+            self.batches += 1
+            self.items += len(batch)
+
+        for req, start, end, pos in slices:
+            if req.future.done():
+                continue
+            if req.results is None:
+                req.results = np.empty((len(req.items),) + out.shape[1:], dtype=out.dtype)
+            req.results[start:end] = out[pos:pos + end - start]
+            req.remaining -= end - start
+            if req.remaining == 0:
+                req.future.set_result(req.results)
@@ -2,33 +2,64 @@
 FastAPI application for Legal Clause Risk Detection.
 Production-ready with CORS, health checks, error handling, and validation.
 """
-from app.analysis_cache import create_analysis_entry, get_analysis_entry
+from app.analysis_cache import (
+    create_analysis_entry,
+    get_analysis_entry,
+    get_analysis_pdf,
+    create_job_entry,
+    update_job_stage,
+    complete_job,
+    fail_job,
+    get_job_status,
+    delete_analysis_entry,
+    discard_pdf,
+    cleanup_expired_entries,
+    cache_stats,
+    JOB_DONE,
+    JOB_FAILED
+)
 from app.pdf_highlight import highlight_clauses_in_pdf
 from fastapi.responses import StreamingResponse
 import io
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 import time
 import os
-from typing import Dict, Any
+import zipfile
+from typing import Dict, Any, List, Tuple
 
 from app import models #initialize_models, embed_model, reranker, faiss_index, metadata
-from app.pipeline import analyze_document
+from app import worker_pool
+from app.result_cache import result_key
+from app.uploads import SpooledUpload, new_spool_file, spool_multipart_files, too_large
+from app.document_io import get_ocr_cache, shutdown_ocr_pool
+from app.pipeline import (
+    analyze_document,
+    analyze_documents,
+    emit_document_events,
+    sort_clauses_by_risk
+)
 from app.schemas import (
     DocumentAnalysisResponse,
     HealthResponse,
     ReadinessResponse,
-    ErrorResponse
+    ErrorResponse,
+    JobSubmitResponse,
+    JobStatusResponse,
+    BatchAnalysisResponse
 )
 from app.exceptions import (
     LegalityAIException,
     ModelNotLoadedError,
     InvalidFileError,
-    FileProcessingError
+    FileProcessingError,
+    ServiceBusyError
 )
 from app.config import (
     CORS_ORIGINS,
@@ -36,7 +67,14 @@ from app.config import (
     CORS_ALLOW_METHODS,
     CORS_ALLOW_HEADERS,
     MAX_FILE_SIZE_BYTES,
-    LOG_LEVEL
+    MAX_BATCH_FILES,
+    UPLOAD_SPOOL_DIR,
+    LOG_LEVEL,
+    REFERENCE_RELOAD_INTERVAL_SECONDS,
+    ANALYSIS_POOL_KIND,
+    ANALYSIS_WORKERS,
+    ANALYSIS_QUEUE_MAX,
+    ANALYSIS_CACHE_SWEEP_SECONDS
 )
 
 # -------------------------------------------------
@@ -57,6 +95,28 @@ logger.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
 # Lifespan handler
 # -------------------------------------------------
 
+async def _watch_reference_set(interval: int):
+    """Hot-swap to newer reference artifacts published by app.build_index."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(models.reload_reference_set)
+        except Exception as e:
+            logger.error(f"Reference reload failed; keeping current set: {e}", exc_info=True)
+
+
+async def _sweep_analysis_cache(interval: int):
+    """Drop expired analyses (and their spooled PDFs) even if never read again."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await asyncio.to_thread(cleanup_expired_entries)
+            if removed:
+                logger.info(f"Analysis cache sweep removed {removed} entries")
+        except Exception as e:
+            logger.error(f"Analysis cache sweep failed: {e}", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application startup and shutdown."""
@@ -70,8 +130,25 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Failed to initialize models: {e}", exc_info=True)
         raise
-    
+
+    worker_pool.start_pool(ANALYSIS_POOL_KIND, ANALYSIS_WORKERS, ANALYSIS_QUEUE_MAX)
+
+    watcher = None
+    if REFERENCE_RELOAD_INTERVAL_SECONDS > 0:
+        watcher = asyncio.create_task(_watch_reference_set(REFERENCE_RELOAD_INTERVAL_SECONDS))
+
+    sweeper = None
+    if ANALYSIS_CACHE_SWEEP_SECONDS > 0:
+        sweeper = asyncio.create_task(_sweep_analysis_cache(ANALYSIS_CACHE_SWEEP_SECONDS))
+
     yield
+
+    if watcher is not None:
+        watcher.cancel()
+    if sweeper is not None:
+        sweeper.cancel()
+    worker_pool.shutdown_pool()
+    shutdown_ocr_pool()
     
     logger.info("=" * 60)
     logger.info("Shutting down application...")
@@ -142,6 +219,39 @@ async def log_requests(request: Request, call_next):
         raise
 
 
+# -------------------------------------------------
+# Upload size guard
+# -------------------------------------------------
+
+# Largest request body per upload route (plus room for multipart framing).
+# Checked against Content-Length before the body is read, so oversized
+# uploads are refused without being received at all; bodies without one
+# (chunked) are cut off by app.uploads once they pass the same limit.
+_MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+_UPLOAD_ROUTE_LIMITS = {
+    "/analyze": MAX_FILE_SIZE_BYTES + _MULTIPART_OVERHEAD_BYTES,
+    "/analyze/stream": MAX_FILE_SIZE_BYTES + _MULTIPART_OVERHEAD_BYTES,
+    "/jobs": MAX_FILE_SIZE_BYTES + _MULTIPART_OVERHEAD_BYTES,
+    "/analyze/batch": MAX_FILE_SIZE_BYTES * MAX_BATCH_FILES + _MULTIPART_OVERHEAD_BYTES
+}
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    limit = _UPLOAD_ROUTE_LIMITS.get(request.url.path) if request.method == "POST" else None
+    length = request.headers.get("content-length", "")
+    if limit and length.isdigit() and int(length) > limit:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content=ErrorResponse(
+                error="HTTPException",
+                message=f"Request too large. Maximum size: {limit / (1024 * 1024):.0f}MB",
+                detail=None
+            ).model_dump()
+        )
+    return await call_next(request)
+
+
 # -------------------------------------------------
 # Exception Handlers
 # -------------------------------------------------
@@ -153,8 +263,13 @@ async def legality_ai_exception_handler(request: Request, exc: LegalityAIExcepti
     
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     error_type = "InternalServerError"
+    headers = None
     
-    if isinstance(exc, ModelNotLoadedError):
+    if isinstance(exc, ServiceBusyError):
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        error_type = "ServiceBusy"
+        headers = {"Retry-After": str(exc.retry_after)}
+    elif isinstance(exc, ModelNotLoadedError):
         status_code = status.HTTP_503_SERVICE_UNAVAILABLE
         error_type = "ServiceUnavailable"
     elif isinstance(exc, InvalidFileError):
@@ -170,7 +285,8 @@ async def legality_ai_exception_handler(request: Request, exc: LegalityAIExcepti
             error=error_type,
             message=str(exc),
             detail=None
-        ).model_dump()
+        ).model_dump(),
+        headers=headers
     )
 
 
@@ -250,6 +366,189 @@ async def readiness_check():
         )
 
 
+@app.get(
+    "/metrics",
+    tags=["Health"],
+    summary="Runtime Metrics",
+    description="Cache hit rates and other runtime counters."
+)
+async def metrics() -> Dict[str, Any]:
+    """Snapshot of runtime counters."""
+    ref = models.reference
+    ocr_cache = get_ocr_cache()
+    return {
+        "embedding_cache": models.embedding_cache.stats() if models.embedding_cache else None,
+        "rerank_cache": models.rerank_cache.stats() if models.rerank_cache else None,
+        "result_cache": models.result_cache.stats() if models.result_cache else None,
+        "ocr_cache": ocr_cache.stats() if ocr_cache else None,
+        "analysis_cache": await asyncio.to_thread(cache_stats),
+        "analysis_pool": worker_pool.pool.stats() if worker_pool.pool else None,
+        "inference_scheduler": {
+            "embed": models.embed_scheduler.stats() if models.embed_scheduler else None,
+            "rerank": models.rerank_scheduler.stats() if models.rerank_scheduler else None
+        },
+        "reference": {
+            "reference_id": ref.reference_id,
+            "generation": ref.generation,
+            "count": ref.faiss_index.ntotal
+        } if ref else None,
+        "startup_memory": models.load_report
+    }
+
+
+# -------------------------------------------------
+# Upload validation
+# -------------------------------------------------
+
+# Zip members are inflated to spool files in chunks of this size
+_SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# OpenAPI request bodies of the upload routes, which read the multipart
+# stream themselves (app.uploads) instead of declaring UploadFile params
+_PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary", "description": "PDF file to analyze"}}
+        }}}
+    }
+}
+_BATCH_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {"files": {
+                "type": "array",
+                "items": {"type": "string", "format": "binary"},
+                "description": "PDF files and/or zip archives of PDFs"
+            }}
+        }}}
+    }
+}
+
+
+def _check_services_ready() -> None:
+    if not all([models.embed_model, models.reranker, models.faiss_index, models.metadata]):
+        raise ModelNotLoadedError("ML models are not loaded. Service is not ready.")
+    if worker_pool.pool is None:
+        raise ModelNotLoadedError("Analysis workers are not running. Service is not ready.")
+
+
+def _check_pdf_name(name: str) -> Tuple[str, int]:
+    if not name.lower().endswith(".pdf"):
+        raise InvalidFileError("Only PDF files are supported")
+    return ".pdf", MAX_FILE_SIZE_BYTES
+
+
+def _check_batch_name(name: str) -> Tuple[str, int]:
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        return ".zip", MAX_FILE_SIZE_BYTES * MAX_BATCH_FILES
+    if lower.endswith(".pdf"):
+        return ".pdf", MAX_FILE_SIZE_BYTES
+    raise InvalidFileError(f"{name}: only PDF or ZIP files are supported")
+
+
+async def _spool_pdf_upload(request: Request) -> SpooledUpload:
+    """Validate the uploaded PDF and stream it to a spool file."""
+    _check_services_ready()
+
+    (upload,) = await spool_multipart_files(
+        request,
+        "file",
+        _check_pdf_name,
+        _UPLOAD_ROUTE_LIMITS[request.url.path],
+        spool_dir=UPLOAD_SPOOL_DIR
+    )
+
+    logger.info(f"Processing file: {upload.filename} (Size: {upload.size / (1024 * 1024):.2f}MB)")
+    return upload
+
+
+def _pdfs_from_zip(name: str, zip_path: str) -> List[Tuple[str, str]]:
+    """Spool the PDF members of a zip, enforcing size limits while copying."""
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise InvalidFileError(f"{name}: not a valid zip archive")
+
+    docs: List[Tuple[str, str]] = []
+    try:
+        with archive:
+            for info in archive.infolist():
+                member = info.filename
+                if info.is_dir() or not member.lower().endswith(".pdf") or member.startswith("__MACOSX/"):
+                    continue
+                member_name = f"{name}/{member}"
+                if info.file_size == 0:
+                    raise InvalidFileError(f"{member_name}: empty file")
+                if info.file_size > MAX_FILE_SIZE_BYTES:
+                    raise too_large(member_name, MAX_FILE_SIZE_BYTES)
+
+                out, path = new_spool_file(".pdf", UPLOAD_SPOOL_DIR)
+                docs.append((member_name, path))
+                copied = 0
+                with out, archive.open(info) as src:
+                    # don't trust the header size; count what is actually inflated
+                    for chunk in iter(lambda: src.read(_SPOOL_CHUNK_BYTES), b""):
+                        copied += len(chunk)
+                        if copied > MAX_FILE_SIZE_BYTES:
+                            raise too_large(member_name, MAX_FILE_SIZE_BYTES)
+                        out.write(chunk)
+                if len(docs) > MAX_BATCH_FILES:
+                    break
+    except BaseException:
+        for _, path in docs:
+            discard_pdf(path)
+        raise
+    return docs
+
+
+async def _spool_batch_uploads(request: Request) -> List[Tuple[str, str]]:
+    """Validate /analyze/batch uploads (PDFs and/or zips of PDFs); returns (name, path) pairs."""
+    _check_services_ready()
+
+    uploads = await spool_multipart_files(
+        request,
+        "files",
+        _check_batch_name,
+        _UPLOAD_ROUTE_LIMITS[request.url.path],
+        max_files=MAX_BATCH_FILES,
+        spool_dir=UPLOAD_SPOOL_DIR
+    )
+
+    docs: List[Tuple[str, str]] = []
+    try:
+        for i, upload in enumerate(uploads):
+            if upload.path.endswith(".zip"):
+                try:
+                    docs.extend(await asyncio.to_thread(_pdfs_from_zip, upload.filename, upload.path))
+                finally:
+                    discard_pdf(upload.path)
+            else:
+                docs.append((upload.filename, upload.path))
+            # owned by docs (or gone) from here on
+            uploads[i] = None
+
+            if len(docs) > MAX_BATCH_FILES:
+                raise InvalidFileError(f"Too many documents. Maximum per batch: {MAX_BATCH_FILES}")
+
+        if not docs:
+            raise InvalidFileError("No PDF files found in upload")
+    except BaseException:
+        for upload in uploads:
+            if upload is not None:
+                discard_pdf(upload.path)
+        for _, path in docs:
+            discard_pdf(path)
+        raise
+    return docs
+
+
 # -------------------------------------------------
 # Main API Endpoint
 # -------------------------------------------------
@@ -278,19 +577,13 @@ async def readiness_check():
             "model": ErrorResponse
         },
         503: {
-            "description": "Service unavailable (models not loaded)",
+            "description": "Service unavailable (models not loaded or analysis queue full)",
             "model": ErrorResponse
         }
-    }
+    },
+    openapi_extra=_PDF_UPLOAD_BODY
 )
-async def analyze(
-    request: Request,
-    file: UploadFile = File(
-        ...,
-        description="PDF file to analyze"
-        # max_length=255
-    )
-):
+async def analyze(request: Request):
     """
     Analyze a PDF document for risky legal clauses.
     
@@ -301,63 +594,177 @@ async def analyze(
     - Per-label risk summaries
     - Detailed clause-level analysis with risk scores
     """
-    # Check if models are loaded
-    if not all([models.embed_model, models.reranker, models.faiss_index, models.metadata]):
-        raise ModelNotLoadedError("ML models are not loaded. Service is not ready.")
-    
-    # Validate file extension
-    if not file.filename:
-        raise InvalidFileError("Filename is required")
-    
-    if not file.filename.lower().endswith(".pdf"):
-        raise InvalidFileError("Only PDF files are supported")
+    upload = await _spool_pdf_upload(request)
+    pdf_path = upload.path
 
-    # Read file with size validation
     try:
-        pdf_bytes = await file.read()
-    except Exception as e:
-        logger.error(f"Error reading file: {e}")
-        raise InvalidFileError(f"Failed to read file: {str(e)}")
-    
-    # Validate file size
-    file_size = len(pdf_bytes)
-    if file_size == 0:
-        raise InvalidFileError("Empty file")
-    
-    if file_size > MAX_FILE_SIZE_BYTES:
-        max_size_mb = MAX_FILE_SIZE_BYTES / (1024 * 1024)
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size: {max_size_mb:.0f}MB"
-        )
-    
-    logger.info(
-        f"Processing file: {file.filename} "
-        f"(Size: {file_size / (1024 * 1024):.2f}MB)"
-    )
-    
-    # Process document
-    try:
-        result = analyze_document(pdf_bytes)
+        # Same PDF already analyzed with the same models, config and reference set
+        ref = models.reference
+        cache_key = None
+        if models.result_cache is not None:
+            cache_key = result_key(upload.sha256, ref.reference_id, ref.generation)
+            cached = await asyncio.to_thread(models.result_cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"Result cache hit for {upload.filename}")
+                analysis_id = await asyncio.to_thread(create_analysis_entry, pdf_path, cached)
+                return {
+                    "analysis_id": analysis_id,
+                    **cached
+                }
+
+        # Process document off the event loop; raises ServiceBusyError when saturated
+        result = await worker_pool.pool.run(analyze_document, pdf_path)
         logger.info(
-            f"Analysis complete for {file.filename}. "
+            f"Analysis complete for {upload.filename}. "
             f"Found {len(result.get('clauses', []))} risky clauses."
         )
 
-        analysis_id = create_analysis_entry(
-            pdf_bytes=pdf_bytes,
-            analysis_result=result
-        )
+        # skip if the reference set was swapped mid-analysis
+        if cache_key is not None and models.reference is ref:
+            await asyncio.to_thread(models.result_cache.put, cache_key, result)
+
+        analysis_id = await asyncio.to_thread(create_analysis_entry, pdf_path, result)
 
         # return analysis_id + original response (includes doc_score)
         return {
             "analysis_id": analysis_id,
             **result
         }
-    
+
+    except ServiceBusyError:
+        discard_pdf(pdf_path)
+        raise
     except Exception as e:
+        discard_pdf(pdf_path)
         logger.error(f"Error processing document: {e}", exc_info=True)
         raise FileProcessingError(f"Failed to process document: {str(e)}")
+    except BaseException:
+        discard_pdf(pdf_path)
+        raise
+
+@app.post(
+    "/analyze/batch",
+    response_model=BatchAnalysisResponse,
+    tags=["Analysis"],
+    summary="Analyze Many Documents",
+    description=(
+        "Upload several PDFs (or zip archives of PDFs) in one request. Clauses are "
+        "deduplicated across documents and scored together in large batches."
+    ),
+    responses={
+        400: {"description": "Invalid file or request", "model": ErrorResponse},
+        413: {"description": "File too large", "model": ErrorResponse},
+        503: {
+            "description": "Service unavailable (models not loaded or analysis queue full)",
+            "model": ErrorResponse
+        }
+    },
+    openapi_extra=_BATCH_UPLOAD_BODY
+)
+async def analyze_batch(request: Request):
+    """Analyze many documents with one scoring pass over their clauses."""
+    docs = await _spool_batch_uploads(request)
+    logger.info(f"Processing batch of {len(docs)} documents")
+
+    try:
+        results = await worker_pool.pool.run(analyze_documents, [path for _, path in docs])
+    except BaseException as e:
+        for _, path in docs:
+            discard_pdf(path)
+        if isinstance(e, ServiceBusyError) or not isinstance(e, Exception):
+            raise
+        logger.error(f"Error processing batch: {e}", exc_info=True)
+        raise FileProcessingError(f"Failed to process batch: {str(e)}")
+
+    documents = []
+    for (name, pdf_path), result in zip(docs, results):
+        if "error" in result:
+            discard_pdf(pdf_path)
+            documents.append({"filename": name, "error": result["error"]})
+            continue
+        analysis_id = await asyncio.to_thread(create_analysis_entry, pdf_path, result)
+        documents.append({"filename": name, "analysis_id": analysis_id, **result})
+
+    return {"documents": documents}
+
+
+@app.post(
+    "/analyze/stream",
+    tags=["Analysis"],
+    summary="Analyze Document (streaming)",
+    description=(
+        "Same analysis as /analyze, returned as newline-delimited JSON events: "
+        "'start', one 'clause' per risky clause as soon as it is scored, then "
+        "'summary' with document_risk, doc_score, label_summary and analysis_id."
+    ),
+    responses={
+        200: {"description": "NDJSON event stream", "content": {"application/x-ndjson": {}}},
+        400: {"description": "Invalid file or request", "model": ErrorResponse},
+        413: {"description": "File too large", "model": ErrorResponse},
+        503: {
+            "description": "Service unavailable (models not loaded or analysis queue full)",
+            "model": ErrorResponse
+        }
+    },
+    openapi_extra=_PDF_UPLOAD_BODY
+)
+async def analyze_stream(request: Request):
+    """Stream clause results while the document is being scored, with either pool kind."""
+    pdf_path = (await _spool_pdf_upload(request)).path
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def finished(future):
+        if future.cancelled():
+            emit({"event": "error", "message": "Analysis was cancelled"})
+        elif future.exception() is not None:
+            logger.error(f"Streaming analysis failed: {future.exception()}", exc_info=future.exception())
+            emit({"event": "error", "message": f"Failed to process document: {future.exception()}"})
+        emit(end)
+
+    # Admission happens here, so a full queue is still a plain 503. Events
+    # from process workers are relayed back as they happen, like threads'.
+    try:
+        future = worker_pool.pool.submit(emit_document_events, pdf_path, callbacks={"emit": emit})
+    except BaseException:
+        discard_pdf(pdf_path)
+        raise
+    future.add_done_callback(finished)
+
+    async def body():
+        clauses = []
+        stored = False
+        try:
+            while True:
+                event = await events.get()
+                if event is end:
+                    return
+                if event["event"] == "clause":
+                    clauses.append(event["clause"])
+                elif event["event"] == "summary":
+                    result = {
+                        "document_risk": event["document_risk"],
+                        "doc_score": event["doc_score"],
+                        "label_summary": event["label_summary"],
+                        "clauses": sort_clauses_by_risk(clauses)
+                    }
+                    event["analysis_id"] = await asyncio.to_thread(create_analysis_entry, pdf_path, result)
+                    stored = True
+                    logger.info(f"Streamed analysis complete. Found {len(clauses)} risky clauses.")
+                yield json.dumps(event) + "\n"
+        finally:
+            if not stored:
+                # Failed or client went away: drop the upload once the
+                # worker has stopped reading it.
+                future.add_done_callback(lambda _: discard_pdf(pdf_path))
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 
 @app.get(
     "/highlight/{analysis_id}",
@@ -365,7 +772,7 @@ async def analyze(
     summary="Download highlighted PDF from cached analysis"
 )
 async def download_highlighted_pdf(analysis_id: str):
-    entry = get_analysis_entry(analysis_id)
+    entry = await asyncio.to_thread(get_analysis_entry, analysis_id)
 
     if not entry:
         raise HTTPException(
@@ -373,8 +780,22 @@ async def download_highlighted_pdf(analysis_id: str):
             detail="Analysis expired or not found. Please re-analyze."
         )
 
-    highlighted_pdf = highlight_clauses_in_pdf(
-        pdf_bytes=entry["pdf_bytes"],
+    if entry.get("status") != JOB_DONE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Analysis is not finished (status: {entry.get('status')})"
+        )
+
+    pdf = await asyncio.to_thread(get_analysis_pdf, analysis_id)
+    if pdf is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Analysis expired or not found. Please re-analyze."
+        )
+
+    highlighted_pdf = await asyncio.to_thread(
+        highlight_clauses_in_pdf,
+        pdf=pdf,
         clauses=entry["result"].get("clauses", [])
     )
 
@@ -386,6 +807,107 @@ async def download_highlighted_pdf(analysis_id: str):
         }
     )
 
+# -------------------------------------------------
+# Background jobs
+# -------------------------------------------------
+
+def _job_done(analysis_id: str, future) -> None:
+    """Pool completion callback: move the job to done / failed."""
+    if future.cancelled():
+        fail_job(analysis_id, "Job was cancelled")
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Job {analysis_id} failed: {error}", exc_info=error)
+        fail_job(analysis_id, f"Failed to process document: {error}")
+        return
+    result = future.result()
+    logger.info(f"Job {analysis_id} complete. Found {len(result.get('clauses', []))} risky clauses.")
+    complete_job(analysis_id, result)
+
+
+@app.post(
+    "/jobs",
+    response_model=JobSubmitResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Jobs"],
+    summary="Submit Analysis Job",
+    description="Upload a PDF and return immediately; poll /jobs/{analysis_id} for progress.",
+    responses={
+        400: {"description": "Invalid file or request", "model": ErrorResponse},
+        413: {"description": "File too large", "model": ErrorResponse},
+        503: {
+            "description": "Service unavailable (models not loaded or analysis queue full)",
+            "model": ErrorResponse
+        }
+    },
+    openapi_extra=_PDF_UPLOAD_BODY
+)
+async def submit_job(request: Request):
+    """Queue a document for background analysis."""
+    upload = await _spool_pdf_upload(request)
+    pdf_path = upload.path
+    analysis_id = await asyncio.to_thread(create_job_entry, pdf_path)
+
+    def progress(stage, stage_status):
+        update_job_stage(analysis_id, stage, stage_status)
+
+    try:
+        future = worker_pool.pool.submit(analyze_document, pdf_path, callbacks={"progress": progress})
+    except ServiceBusyError:
+        await asyncio.to_thread(delete_analysis_entry, analysis_id)
+        raise
+    future.add_done_callback(lambda f: _job_done(analysis_id, f))
+
+    logger.info(f"Queued job {analysis_id} for {upload.filename}")
+    return JobSubmitResponse(analysis_id=analysis_id, status="queued")
+
+
+@app.get(
+    "/jobs/{analysis_id}",
+    response_model=JobStatusResponse,
+    tags=["Jobs"],
+    summary="Job Status",
+    description="Status and per-stage progress of an analysis job."
+)
+async def job_status(analysis_id: str):
+    job = await asyncio.to_thread(get_job_status, analysis_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job expired or not found.")
+    return JobStatusResponse(**job)
+
+
+@app.get(
+    "/jobs/{analysis_id}/result",
+    response_model=DocumentAnalysisResponse,
+    tags=["Jobs"],
+    summary="Job Result",
+    description="Analysis result of a finished job.",
+    responses={
+        404: {"description": "Job expired or not found", "model": ErrorResponse},
+        409: {"description": "Job not finished yet", "model": ErrorResponse},
+        422: {"description": "Job failed", "model": ErrorResponse}
+    }
+)
+async def job_result(analysis_id: str):
+    entry = await asyncio.to_thread(get_analysis_entry, analysis_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Job expired or not found.")
+
+    if entry["status"] == JOB_FAILED:
+        raise FileProcessingError(entry.get("error") or "Failed to process document")
+    if entry["status"] != JOB_DONE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is not finished (status: {entry['status']})"
+        )
+
+    return {
+        "analysis_id": analysis_id,
+        **entry["result"]
+    }
+
+
 # -------------------------------------------------
 # Root endpoint
 # -------------------------------------------------
@@ -0,0 +1,234 @@
+# app/metadata_store.py
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Layout
+# ---------------------------------------
+#
+#   <dir>/meta.json                 {"count": n, "source": {...}}
+#   <dir>/label_vocab.json          ["non_compete", ...]  (id -> label)
+#   <dir>/labels.npy                (n,) int32 label ids
+#   <dir>/<field>.offsets.npy       (n + 1,) int64 byte offsets into <field>.bin
+#   <dir>/<field>.bin               utf-8 text of every row, concatenated
+#
+# Everything except the tiny JSON files is memory-mapped on open.
+# Builds are staged in .<dir>.build.* next to it and swapped in while
+# holding an flock on <dir>.lock.
+
+TEXT_FIELDS = ("answer_text", "source_title")
+
+
+def normalize_label(label) -> str:
+    """Canonical label token used by config (lowercase + underscores)."""
+    if not isinstance(label, str):
+        return ""
+    return label.lower().replace("-", "_").replace(" ", "_")
+
+
+@contextlib.contextmanager
+def _store_lock(directory: str):
+    """
+    Exclusive lock on `<directory>.lock`, held by every process that
+    checks or swaps the store, so concurrent rebuilds take turns.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    with open(os.path.abspath(directory) + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _swap_into_place(staging: str, directory: str):
+    """Replace `directory` with the finished `staging` directory (caller holds the lock)."""
+    old = None
+    if os.path.exists(directory):
+        old = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.old.", dir=os.path.dirname(staging))
+        os.rename(directory, os.path.join(old, "store"))
+    os.rename(staging, directory)
+    if old is not None:
+        # Stores already open keep their memory maps of the unlinked files.
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _is_built_from(directory: str, stat: os.stat_result) -> bool:
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        source = json.load(f).get("source", {})
+    return source.get("size") == stat.st_size and source.get("mtime") == stat.st_mtime
+
+
+class MetadataStore:
+    """
+    Read-only, columnar view of the reference clause metadata.
+
+    The hot path works with integer label ids (`label_ids`) and decodes
+    text only on demand via `answer_text(i)` / `source_title(i)` /
+    `label_name(label_id)`. `store[i]` still returns the old dict shape.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, "label_vocab.json"), "r", encoding="utf-8") as f:
+            self.label_names: List[str] = json.load(f)
+        self._label_to_id = {name: i for i, name in enumerate(self.label_names)}
+
+        self.label_ids = np.load(os.path.join(directory, "labels.npy"), mmap_mode="r")
+
+        self._offsets = {}
+        self._blobs = {}
+        for field in TEXT_FIELDS:
+            self._offsets[field] = np.load(
+                os.path.join(directory, f"{field}.offsets.npy"), mmap_mode="r"
+            )
+            blob_path = os.path.join(directory, f"{field}.bin")
+            # np.memmap refuses zero-length files
+            if os.path.getsize(blob_path) > 0:
+                self._blobs[field] = np.memmap(blob_path, dtype=np.uint8, mode="r")
+            else:
+                self._blobs[field] = np.empty(0, dtype=np.uint8)
+
+        if len(self.label_ids) != self.meta["count"]:
+            raise ValueError(f"Metadata store at {directory} is inconsistent")
+
+    # ---- accessors ----
+
+    def __len__(self) -> int:
+        return len(self.label_ids)
+
+    def _text(self, field: str, i: int) -> str:
+        offsets = self._offsets[field]
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        return self._blobs[field][start:end].tobytes().decode("utf-8")
+
+    def answer_text(self, i: int) -> str:
+        return self._text("answer_text", i)
+
+    def source_title(self, i: int) -> str:
+        return self._text("source_title", i)
+
+    def label_id(self, i: int) -> int:
+        return int(self.label_ids[i])
+
+    def label_name(self, label_id: int) -> str:
+        return self.label_names[label_id]
+
+    def id_for_label(self, label: str) -> Optional[int]:
+        return self._label_to_id.get(normalize_label(label))
+
+    def __getitem__(self, i: int) -> Dict:
+        return {
+            "label": self.label_name(self.label_id(i)),
+            "answer_text": self.answer_text(i),
+            "source_title": self.source_title(i)
+        }
+
+    # ---- building ----
+
+    @staticmethod
+    def write(records: Iterable[Dict], directory: str, source: Optional[Dict] = None) -> int:
+        """
+        Write records ({"label", "answer_text", "source_title"}) as a store.
+
+        The store is built in a uniquely named sibling directory and renamed
+        over `directory` under the store lock, so concurrent writers never
+        share a temp file and a reader never sees a mix of two builds.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.build.", dir=parent)
+        try:
+            count = MetadataStore._write_files(records, staging, source)
+            with _store_lock(directory):
+                _swap_into_place(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return count
+
+    @staticmethod
+    def _write_files(records: Iterable[Dict], directory: str, source: Optional[Dict]) -> int:
+        vocab: Dict[str, int] = {}
+        label_ids = []
+        offsets = {field: [0] for field in TEXT_FIELDS}
+        chunks = {field: [] for field in TEXT_FIELDS}
+
+        for rec in records:
+            label = normalize_label(rec.get("label", ""))
+            label_ids.append(vocab.setdefault(label, len(vocab)))
+            for field in TEXT_FIELDS:
+                data = (rec.get(field) or "").encode("utf-8")
+                chunks[field].append(data)
+                offsets[field].append(offsets[field][-1] + len(data))
+
+        np.save(os.path.join(directory, "labels.npy"), np.asarray(label_ids, dtype=np.int32))
+        for field in TEXT_FIELDS:
+            np.save(os.path.join(directory, f"{field}.offsets.npy"), np.asarray(offsets[field], dtype=np.int64))
+            with open(os.path.join(directory, f"{field}.bin"), "wb") as f:
+                f.write(b"".join(chunks[field]))
+        with open(os.path.join(directory, "label_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(list(vocab), f)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": len(label_ids), "source": source or {}}, f)
+        return len(label_ids)
+
+    @classmethod
+    def from_jsonl(cls, jsonl_path: str, directory: str) -> "MetadataStore":
+        """Convert metadata.jsonl into a store at `directory` and open it."""
+        stat = os.stat(jsonl_path)
+
+        def _records():
+            with open(jsonl_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        count = cls.write(
+            _records(),
+            directory,
+            source={"path": os.path.abspath(jsonl_path), "size": stat.st_size, "mtime": stat.st_mtime}
+        )
+        logger.info(f"Built metadata store at {directory} from {jsonl_path} ({count} records)")
+        with _store_lock(directory):
+            return cls(directory)
+
+    @classmethod
+    def load(cls, jsonl_path: str, directory: str) -> "MetadataStore":
+        """
+        Open the store at `directory`, (re)building it from `jsonl_path`
+        when the JSONL exists and differs from what the store was built from.
+
+        Workers starting together may all rebuild; each opens the store
+        under the lock, so none opens one that another is swapping out.
+        """
+        if not os.path.exists(jsonl_path):
+            with _store_lock(directory):
+                if not os.path.exists(os.path.join(directory, "meta.json")):
+                    raise FileNotFoundError(f"Neither {jsonl_path} nor a metadata store at {directory} exists")
+                return cls(directory)
+
+        stat = os.stat(jsonl_path)
+        with _store_lock(directory):
+            if _is_built_from(directory, stat):
+                return cls(directory)
+
+        return cls.from_jsonl(jsonl_path, directory)
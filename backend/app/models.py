@@ -1,20 +1,55 @@
 # app/models.py
 
+import hashlib
 import json
+import os
 import numpy as np
 import faiss
+import psutil
+import threading
 import torch
 import logging
+from typing import NamedTuple, Optional
 from sentence_transformers import SentenceTransformer, CrossEncoder
 
 from app.config import (
     EMBED_MODEL_NAME,
     RERANKER_MODEL_NAME,
+    DEFAULT_FAISS_DIR,
     FAISS_INDEX_PATH,
     METADATA_PATH,
+    METADATA_STORE_DIR,
+    MANIFEST_PATH,
+    VERIFY_ARTIFACT_CHECKSUMS,
     PRIMARY_EMBS_PATH,
-    USE_GPU
+    MMAP_ARTIFACTS,
+    USE_GPU,
+    IDENTITY_INDEX,
+    IDENTITY_MATMUL_MAX_REFS,
+    IDENTITY_BLOCK_ROWS,
+    IDENTITY_HNSW_M,
+    IDENTITY_HNSW_EF_SEARCH,
+    EMBED_CACHE_ENABLED,
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_MAX_ENTRIES,
+    RERANK_CACHE_ENABLED,
+    RERANK_CACHE_MAX_ENTRIES,
+    RERANK_CACHE_DB_PATH,
+    RERANK_CACHE_DB_MAX_ENTRIES,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_DB_PATH,
+    RESULT_CACHE_MAX_ENTRIES,
+    INFERENCE_SCHEDULER_ENABLED,
+    INFERENCE_MAX_WAIT_MS,
+    EMBED_SCHEDULER_MAX_BATCH,
+    RERANK_SCHEDULER_MAX_BATCH
 )
+from app.embedding_cache import EmbeddingCache
+from app.inference_scheduler import MicroBatcher
+from app.rerank_cache import RerankScoreCache
+from app.result_cache import ResultCache
+from app.metadata_store import MetadataStore
+from app.exceptions import ConfigurationError
 
 # -------------------------------------------------
 # Logger
@@ -34,6 +69,16 @@ reranker = None
 faiss_index = None
 metadata = None
 primary_embs = None
+identity_index = None
+embedding_cache = None
+rerank_cache = None
+result_cache = None
+manifest = None
+embed_scheduler = None
+rerank_scheduler = None
+
+# RSS before/after each artifact loaded by initialize_models()
+load_report = []
 
 
 # -------------------------------------------------
@@ -66,39 +111,399 @@ def load_reranker():
     logger.info("Reranker model loaded successfully.")
 
 
+def load_embedding_cache():
+    global embedding_cache
+    if not EMBED_CACHE_ENABLED:
+        logger.info("Embedding cache disabled.")
+        embedding_cache = None
+        return
+    embedding_cache = EmbeddingCache(
+        directory=EMBED_CACHE_DIR,
+        model_name=EMBED_MODEL_NAME,
+        dim=embed_model.get_sentence_embedding_dimension(),
+        max_entries=EMBED_CACHE_MAX_ENTRIES
+    )
+
+
+def load_rerank_cache():
+    global rerank_cache
+    if not RERANK_CACHE_ENABLED:
+        logger.info("Rerank score cache disabled.")
+        rerank_cache = None
+        return
+    rerank_cache = RerankScoreCache(
+        model_name=RERANKER_MODEL_NAME,
+        max_entries=RERANK_CACHE_MAX_ENTRIES,
+        db_path=RERANK_CACHE_DB_PATH,
+        db_max_entries=RERANK_CACHE_DB_MAX_ENTRIES
+    )
+
+
+def load_result_cache():
+    global result_cache
+    if not RESULT_CACHE_ENABLED:
+        logger.info("Result cache disabled.")
+        result_cache = None
+        return
+    result_cache = ResultCache(
+        db_path=RESULT_CACHE_DB_PATH,
+        max_entries=RESULT_CACHE_MAX_ENTRIES
+    )
+
+
+def load_inference_schedulers():
+    """
+    Put a MicroBatcher in front of each model. Callers submit through
+    models.embed_scheduler / models.rerank_scheduler when they are set.
+    """
+    global embed_scheduler, rerank_scheduler
+    for scheduler in (embed_scheduler, rerank_scheduler):
+        if scheduler is not None:
+            scheduler.close()
+    embed_scheduler = rerank_scheduler = None
+
+    if not INFERENCE_SCHEDULER_ENABLED:
+        logger.info("Inference scheduler disabled.")
+        return
+
+    model, ce = embed_model, reranker
+    embed_scheduler = MicroBatcher(
+        "embed",
+        lambda texts: model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            batch_size=len(texts)
+        ).astype("float32"),
+        max_batch_size=EMBED_SCHEDULER_MAX_BATCH,
+        max_wait_ms=INFERENCE_MAX_WAIT_MS
+    )
+    rerank_scheduler = MicroBatcher(
+        "rerank",
+        lambda pairs: ce.predict(pairs, batch_size=len(pairs)),
+        max_batch_size=RERANK_SCHEDULER_MAX_BATCH,
+        max_wait_ms=INFERENCE_MAX_WAIT_MS
+    )
+
+
+# -------------------------------------------------
+# Artifact manifest
+# -------------------------------------------------
+
+INDEX_NAME = "clauses.index"
+PRIMARY_EMBS_NAME = "primary_embs.npy"
+METADATA_NAME = "metadata.jsonl"
+METADATA_STORE_NAME = "metadata_store"
+MANIFEST_NAME = "manifest.json"
+
+# app.build_index publishes each generation into its own directory under
+# <FAISS_DIR>/generations/ and then atomically rewrites <FAISS_DIR>/CURRENT
+# to name it, so readers see either the old generation or the new one.
+CURRENT_NAME = "CURRENT"
+GENERATIONS_DIR = "generations"
+
+
+class ArtifactPaths(NamedTuple):
+    faiss_index: str
+    primary_embs: str
+    metadata: str
+    metadata_store: str
+    manifest: str
+
+
+def generation_paths(directory: str) -> ArtifactPaths:
+    """The artifact files of the build published in `directory`."""
+    return ArtifactPaths(
+        os.path.join(directory, INDEX_NAME),
+        os.path.join(directory, PRIMARY_EMBS_NAME),
+        os.path.join(directory, METADATA_NAME),
+        os.path.join(directory, METADATA_STORE_NAME),
+        os.path.join(directory, MANIFEST_NAME)
+    )
+
+
+def current_generation_dir(root: str) -> Optional[str]:
+    """Generation directory named by `<root>/CURRENT`, or None if there is no pointer."""
+    try:
+        with open(os.path.join(root, CURRENT_NAME), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, name)
+
+
+def served_artifact_paths() -> ArtifactPaths:
+    """
+    Paths of the artifacts to serve: the current generation under
+    FAISS_DIR, or the individually configured paths when no generation
+    has been published (artifacts copied in by hand).
+    """
+    directory = current_generation_dir(DEFAULT_FAISS_DIR)
+    if directory is not None:
+        return generation_paths(directory)
+    return ArtifactPaths(FAISS_INDEX_PATH, PRIMARY_EMBS_PATH, METADATA_PATH, METADATA_STORE_DIR, MANIFEST_PATH)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_manifest(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_manifest(paths: ArtifactPaths):
+    global manifest
+    manifest = read_manifest(paths.manifest)
+    if manifest is not None:
+        logger.info(
+            f"Artifact manifest: model={manifest.get('model_name')} "
+            f"count={manifest.get('count')} generation={manifest.get('generation')}"
+        )
+    else:
+        logger.warning(f"No artifact manifest at {paths.manifest}; artifacts are not validated")
+
+
+def _check_manifest(manifest, faiss_index, primary_embs, metadata, paths: ArtifactPaths):
+    if manifest is None:
+        return
+
+    problems = []
+    if manifest.get("model_name") != EMBED_MODEL_NAME:
+        problems.append(
+            f"artifacts were embedded with {manifest.get('model_name')!r} "
+            f"but EMBED_MODEL_NAME is {EMBED_MODEL_NAME!r}"
+        )
+    if manifest.get("dim") != primary_embs.shape[1]:
+        problems.append(f"manifest dim {manifest.get('dim')} != primary_embs dim {primary_embs.shape[1]}")
+    if manifest.get("index_dim") != faiss_index.d:
+        problems.append(f"manifest index_dim {manifest.get('index_dim')} != FAISS dim {faiss_index.d}")
+    for name, actual in (
+        ("FAISS index", faiss_index.ntotal),
+        ("primary_embs", primary_embs.shape[0]),
+        ("metadata", len(metadata))
+    ):
+        if manifest.get("count") != actual:
+            problems.append(f"manifest count {manifest.get('count')} != {name} rows {actual}")
+
+    if VERIFY_ARTIFACT_CHECKSUMS:
+        files = {
+            INDEX_NAME: paths.faiss_index,
+            PRIMARY_EMBS_NAME: paths.primary_embs,
+            METADATA_NAME: paths.metadata
+        }
+        for name, expected in manifest.get("files", {}).items():
+            path = files.get(name)
+            if path and os.path.exists(path) and file_sha256(path) != expected:
+                problems.append(f"checksum mismatch for {path}")
+
+    if problems:
+        raise ConfigurationError("Artifact manifest validation failed: " + "; ".join(problems))
+
+
+def validate_manifest(paths: ArtifactPaths):
+    """
+    Check loaded artifacts against the manifest written by app.build_index.
+    """
+    _check_manifest(manifest, faiss_index, primary_embs, metadata, paths)
+    if manifest is not None:
+        logger.info("Artifacts match manifest.")
+
+
 # -------------------------------------------------
 # FAISS + metadata loading
 # -------------------------------------------------
 
-def load_faiss_index():
-    global faiss_index
-    logger.info(f"Loading FAISS index from {FAISS_INDEX_PATH}...")
-    faiss_index = faiss.read_index(FAISS_INDEX_PATH)
+def _read_faiss_index(paths: ArtifactPaths):
+    logger.info(f"Loading FAISS index from {paths.faiss_index}...")
+    if MMAP_ARTIFACTS:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            index = faiss.read_index(paths.faiss_index, flags)
+            logger.info("FAISS index memory-mapped successfully.")
+            return index
+        except RuntimeError as e:
+            logger.warning(f"FAISS index cannot be memory-mapped ({e}); loading into memory")
+    index = faiss.read_index(paths.faiss_index)
     logger.info("FAISS index loaded successfully.")
+    return index
 
 
-def load_metadata_and_embeddings():
-    global metadata, primary_embs
+def load_faiss_index(paths: ArtifactPaths):
+    global faiss_index
+    faiss_index = _read_faiss_index(paths)
 
-    logger.info(f"Loading metadata from {METADATA_PATH}...")
-    with open(METADATA_PATH, "r", encoding="utf-8") as f:
-        metadata = [json.loads(line) for line in f]
-        # Normalize label tokens to canonical form used by config (lowercase + underscores)
-        for m in metadata:
-            lbl = m.get("label", "")
-            if isinstance(lbl, str):
-                normalized = lbl.lower().replace("-", "_").replace(" ", "_")
-                m["label"] = normalized
 
-    logger.info(f"Loaded {len(metadata)} metadata records.")
+def _read_metadata_and_embeddings(paths: ArtifactPaths):
+    logger.info(f"Loading metadata from {paths.metadata}...")
+    # Labels are normalized to the canonical form used by config
+    # (lowercase + underscores) when the store is built.
+    store = MetadataStore.load(paths.metadata, paths.metadata_store)
 
-    logger.info(f"Loading primary embeddings from {PRIMARY_EMBS_PATH}...")
-    primary_embs = np.load(PRIMARY_EMBS_PATH)
-    logger.info(f"Loaded primary embeddings: shape={primary_embs.shape}")
+    logger.info(f"Loaded {len(store)} metadata records.")
 
-    assert len(metadata) == primary_embs.shape[0], (
+    logger.info(f"Loading primary embeddings from {paths.primary_embs}...")
+    embs = np.load(paths.primary_embs, mmap_mode="r" if MMAP_ARTIFACTS else None)
+    logger.info(
+        f"Loaded primary embeddings: shape={embs.shape}"
+        f"{' (memory-mapped)' if isinstance(embs, np.memmap) else ''}"
+    )
+
+    assert len(store) == embs.shape[0], (
         "Metadata and embedding count mismatch"
     )
+    return store, embs
+
+
+def load_metadata_and_embeddings(paths: ArtifactPaths):
+    global metadata, primary_embs
+    metadata, primary_embs = _read_metadata_and_embeddings(paths)
+
+
+def _make_identity_index(primary_embs):
+    n_refs, dim = primary_embs.shape
+    kind = IDENTITY_INDEX
+    if kind == "auto":
+        if n_refs <= IDENTITY_MATMUL_MAX_REFS:
+            kind = "blocked"
+        else:
+            kind = "flat"
+
+    if kind == "blocked":
+        logger.info(f"Identity scoring backend: blocked over {n_refs} references")
+        return None
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, IDENTITY_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = IDENTITY_HNSW_EF_SEARCH
+    else:
+        raise ValueError(f"Unknown IDENTITY_INDEX '{IDENTITY_INDEX}'")
+
+    # In blocks, so a memory-mapped primary_embs is never paged in whole
+    # next to the index's own copy
+    for start in range(0, n_refs, IDENTITY_BLOCK_ROWS):
+        index.add(np.ascontiguousarray(primary_embs[start:start + IDENTITY_BLOCK_ROWS], dtype="float32"))
+
+    logger.info(f"Identity scoring backend: {kind} over {n_refs} references")
+    return index
+
+
+def build_identity_index():
+    """
+    Build the inner-product index used for identity scoring.
+
+    Leaves identity_index as None when the blocked matmul fallback is
+    selected; scoring then streams over primary_embs in blocks.
+    """
+    global identity_index
+    identity_index = _make_identity_index(primary_embs)
+
+
+# -------------------------------------------------
+# Reference set (hot-swappable)
+# -------------------------------------------------
+
+class ReferenceSet:
+    """
+    One consistent generation of the reference artifacts.
+
+    Scoring reads `models.reference` once per batch and uses only that
+    object, so a hot swap never mixes an index from one generation with
+    embeddings or metadata from another.
+    """
+
+    __slots__ = ("faiss_index", "primary_embs", "metadata", "identity_index", "manifest")
+
+    def __init__(self, faiss_index, primary_embs, metadata, identity_index, manifest):
+        self.faiss_index = faiss_index
+        self.primary_embs = primary_embs
+        self.metadata = metadata
+        self.identity_index = identity_index
+        self.manifest = manifest
+
+    @property
+    def generation(self) -> int:
+        return int((self.manifest or {}).get("generation", 0))
+
+    @property
+    def reference_id(self) -> str:
+        """Stable across appends; changes when the set is rebuilt and index_ids are reassigned."""
+        return (self.manifest or {}).get("reference_id", "unversioned")
+
+
+reference = None
+_reload_lock = threading.Lock()
+
+
+def _publish_reference(ref: ReferenceSet):
+    """
+    Make `ref` current. `reference` is the one atomic switch; the legacy
+    module attributes are refreshed right after for readers such as /ready.
+    """
+    global reference, faiss_index, primary_embs, metadata, identity_index, manifest
+    reference = ref
+    faiss_index = ref.faiss_index
+    primary_embs = ref.primary_embs
+    metadata = ref.metadata
+    identity_index = ref.identity_index
+    manifest = ref.manifest
+
+
+def reload_reference_set(force: bool = False) -> bool:
+    """
+    Load the current generation (see served_artifact_paths) and swap it
+    in if it is newer than the one being served. Returns True when a swap
+    happened.
+
+    Requests already scoring keep their snapshot of the old generation;
+    new requests see the new one. A generation that fails validation is
+    not published and the current one keeps serving.
+    """
+    with _reload_lock:
+        paths = served_artifact_paths()
+        new_manifest = read_manifest(paths.manifest)
+        current = reference.generation if reference is not None else -1
+        new_generation = int((new_manifest or {}).get("generation", 0))
+        if not force and new_generation <= current:
+            return False
+
+        logger.info(f"Loading reference generation {new_generation} (serving {current})...")
+        new_index = _read_faiss_index(paths)
+        new_metadata, new_embs = _read_metadata_and_embeddings(paths)
+        _check_manifest(new_manifest, new_index, new_embs, new_metadata, paths)
+        new_identity = _make_identity_index(new_embs)
+
+        _publish_reference(ReferenceSet(new_index, new_embs, new_metadata, new_identity, new_manifest))
+        logger.info(f"Now serving reference generation {new_generation} ({len(new_metadata)} clauses)")
+        return True
+
+
+# -------------------------------------------------
+# Memory accounting
+# -------------------------------------------------
+
+def _rss_mb() -> float:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _load_with_report(name: str, loader):
+    before = _rss_mb()
+    loader()
+    after = _rss_mb()
+    load_report.append({
+        "artifact": name,
+        "rss_before_mb": round(before, 1),
+        "rss_after_mb": round(after, 1)
+    })
+    logger.info(f"[RSS] {name}: {before:.1f} MB -> {after:.1f} MB ({after - before:+.1f} MB)")
 
 
 # -------------------------------------------------
@@ -114,10 +519,21 @@ def initialize_models():
     # logger.info("==== Model initialization complete ====")
     logger.info("==== Initializing ML models & indexes ====")
 
-    load_embedding_model()
-    load_reranker()
-    load_faiss_index()
-    load_metadata_and_embeddings()
+    load_report.clear()
+    # Resolved once, so every artifact below comes from the same generation
+    paths = served_artifact_paths()
+    load_manifest(paths)
+    _load_with_report("embedding_model", load_embedding_model)
+    _load_with_report("embedding_cache", load_embedding_cache)
+    _load_with_report("reranker", load_reranker)
+    _load_with_report("rerank_cache", load_rerank_cache)
+    _load_with_report("result_cache", load_result_cache)
+    load_inference_schedulers()
+    _load_with_report("faiss_index", lambda: load_faiss_index(paths))
+    _load_with_report("metadata_and_embeddings", lambda: load_metadata_and_embeddings(paths))
+    _load_with_report("identity_index", build_identity_index)
+    validate_manifest(paths)
+    _publish_reference(ReferenceSet(faiss_index, primary_embs, metadata, identity_index, manifest))
 
     # ----------------------------
     # Sanity checks (CRITICAL)
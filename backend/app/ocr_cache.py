@@ -0,0 +1,139 @@
+# app/ocr_cache.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Key helpers
+# ---------------------------------------
+
+
+def page_key(doc: fitz.Document, page: fitz.Page, scope: str) -> str:
+    """
+    Content address of a page as OCR sees it: its geometry, content
+    stream and the raw streams of the images and form XObjects it draws,
+    under `scope` (render DPI and tesseract settings). Computing it reads
+    the PDF objects but renders nothing.
+    """
+    digest = hashlib.sha256(scope.encode("utf-8"))
+    digest.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    digest.update(page.read_contents())
+    xrefs = {image[0] for image in page.get_images(full=True)}
+    xrefs.update(xobject[0] for xobject in page.get_xobjects())
+    for xref in sorted(xrefs):
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    return digest.hexdigest()
+
+
+# ---------------------------------------
+# SQLite store
+# ---------------------------------------
+
+class OcrCache:
+    """
+    Persistent cache of raw tesseract output per page, so scanned pages
+    that recur across uploads (exhibits, standard forms) are not rendered
+    and OCRed again. Bounded to `max_bytes` of text, least recently used
+    first; workers on one host can share `db_path`.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_pages ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_pages_lru ON ocr_pages (last_access)")
+        self._db.commit()
+        logger.info(f"OCR cache persisted to {db_path}")
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Cached text of the pages in `keys` (missing keys are left out)."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                rows = self._db.execute(
+                    f"SELECT key, text FROM ocr_pages WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE ocr_pages SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._db.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        now = time.time()
+        rows = [(key, text, len(text.encode("utf-8")), now) for key, text in items]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO ocr_pages (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM ocr_pages ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM ocr_pages WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_pages"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0
+        }
@@ -2,17 +2,23 @@ import fitz  # PyMuPDF
 import logging
 from typing import List, Dict
 
+from app.document_io import PdfSource, open_pdf_fitz
+
 logger = logging.getLogger(__name__)
 
 def highlight_clauses_in_pdf(
-    pdf_bytes: bytes,
+    pdf: PdfSource,
     clauses: List[Dict]
 ) -> bytes:
     """
-    Given original PDF bytes and analyze() response clauses,
+    Given the original PDF (bytes or path) and analyze() response clauses,
     return a new PDF with highlighted clauses.
+
+    Clauses carrying "boxes" (see chunking.chunk_page_text) are drawn
+    from them directly; only clauses without boxes, e.g. from OCR'd
+    pages, fall back to searching the page for their text.
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    doc = open_pdf_fitz(pdf)
 
     for clause in clauses:
         page_no = clause.get("page_no")
@@ -27,22 +33,35 @@ def highlight_clauses_in_pdf(
 
         page = doc[page_index]
 
-        # Primary search
-        matches = page.search_for(text)
+        boxes = clause.get("boxes")
+        if boxes:
+            matches = [fitz.Rect(box) for box in boxes]
+        else:
+            matches = _search_clause(page, text)
 
-        # Fallback: search first 200 chars if exact match fails
         if not matches:
-            snippet = text[:200]
-            matches = page.search_for(snippet)
+            continue
 
-        for rect in matches:
-            annot = page.add_highlight_annot(rect)
-            annot.set_info(
-                title="Legality-AI",
-                content="Detected risky clause"
-            )
-            annot.update()
+        # one annotation per clause, covering all its lines
+        annot = page.add_highlight_annot(quads=[rect.quad for rect in matches])
+        annot.set_info(
+            title="Legality-AI",
+            content="Detected risky clause"
+        )
+        annot.update()
 
     output = doc.tobytes()
     doc.close()
     return output
+
+
+def _search_clause(page: fitz.Page, text: str) -> List[fitz.Rect]:
+    # Primary search
+    matches = page.search_for(text)
+
+    # Fallback: search first 200 chars if exact match fails
+    if not matches:
+        snippet = text[:200]
+        matches = page.search_for(snippet)
+
+    return matches
@@ -1,14 +1,16 @@
 # app/pipeline.py
 
 from collections import defaultdict
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional
 import re
 
 import logging
-from app.document_io import extract_pages_from_pdf_bytes
+from app.document_io import PdfSource, extract_pages_from_pdf
 from app.chunking import chunk_pages, deduplicate_chunks
 from app.scoring import score_clauses_batch
-from app.config import RISK_THRESHOLDS, RISK_BANDS, WEIGHTS
+from app.progress import ProgressCallback, report
+from app.config import RISK_THRESHOLDS, RISK_BANDS, WEIGHTS, STREAM_BLOCK_CLAUSES
+import app.models as models
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -88,14 +90,20 @@ def extract_clause_labels(score_out: Dict) -> List[Dict]:
     Convert top_matches into per-label signals.
     Each clause may map to multiple labels.
     """
-    label_to_score = {}
+    # Aggregate on integer label ids; names are decoded once per label below.
+    label_id_to_score = {}
 
     for match in score_out["top_matches"]:
-        raw_label = match["label"]
-        label = raw_label.lower().replace("-", "_").replace(" ", "_")
+        label_id = match["label_id"]
         score = match["score"]
 
-        label_to_score[label] = max(label_to_score.get(label, 0.0), score)
+        label_id_to_score[label_id] = max(label_id_to_score.get(label_id, 0.0), score)
+
+    label_names = score_out.get("label_names") or models.reference.metadata.label_names
+    label_to_score = {
+        label_names[label_id]: score
+        for label_id, score in label_id_to_score.items()
+    }
 
     labels = []
     for label, semantic_score in label_to_score.items():
@@ -182,8 +190,86 @@ def _merge_labels(label_lists: List[List[Dict]]) -> List[Dict]:
     out.sort(key=lambda x: x["final_score"], reverse=True)
     return out
 
+def _risky_clause(chunk: Dict, score_out: Optional[Dict]) -> Optional[Dict]:
+    """
+    Per-label signals for one scored chunk, after semantic gates.
+    Returns None unless at least one label is not SAFE/LOW.
+    """
+    if score_out is None:
+        return None
+
+    labels_all = extract_clause_labels(score_out)  # returns per-label dicts with final_score and band
+
+    # --------------------------------------------------
+    # NON-COMPETE SEMANTIC GATE (POST-SCORING)
+    # --------------------------------------------------
+    filtered_labels = []
+    for l in labels_all:
+        if l["label"] == "non_compete":
+            if not _passes_non_compete_gate(chunk["clause_text"]):
+                continue  # ❌ drop false non-compete (e.g. non-disparagement)
+        filtered_labels.append(l)
+
+    labels_all = filtered_labels
+    # Notebook: we only surface labels that are not SAFE/LOW
+    risky_labels = [l for l in labels_all if l["band"] != RISK_BANDS["LOW"]]
+
+    # keep the clause only if there is at least one risky label
+    if len(risky_labels) == 0:
+        # notebook would still compute these but when final output it filters to non-LOW.
+        # To mimic exact notebook "eval_pdf_unique_clauses" behavior: skip non-risky clauses.
+        return None
+
+    return {
+        "page_no": chunk["page_no"],
+        "clause_text": chunk["clause_text"],
+        "final_score": score_out["final_score"],
+        "identity": score_out["identity"],
+        "semantic": score_out["semantic"],
+        "margin": score_out["margin"],
+        # "top_matches": score_out["top_matches"],
+        "labels": risky_labels,
+        "boxes": chunk.get("boxes")
+    }
+
+
+def _merge_clause_group(group: List[Dict]) -> Dict:
+    """Merge risky clauses that share the same normalized text."""
+    # choose representative (you can pick first or highest final_score across labels)
+    # We'll merge labels across group and pick page_no from the first item
+    all_label_lists = [g["labels"] for g in group]
+    merged_labels = _merge_labels(all_label_lists)
+
+    # pick representative clause (first)
+    rep = group[0]
+    # Calculate clause-level final_score as max of original clause final_scores from the group
+    clause_final_score = max((g.get("final_score", 0.0) for g in group), default=rep.get("final_score", 0.0))
+
+    return {
+        "page_no": rep["page_no"],
+        "clause_text": rep["clause_text"],
+        "final_score": clause_final_score,
+        "labels": merged_labels,
+        "identity": rep["identity"],
+        "semantic": rep["semantic"],
+        "margin": rep["margin"],
+        # "top_matches": rep["top_matches"]
+        "boxes": rep.get("boxes")
+    }
+
+
+def sort_clauses_by_risk(clauses: List[Dict]) -> List[Dict]:
+    """Descending highest label final_score (stable)."""
+    clauses.sort(key=lambda c: max((l["final_score"] for l in c["labels"]), default=0.0), reverse=True)
+    return clauses
+
+
 # Notebook-faithful analyze_clauses with post-scoring label filtering + optional dedup
-def analyze_clauses(chunks: List[Dict], dedup: bool = True) -> List[Dict]:
+def analyze_clauses(
+    chunks: List[Dict],
+    dedup: bool = True,
+    progress: Optional[ProgressCallback] = None
+) -> List[Dict]:
     """
     1) Score all clauses (batch)
     2) Extract per-label signals and compute final scores (extract_clause_labels)
@@ -191,46 +277,19 @@ def analyze_clauses(chunks: List[Dict], dedup: bool = True) -> List[Dict]:
     4) Optionally deduplicate/merge near-identical clauses (eval_pdf_unique_clauses style)
     """
     texts = [c["clause_text"] for c in chunks]
-    batch_results = score_clauses_batch(texts)
+    batch_results = score_clauses_batch(texts, progress=progress)
+    report(progress, "aggregate", "running")
+    return _analyze_scored_clauses(chunks, batch_results, dedup=dedup)
 
+
+def _analyze_scored_clauses(chunks: List[Dict], batch_results: List[Optional[Dict]], dedup: bool = True) -> List[Dict]:
+    """Steps 2-4 of analyze_clauses, given score_clauses_batch output."""
     # collect raw clause outputs
     raw_clauses = []
     for chunk, score_out in zip(chunks, batch_results):
-        if score_out is None:
-            continue
-
-        labels_all = extract_clause_labels(score_out)  # returns per-label dicts with final_score and band
-
-        # --------------------------------------------------
-        # NON-COMPETE SEMANTIC GATE (POST-SCORING)
-        # --------------------------------------------------
-        filtered_labels = []
-        for l in labels_all:
-            if l["label"] == "non_compete":
-                if not _passes_non_compete_gate(chunk["clause_text"]):
-                    continue  # ❌ drop false non-compete (e.g. non-disparagement)
-            filtered_labels.append(l)
-
-        labels_all = filtered_labels
-        # Notebook: we only surface labels that are not SAFE/LOW
-        risky_labels = [l for l in labels_all if l["band"] != RISK_BANDS["LOW"]]
-
-        # keep the clause only if there is at least one risky label
-        if len(risky_labels) == 0:
-            # notebook would still compute these but when final output it filters to non-LOW.
-            # To mimic exact notebook "eval_pdf_unique_clauses" behavior: skip non-risky clauses.
-            continue
-
-        raw_clauses.append({
-            "page_no": chunk["page_no"],
-            "clause_text": chunk["clause_text"],
-            "final_score": score_out["final_score"],
-            "identity": score_out["identity"],
-            "semantic": score_out["semantic"],
-            "margin": score_out["margin"],
-            # "top_matches": score_out["top_matches"],
-            "labels": risky_labels
-        })
+        rc = _risky_clause(chunk, score_out)
+        if rc is not None:
+            raw_clauses.append(rc)
 
     if not dedup:
         return raw_clauses
@@ -241,33 +300,41 @@ def analyze_clauses(chunks: List[Dict], dedup: bool = True) -> List[Dict]:
         key = _normalize_clause_text(rc["clause_text"])
         grouped[key].append(rc)
 
-    final_clauses = []
-    for key, group in grouped.items():
-        # choose representative (you can pick first or highest final_score across labels)
-        # We'll merge labels across group and pick page_no from the first item
-        all_label_lists = [g["labels"] for g in group]
-        merged_labels = _merge_labels(all_label_lists)
-
-        # pick representative clause (first)
-        rep = group[0]
-        # Calculate clause-level final_score as max of original clause final_scores from the group
-        clause_final_score = max((g.get("final_score", 0.0) for g in group), default=rep.get("final_score", 0.0))
-        
-        final_clauses.append({
-            "page_no": rep["page_no"],
-            "clause_text": rep["clause_text"],
-            "final_score": clause_final_score,
-            "labels": merged_labels,
-            "identity": rep["identity"],
-            "semantic": rep["semantic"],
-            "margin": rep["margin"]
-            # "top_matches": rep["top_matches"]
-        })
+    final_clauses = [_merge_clause_group(group) for group in grouped.values()]
 
     # optional: sort final_clauses by descending highest label final_score
-    final_clauses.sort(key=lambda c: max((l["final_score"] for l in c["labels"]), default=0.0), reverse=True)
+    return sort_clauses_by_risk(final_clauses)
+
 
-    return final_clauses
+def iter_analyze_clauses(chunks: List[Dict], block_size: int) -> Iterator[Dict]:
+    """
+    Streaming variant of analyze_clauses(chunks, dedup=True).
+
+    Chunks are grouped by normalized text up front and scored in blocks of
+    whole groups, so each merged clause can be yielded as soon as its
+    block is scored. Yields the same clauses as analyze_clauses, in
+    document order rather than sorted by risk.
+    """
+    grouped = defaultdict(list)  # normalized_text -> chunks, in document order
+    for chunk in chunks:
+        grouped[_normalize_clause_text(chunk["clause_text"])].append(chunk)
+
+    block: List[List[Dict]] = []
+    block_len = 0
+    groups = list(grouped.values())
+    for gi, group in enumerate(groups):
+        block.append(group)
+        block_len += len(group)
+        if block_len < block_size and gi < len(groups) - 1:
+            continue
+
+        flat = [c for g in block for c in g]
+        results = iter(score_clauses_batch([c["clause_text"] for c in flat]))
+        for g in block:
+            risky = [rc for rc in (_risky_clause(c, next(results)) for c in g) if rc is not None]
+            if risky:
+                yield _merge_clause_group(risky)
+        block, block_len = [], 0
 
 # def analyze_clauses(chunks: List[Dict]) -> List[Dict]:
 #     """
@@ -412,7 +479,7 @@ def aggregate_document_risk(clauses: List[Dict]) -> Dict:
 # Main pipeline entrypoint
 # ---------------------------------------------------------
 
-def analyze_document(pdf_bytes: bytes) -> Dict:
+def analyze_document(pdf: PdfSource, progress: Optional[ProgressCallback] = None) -> Dict:
     from app.models import embed_model
     import logging
 
@@ -425,7 +492,9 @@ def analyze_document(pdf_bytes: bytes) -> Dict:
     End-to-end production pipeline.
 
     Input:
-        pdf_bytes (bytes)
+        pdf: PDF bytes or a path to the PDF on disk
+        progress: optional callback, called as progress(stage, status)
+                  for each stage in app.progress.STAGES
 
     Output (JSON-serializable):
         {
@@ -436,20 +505,36 @@ def analyze_document(pdf_bytes: bytes) -> Dict:
     """
     
     # 1. Extract page-wise text
-    pages = extract_pages_from_pdf_bytes(pdf_bytes)
+    report(progress, "extract", "running")
+    pages = extract_pages_from_pdf(pdf, with_boxes=True)
+    report(progress, "extract", "done")
 
     # 2. Chunk into clauses
+    report(progress, "chunk", "running")
     nodedup = chunk_pages(pages)
     chunks = dedup = deduplicate_chunks(nodedup)
     logger.info(f"pages={len(pages)}, chunks_before_dedup={len(nodedup)}, chunks_after_dedup={len(dedup)}")
+    report(progress, "chunk", "done")
 
     # 3. Multi-label clause scoring
-    clause_results = analyze_clauses(chunks)
+    clause_results = analyze_clauses(chunks, progress=progress)
 
-    # 4. Aggregate document risk
+    # 4-5. Aggregate document risk + doc_score
+    summary = summarize_document(clause_results)
+
+    report(progress, "aggregate", "done")
+    return {
+        **summary,
+        "clauses": clause_results
+    }
+
+
+def summarize_document(clause_results: List[Dict]) -> Dict:
+    """document_risk, doc_score and label_summary for analyzed clauses."""
+    # Aggregate document risk
     doc_summary = aggregate_document_risk(clause_results)
 
-    # 5. Calculate doc_score: average of all clause final_scores * 10, rounded
+    # Calculate doc_score: average of all clause final_scores * 10, rounded
     if clause_results:
         avg_final_score = sum(c.get("final_score", 0.0) for c in clause_results) / len(clause_results)
         doc_score = round(avg_final_score * 10)
@@ -459,6 +544,81 @@ def analyze_document(pdf_bytes: bytes) -> Dict:
     return {
         "document_risk": doc_summary["document_risk"],
         "doc_score": doc_score,
-        "label_summary": doc_summary["label_summary"],
-        "clauses": clause_results
+        "label_summary": doc_summary["label_summary"]
     }
+
+
+def analyze_document_stream(pdf: PdfSource, block_size: int = STREAM_BLOCK_CLAUSES) -> Iterator[Dict]:
+    """
+    Event-stream variant of analyze_document.
+
+    Yields, in order:
+        {"event": "start", "pages": int, "chunks": int}
+        {"event": "clause", "clause": {...}}   one per risky clause, as scored
+        {"event": "summary", "document_risk", "doc_score", "label_summary"}
+    """
+    pages = extract_pages_from_pdf(pdf, with_boxes=True)
+    chunks = deduplicate_chunks(chunk_pages(pages))
+    yield {"event": "start", "pages": len(pages), "chunks": len(chunks)}
+
+    clause_results = []
+    for clause in iter_analyze_clauses(chunks, block_size):
+        clause_results.append(clause)
+        yield {"event": "clause", "clause": clause}
+
+    yield {"event": "summary", **summarize_document(sort_clauses_by_risk(clause_results))}
+
+
+def analyze_documents(pdfs: List[PdfSource]) -> List[Dict]:
+    """
+    analyze_document over many PDFs with one scoring pass.
+
+    Every document is extracted and chunked first. The union of their
+    clause texts is deduplicated and scored by a single
+    score_clauses_batch call, then split back per document. Results are
+    identical to calling analyze_document on each PDF. A document that
+    fails to extract yields {"error": message} in its slot.
+    """
+    doc_chunks: List[Optional[List[Dict]]] = []
+    errors: Dict[int, str] = {}
+    for i, pdf in enumerate(pdfs):
+        try:
+            doc_chunks.append(deduplicate_chunks(chunk_pages(extract_pages_from_pdf(pdf, with_boxes=True))))
+        except Exception as e:
+            logger.error(f"Batch document {i} failed extraction: {e}", exc_info=True)
+            errors[i] = f"Failed to process document: {e}"
+            doc_chunks.append(None)
+
+    results = analyze_chunked_documents([chunks or [] for chunks in doc_chunks])
+    return [
+        {"error": errors[i]} if chunks is None else result
+        for i, (chunks, result) in enumerate(zip(doc_chunks, results))
+    ]
+
+
+def analyze_chunked_documents(doc_chunks: List[List[Dict]]) -> List[Dict]:
+    """
+    Score already-chunked documents together: the union of their clause
+    texts is deduplicated and scored once, then split back per document.
+    """
+    unique_index: Dict[str, int] = {}
+    for chunks in doc_chunks:
+        for c in chunks:
+            unique_index.setdefault(c["clause_text"], len(unique_index))
+    total = sum(len(chunks) for chunks in doc_chunks)
+    logger.info(f"Batch of {len(doc_chunks)} documents: {total} clauses, {len(unique_index)} unique")
+
+    unique_results = score_clauses_batch(list(unique_index)) if unique_index else []
+
+    outputs = []
+    for chunks in doc_chunks:
+        batch_results = [unique_results[unique_index[c["clause_text"]]] for c in chunks]
+        clause_results = _analyze_scored_clauses(chunks, batch_results)
+        outputs.append({**summarize_document(clause_results), "clauses": clause_results})
+    return outputs
+
+
+def emit_document_events(pdf: PdfSource, emit: Callable[[Dict], None]):
+    """analyze_document_stream, passing each event to `emit` (for pool workers)."""
+    for event in analyze_document_stream(pdf):
+        emit(event)
@@ -0,0 +1,14 @@
+# app/progress.py
+
+from typing import Callable, Optional
+
+# Pipeline stages, in order, as reported to progress callbacks
+STAGES = ("extract", "chunk", "embed", "rerank", "aggregate")
+
+# progress(stage, status) with status "running" or "done"
+ProgressCallback = Callable[[str, str], None]
+
+
+def report(progress: Optional[ProgressCallback], stage: str, status: str) -> None:
+    if progress is not None:
+        progress(stage, status)
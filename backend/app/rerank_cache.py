@@ -0,0 +1,213 @@
+# app/rerank_cache.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.embedding_cache import normalize_embed_text
+
+logger = logging.getLogger(__name__)
+
+# (clause fingerprint, reference index_id)
+PairKey = Tuple[str, int]
+
+# Part of every scope: rows stored under an older fingerprint scheme
+# (lowercased text) must never be read back as cased keys.
+_KEY_SCHEME = "cased"
+
+
+def clause_key(text: str) -> str:
+    """
+    Fingerprint of a clause for the cache. Whitespace and Unicode form
+    are normalized; case is kept because the cross-encoder sees it.
+    """
+    return hashlib.sha256(normalize_embed_text(text).encode("utf-8")).hexdigest()
+
+
+class RerankScoreCache:
+    """
+    Bounded cache of raw cross-encoder scores for (clause, reference) pairs.
+
+    Keys are (clause_key, index_id) scoped to one reranker model
+    and a namespace: the reference build the index_ids belong to.
+    An in-process LRU sits in front of an optional SQLite table, which
+    lets scores survive restarts and be shared by workers on one host.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int,
+        db_path: Optional[str] = None,
+        db_max_entries: int = 0
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.db_path = db_path or None
+        self.db_max_entries = db_max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lru: "OrderedDict[Tuple[str, str, int], float]" = OrderedDict()
+        # guards the LRU and counters only; SQLite is used outside it
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.db_path:
+            self._open_db()
+
+    # ---- SQLite tier ----
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, so lookups from concurrent requests run in parallel."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            self._local.db = db
+        return db
+
+    def _open_db(self):
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        db = self._conn()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS rerank_scores ("
+            " model TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " index_id INTEGER NOT NULL,"
+            " score REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (model, fingerprint, index_id))"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS rerank_scores_lru ON rerank_scores (last_access)"
+        )
+        db.commit()
+        logger.info(f"Rerank score cache persisted to {self.db_path}")
+
+    def _db_get(self, scope: str, keys: List[PairKey]) -> Dict[PairKey, float]:
+        db = self._conn()
+        found = {}
+        # Stay under SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 400):
+            chunk = keys[start:start + 400]
+            where = " OR ".join(["(fingerprint = ? AND index_id = ?)"] * len(chunk))
+            params = [scope] + [v for k in chunk for v in k]
+            rows = db.execute(
+                f"SELECT fingerprint, index_id, score FROM rerank_scores "
+                f"WHERE model = ? AND ({where})",
+                params
+            ).fetchall()
+            for fp, idx, score in rows:
+                found[(fp, int(idx))] = float(score)
+
+        if found:
+            now = time.time()
+            db.executemany(
+                "UPDATE rerank_scores SET last_access = ? "
+                "WHERE model = ? AND fingerprint = ? AND index_id = ?",
+                [(now, scope, fp, idx) for fp, idx in found]
+            )
+            db.commit()
+        return found
+
+    def _db_put(self, scope: str, items: List[Tuple[PairKey, float]]):
+        db = self._conn()
+        now = time.time()
+        db.executemany(
+            "INSERT OR REPLACE INTO rerank_scores "
+            "(model, fingerprint, index_id, score, last_access) VALUES (?, ?, ?, ?, ?)",
+            [(scope, fp, idx, score, now) for (fp, idx), score in items]
+        )
+        if self.db_max_entries:
+            (count,) = db.execute("SELECT COUNT(*) FROM rerank_scores").fetchone()
+            overflow = count - self.db_max_entries
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM rerank_scores WHERE rowid IN ("
+                    " SELECT rowid FROM rerank_scores ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+        db.commit()
+
+    # ---- in-process tier ----
+
+    def _remember(self, key: Tuple[str, str, int], score: float):
+        self._lru[key] = score
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    # ---- public API ----
+
+    def _scope(self, namespace: str) -> str:
+        scope = f"{self.model_name}#{_KEY_SCHEME}"
+        return f"{scope}@{namespace}" if namespace else scope
+
+    def get_many(self, keys: List[PairKey], namespace: str = "") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (raw_scores, hit_mask); rows where hit_mask is False are
+        undefined and must be scored by the caller.
+        """
+        scope = self._scope(namespace)
+        scores = np.zeros(len(keys), dtype="float32")
+        hit = np.zeros(len(keys), dtype=bool)
+
+        pending = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                lru_key = (scope,) + key
+                score = self._lru.get(lru_key)
+                if score is None:
+                    pending.append(i)
+                    continue
+                self._lru.move_to_end(lru_key)
+                scores[i] = score
+                hit[i] = True
+
+        found = {}
+        if pending and self.db_path:
+            found = self._db_get(scope, list({keys[i] for i in pending}))
+
+        with self._lock:
+            for i in pending:
+                score = found.get(keys[i])
+                if score is not None:
+                    scores[i] = score
+                    hit[i] = True
+                    self._remember((scope,) + keys[i], score)
+
+            n_hits = int(hit.sum())
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+
+        return scores, hit
+
+    def put_many(self, keys: List[PairKey], scores: np.ndarray, namespace: str = "") -> None:
+        scope = self._scope(namespace)
+        items = [(k, float(s)) for k, s in zip(keys, scores)]
+        with self._lock:
+            for key, score in items:
+                self._remember((scope,) + key, score)
+        if self.db_path and items:
+            self._db_put(scope, items)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "capacity": self.max_entries,
+            "persistent": self.db_path is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0
+        }
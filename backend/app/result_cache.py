@@ -0,0 +1,139 @@
+# app/result_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Key helpers
+# ---------------------------------------
+
+# Everything in config that changes what a document's analysis returns
+_RESULT_CONFIG = (
+    "EMBED_MODEL_NAME",
+    "RERANKER_MODEL_NAME",
+    "TOP_K_RETRIEVAL",
+    "TOP_K_RERANK",
+    "WEIGHTS",
+    "RISK_THRESHOLDS",
+    "RISK_BANDS",
+    "MIN_CLAUSE_LEN",
+    "PDF_TEXT_ENGINE",
+    "OCR_PAGE_MIN_CHARS",
+    "OCR_RESOLUTION",
+    "IDENTITY_INDEX",
+    "IDENTITY_MATMUL_MAX_REFS",
+    "IDENTITY_HNSW_M",
+    "IDENTITY_HNSW_EF_SEARCH"
+)
+
+# Bump whenever a code change alters what a document's analysis returns:
+# scoring, labels, chunking, text extraction, clause boxes or the result
+# format. Also bump for a PyMuPDF / tesseract upgrade or new weights under
+# the same model name. Comments and refactors need no bump.
+RESULT_VERSION = 1
+
+_static_fingerprint: Optional[str] = None
+
+
+def _config_fingerprint() -> str:
+    global _static_fingerprint
+    if _static_fingerprint is None:
+        settings = {name: getattr(config, name) for name in _RESULT_CONFIG}
+        payload = json.dumps({"version": RESULT_VERSION, "config": settings}, sort_keys=True, default=str)
+        _static_fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return _static_fingerprint
+
+
+def result_key(pdf_sha256: str, reference_id: str, generation: int) -> str:
+    """
+    Cache key of one PDF's analysis: its content hash plus everything
+    that feeds the result (RESULT_VERSION, the config in _RESULT_CONFIG
+    and the reference set, which changes on every rebuild or append).
+    """
+    base = f"{pdf_sha256}\0{_config_fingerprint()}\0{reference_id}\0{generation}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------
+# SQLite store
+# ---------------------------------------
+
+class ResultCache:
+    """
+    Persistent cache of whole-document analysis results, so a re-upload
+    of an identical PDF skips the pipeline. Bounded to `max_entries`,
+    least recently used first; workers on one host can share `db_path`.
+    """
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._db.commit()
+        logger.info(f"Result cache persisted to {db_path}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        data = json.dumps(result)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, result, last_access) VALUES (?, ?, ?)",
+                (key, data, time.time())
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM results WHERE rowid IN ("
+                    " SELECT rowid FROM results ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {
+            "entries": entries,
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0
+        }
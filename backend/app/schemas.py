@@ -28,6 +28,11 @@ class ClauseResult(BaseModel):
     semantic: float = Field(..., ge=0.0, le=1.0, description="Semantic similarity score")
     margin: float = Field(..., description="Margin score")
     # top_matches: List[Dict[str, Any]] = Field(..., description="Top matching reference clauses")
+    boxes: Optional[List[List[float]]] = Field(
+        None,
+        description="Page rectangles [x0, y0, x1, y1] covering the clause, one per line; "
+                    "null when the page text came from OCR"
+    )
 
 
 class LabelSummary(BaseModel):
@@ -81,6 +86,42 @@ class DocumentAnalysisResponse(BaseModel):
         }
 
 
+class BatchDocumentResult(BaseModel):
+    """Analysis of one document in a batch; `error` is set instead on failure."""
+    filename: str = Field(..., description="Uploaded file name (or zip member path)")
+    analysis_id: Optional[str] = None
+    document_risk: Optional[str] = None
+    doc_score: Optional[int] = None
+    label_summary: Optional[Dict[str, LabelSummary]] = None
+    clauses: Optional[List[ClauseResult]] = None
+    error: Optional[str] = Field(None, description="Why this document could not be analyzed")
+
+
+class BatchAnalysisResponse(BaseModel):
+    """Results of /analyze/batch, in upload order."""
+    documents: List[BatchDocumentResult]
+
+
+class JobSubmitResponse(BaseModel):
+    """Returned when an analysis job is accepted."""
+    analysis_id: str = Field(..., description="Job / analysis identifier")
+    status: str = Field(..., description="Job status: 'queued', 'running', 'done' or 'failed'")
+
+
+class JobStatusResponse(BaseModel):
+    """Status and per-stage progress of an analysis job."""
+    analysis_id: str = Field(..., description="Job / analysis identifier")
+    status: str = Field(..., description="Job status: 'queued', 'running', 'done' or 'failed'")
+    stage: Optional[str] = Field(None, description="Pipeline stage currently reported")
+    stages: Dict[str, str] = Field(
+        ...,
+        description="Per-stage progress (extract, chunk, embed, rerank, aggregate): 'pending', 'running' or 'done'"
+    )
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: Optional[float] = Field(None, description="Submission time (unix seconds)")
+    updated_at: Optional[float] = Field(None, description="Last progress update (unix seconds)")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str = Field(..., description="Service status")
@@ -1,10 +1,11 @@
 # app/scoring.py
-from typing import List
+from typing import List, Optional, Tuple
 import numpy as np
 from scipy.special import expit  # sigmoid
 import logging
 import inspect
 # import app.models as models
+from app.rerank_cache import clause_key
 
 # from app.models import (
 #     embed_model,
@@ -17,9 +18,13 @@ from app.config import (
     TOP_K_RETRIEVAL,
     TOP_K_RERANK,
     RERANKER_BATCH_SIZE,
+    EMBED_BATCH_SIZE,
+    FAISS_SEARCH_BLOCK,
+    IDENTITY_BLOCK_ROWS,
     WEIGHTS
 )
 import app.models as models
+from app.progress import ProgressCallback, report
 
 # print("SCORING sees models at:", inspect.getfile(models))
 # ----------------------------
@@ -68,36 +73,59 @@ def embed_clause(text: str) -> np.ndarray:
 # Identity score
 # ----------------------------
 
-def compute_identity_score(query_primary_emb: np.ndarray) -> float:
+def compute_identity_scores(query_primary_embs: np.ndarray, ref=None) -> np.ndarray:
+    """
+    Identity = max cosine similarity of each query against
+    stored primary embeddings. Returns shape (n,).
+    """
+    ref = ref or models.reference
+    q = np.ascontiguousarray(query_primary_embs, dtype="float32")
+    if len(q) == 0:
+        return np.empty(0, dtype="float32")
+
+    if ref.identity_index is not None:
+        D, _ = ref.identity_index.search(q, 1)
+        return D[:, 0]
+
+    # Blocked matmul: never holds more than (n, IDENTITY_BLOCK_ROWS) sims.
+    best = np.full(len(q), -np.inf, dtype="float32")
+    for start in range(0, ref.primary_embs.shape[0], IDENTITY_BLOCK_ROWS):
+        block = ref.primary_embs[start:start + IDENTITY_BLOCK_ROWS]
+        np.maximum(best, (q @ block.T).max(axis=1), out=best)
+    return best
+
+
+def compute_identity_score(query_primary_emb: np.ndarray, ref=None) -> float:
     """
     Identity = max cosine similarity against
     stored primary embeddings.
     """
-    sims = np.dot(models.primary_embs, query_primary_emb.T).squeeze()
-    return float(np.max(sims))
+    return float(compute_identity_scores(query_primary_emb.reshape(1, -1), ref)[0])
 
 
 # ----------------------------
 # Semantic retrieval + rerank
 # ----------------------------
 
-def semantic_retrieval(query_vec: np.ndarray):
+def semantic_retrieval(query_vec: np.ndarray, ref=None):
     """
     FAISS dense retrieval.
     """
-    scores, indices = models.faiss_index.search(
+    ref = ref or models.reference
+    scores, indices = ref.faiss_index.search(
         query_vec,
         TOP_K_RETRIEVAL
     )
     return indices[0]
 
 
-def rerank(query_text: str, candidate_indices):
+def rerank(query_text: str, candidate_indices, ref=None):
     """
     Cross-encoder reranking.
     """
+    ref = ref or models.reference
     pairs = [
-        [query_text, models.metadata[idx]["answer_text"]]
+        [query_text, ref.metadata.answer_text(idx)]
         for idx in candidate_indices
     ]
 
@@ -140,14 +168,10 @@ def score_clause(text: str) -> dict:
     if models.reranker is None:
         raise RuntimeError("reranker is None at scoring time")
 
-    if models.faiss_index is None:
-        raise RuntimeError("faiss_index is None at scoring time")
-
-    if models.metadata is None:
-        raise RuntimeError("metadata is None at scoring time")
-
-    if models.primary_embs is None:
-        raise RuntimeError("primary_embs is None at scoring time")
+    # One reference generation for the whole clause, even across a hot swap
+    ref = models.reference
+    if ref is None:
+        raise RuntimeError("reference set is None at scoring time")
 
     # ---- rest of scoring logic ----
 
@@ -155,13 +179,13 @@ def score_clause(text: str) -> dict:
     query_vec = embed_clause(text)
 
     # ---- 2. Identity ----
-    identity = compute_identity_score(query_vec[:, :models.primary_embs.shape[1]])
+    identity = compute_identity_score(query_vec[:, :ref.primary_embs.shape[1]], ref)
 
     # ---- 3. FAISS retrieval ----
-    candidate_indices = semantic_retrieval(query_vec)
+    candidate_indices = semantic_retrieval(query_vec, ref)
 
     # ---- 4. Cross-encoder rerank ----
-    semantic_scores = rerank(text, candidate_indices)
+    semantic_scores = rerank(text, candidate_indices, ref)
 
     # ---- 5. Margin ----
     margin = compute_margin(semantic_scores)
@@ -176,13 +200,10 @@ def score_clause(text: str) -> dict:
     # ---- 7. Build matches ----
     top_matches = []
     for idx, s in zip(candidate_indices, semantic_scores):
-        m = models.metadata[idx]
         top_matches.append({
-            "index_id": idx,
+            "index_id": int(idx),
             "score": float(s),
-            "label": m["label"],
-            "answer_text": m["answer_text"],
-            "source_title": m["source_title"]
+            "label_id": ref.metadata.label_id(idx)
         })
 
     top_matches.sort(key=lambda x: x["score"], reverse=True)
@@ -192,7 +213,8 @@ def score_clause(text: str) -> dict:
         "identity": float(identity),
         "semantic": float(np.max(semantic_scores)),
         "margin": float(margin),
-        "top_matches": top_matches[:TOP_K_RERANK]
+        "top_matches": top_matches[:TOP_K_RERANK],
+        "label_names": ref.metadata.label_names
     }
 # ----------------------------
 # Sub-clause probing helpers
@@ -212,77 +234,203 @@ def _make_subclauses(text: str, window: int = 240, stride: int = 120) -> List[st
         subs.append(text[i:i + window])
     return subs
 
-def score_clauses_batch(texts: List[str]) -> List[dict]:
-    logger.info(f"RERANKER INVOKED for {len(texts)} clauses")
-    
+def _plan_probes(texts: List[str]) -> Tuple[List[str], np.ndarray]:
     """
-    Batch score multiple clauses (vectorized).
-    Returns list of score_out dicts matching score_clause's output format.
+    Collect the retrieval probes of every clause into one flat list.
+
+    Probes of clause qi live at probes[offsets[qi]:offsets[qi + 1]].
     """
-    if models.embed_model is None or models.faiss_index is None or models.reranker is None:
-        raise RuntimeError("models not initialized for batch scoring")
+    probes = []
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    for qi, text in enumerate(texts):
+        probes.extend(_make_subclauses(text))
+        offsets[qi + 1] = len(probes)
+    return probes, offsets
+
+
+def _encode_sorted(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed texts in length-sorted batches and scatter the vectors back
+    to input order. Returns a float32 array of shape (len(texts), dim).
+    """
+    dim = models.embed_model.get_sentence_embedding_dimension()
+    out = np.empty((len(texts), dim), dtype="float32")
+    if not texts:
+        return out
+
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    if models.embed_scheduler is not None:
+        # The scheduler slices this length-sorted request into batches,
+        # sharing them with concurrent requests.
+        out[order] = models.embed_scheduler.submit([texts[i] for i in order]).result()
+        return out
+
+    for start in range(0, len(order), batch_size):
+        batch_idx = order[start:start + batch_size]
+        out[batch_idx] = models.embed_model.encode(
+            [texts[i] for i in batch_idx],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            batch_size=batch_size
+        ).astype("float32")
+    return out
+
+
+def _encode_unique(texts: List[str]) -> np.ndarray:
+    """
+    Embed each distinct string once and expand back to one row per input.
+    """
+    index = {}
+    inverse = np.empty(len(texts), dtype=np.int64)
+    for i, t in enumerate(texts):
+        inverse[i] = index.setdefault(t, len(index))
+
+    unique = list(index)
+    logger.info(f"Embedding plan: {len(texts)} texts, {len(unique)} unique")
+
+    cache = models.embedding_cache
+    if cache is None:
+        return _encode_sorted(unique)[inverse]
+
+    vecs, hit = cache.get_many(unique)
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        miss_texts = [unique[i] for i in miss]
+        vecs[miss] = _encode_sorted(miss_texts)
+        cache.put_many(miss_texts, vecs[miss])
+    logger.info(
+        f"Embedding cache: {len(unique) - len(miss)}/{len(unique)} hits "
+        f"(lifetime hit rate {cache.stats()['hit_rate']:.1%})"
+    )
+    return vecs[inverse]
 
+
+def embed_document(texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build one embedding plan for a document and embed it in one pass.
+
+    The plan holds every clause (identity) plus every sub-clause probe and
+    its CONTEXT: variant (retrieval). Short clauses are their own only
+    probe, so their clause text is embedded once and shared.
+
+    Returns:
+        primary_embs_q: (n, d) clause vectors for identity scoring
+        probe_vecs:     (P, 2d) primary + CONTEXT: probe vectors, matching embed_clause
+        offsets:        (n + 1,) probes of clause qi are probe_vecs[offsets[qi]:offsets[qi + 1]]
+    """
     n = len(texts)
-    # 1) Embed primary and secondary in batches (convert_to_numpy True)
-    primary_embs_q = models.embed_model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-        batch_size=32
-    ).astype("float32")   # (n, d)
-    secondary_embs_q = models.embed_model.encode(
-        ["CONTEXT:\n" + t for t in texts],
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-        batch_size=32
-    ).astype("float32")   # (n, d)
+    probes, offsets = _plan_probes(texts)
+    n_probes = len(probes)
 
-    # Combined vector for FAISS search
-    q_combined = np.hstack([primary_embs_q, secondary_embs_q]).astype("float32")  # (n, 2d)
+    vecs = _encode_unique(
+        list(texts) + probes + ["CONTEXT:\n" + p for p in probes]
+    )
 
-    # 2) FAISS retrieval (batched)
-    
-    id_sims = np.dot(primary_embs_q, models.primary_embs.T)  # (n, M)
-    identity_scores = np.max(id_sims, axis=1).astype(float)  # (n,)
+    primary_embs_q = vecs[:n]
+    probe_vecs = np.hstack([vecs[n:n + n_probes], vecs[n + n_probes:]]).astype("float32")
+    return primary_embs_q, probe_vecs, offsets
 
-    # D, I = models.faiss_index.search(q_combined, TOP_K_RETRIEVAL)  # I shape (n, k)
-    # candidate_indices_per_query = I.tolist()
 
-    # ---------------------------------------------------------
-    # Sub-clause probing for retrieval (LONG clauses only)
-    # ---------------------------------------------------------
+def retrieve_candidates(probe_vecs: np.ndarray, offsets: np.ndarray, ref=None) -> List[np.ndarray]:
+    """
+    Search all probe vectors against FAISS in fixed-size blocks and reduce
+    the hits to one sorted, de-duplicated candidate array per clause.
+    """
+    ref = ref or models.reference
+    n = len(offsets) - 1
+    if len(probe_vecs) == 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(n)]
 
-    candidate_indices_per_query = []
+    I = np.empty((len(probe_vecs), TOP_K_RETRIEVAL), dtype=np.int64)
+    for start in range(0, len(probe_vecs), FAISS_SEARCH_BLOCK):
+        block = np.ascontiguousarray(probe_vecs[start:start + FAISS_SEARCH_BLOCK])
+        _, I[start:start + len(block)] = ref.faiss_index.search(block, TOP_K_RETRIEVAL)
 
-    for qi, text in enumerate(texts):
-        # Generate probing texts
-        probes = _make_subclauses(text)
+    # Encode (clause, candidate) as one int64 so a single np.unique yields
+    # the per-clause union, already grouped by clause.
+    owners = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    n_refs = np.int64(ref.faiss_index.ntotal)
+    keys = (owners[:, None] * n_refs + I)[I >= 0]
+    keys = np.unique(keys)
 
-        # Embed probes
-        probe_primary = models.embed_model.encode(
-            probes,
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        ).astype("float32")
+    bounds = np.searchsorted(keys, np.arange(n + 1, dtype=np.int64) * n_refs)
+    cand = keys % n_refs
+    return [cand[bounds[qi]:bounds[qi + 1]] for qi in range(n)]
 
-        probe_secondary = models.embed_model.encode(
-            ["CONTEXT:\n" + p for p in probes],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        ).astype("float32")
 
-        probe_vecs = np.hstack([probe_primary, probe_secondary]).astype("float32")
+def _predict_pairs(pairs: List[List[str]]) -> np.ndarray:
+    if models.rerank_scheduler is not None:
+        return models.rerank_scheduler.submit(pairs).result()
+    return models.reranker.predict(pairs, batch_size=RERANKER_BATCH_SIZE)
 
-        # FAISS search for each probe
-        probe_candidates = set()
-        for pv in probe_vecs:
-            _, idxs = models.faiss_index.search(
-                pv.reshape(1, -1),
-                TOP_K_RETRIEVAL
-            )
-            probe_candidates.update(idxs[0].tolist())
 
-        candidate_indices_per_query.append(list(probe_candidates))
+def _rerank_pairs(texts: List[str], idx_map: List[Tuple[int, int]], ref=None) -> np.ndarray:
+    """
+    Raw cross-encoder scores for the (texts[qi], reference idx) pairs in
+    idx_map. Pairs already in the rerank score cache are served from it;
+    only misses are decoded into text pairs and sent to the reranker.
+    """
+    ref = ref or models.reference
+    answers = {}
+
+    def _pairs(rows) -> List[List[str]]:
+        out = []
+        for i in rows:
+            qi, idx = idx_map[i]
+            if idx not in answers:
+                answers[idx] = ref.metadata.answer_text(idx)
+            out.append([texts[qi], answers[idx]])
+        return out
+
+    cache = models.rerank_cache
+    if cache is None:
+        return _predict_pairs(_pairs(range(len(idx_map))))
+
+    # cased: the cross-encoder scores "Company" and "company" differently
+    fingerprints = [clause_key(t) for t in texts]
+    keys = [(fingerprints[qi], int(idx)) for qi, idx in idx_map]
+
+    # index_ids are only meaningful within one reference build
+    raw_scores, hit = cache.get_many(keys, namespace=ref.reference_id)
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        raw_scores[miss] = _predict_pairs(_pairs(miss))
+        cache.put_many([keys[i] for i in miss], raw_scores[miss], namespace=ref.reference_id)
+
+    logger.info(
+        f"Rerank cache: {len(keys) - len(miss)}/{len(keys)} pairs cached "
+        f"(lifetime hit rate {cache.stats()['hit_rate']:.1%})"
+    )
+    return raw_scores
+
+
+def score_clauses_batch(texts: List[str], progress: Optional[ProgressCallback] = None) -> List[dict]:
+    logger.info(f"RERANKER INVOKED for {len(texts)} clauses")
+    
+    """
+    Batch score multiple clauses (vectorized).
+    Returns list of score_out dicts matching score_clause's output format.
+    """
+    if models.embed_model is None or models.reference is None or models.reranker is None:
+        raise RuntimeError("models not initialized for batch scoring")
+
+    # One reference generation for the whole batch, even across a hot swap
+    ref = models.reference
+
+    n = len(texts)
+    report(progress, "embed", "running")
+    # 1) Embed clauses and their retrieval probes from a single plan
+    primary_embs_q, probe_vecs, probe_offsets = embed_document(texts)
+
+    # 2) Identity against stored primary embeddings (top-1 inner product)
+    identity_scores = compute_identity_scores(primary_embs_q, ref).astype(float)  # (n,)
+
+    # ---------------------------------------------------------
+    # Sub-clause probing for retrieval (LONG clauses only)
+    # ---------------------------------------------------------
+
+    candidate_indices_per_query = retrieve_candidates(probe_vecs, probe_offsets, ref)
+    report(progress, "embed", "done")
 
     # 3) Build reranker pairs for all (query, candidate.answer_text)
     # all_pairs = []
@@ -295,7 +443,6 @@ def score_clauses_batch(texts: List[str]) -> List[dict]:
     # if len(all_pairs) == 0:
     #     return [None] * n
 
-    all_pairs = []
     idx_map = []
     precomputed_matches = {qi: [] for qi in range(n)}
 
@@ -308,16 +455,16 @@ def score_clauses_batch(texts: List[str]) -> List[dict]:
         #     continue
 
         # Otherwise, send to reranker
-        for idx in candidate_indices:
-            all_pairs.append([texts[qi], models.metadata[idx]["answer_text"]])
+        for idx in candidate_indices.tolist():
             idx_map.append((qi, idx))
     
-    if len(all_pairs) == 0:
+    if len(idx_map) == 0:
         return [None] * n
 
-    # 4) Cross-encoder predict (batched by reranker)
-    raw_scores = models.reranker.predict(all_pairs, batch_size=RERANKER_BATCH_SIZE)
-    semantic_scores_all = expit(raw_scores)  # shape (len(all_pairs),)
+    # 4) Cross-encoder predict (batched by reranker, cache misses only)
+    report(progress, "rerank", "running")
+    raw_scores = _rerank_pairs(texts, idx_map, ref)
+    semantic_scores_all = expit(raw_scores)  # shape (len(idx_map),)
 
     # 5) Scatter back semantic scores per query
     semantic_per_query = [[] for _ in range(n)]
@@ -330,21 +477,13 @@ def score_clauses_batch(texts: List[str]) -> List[dict]:
     for qi, lst in enumerate(semantic_per_query):
         lst.sort(key=lambda x: x[1], reverse=True)
         for idx, s in lst[:TOP_K_RERANK]:
-            m = models.metadata[idx]
             top_matches_per_query[qi].append({
                 "index_id": int(idx),
                 "score": float(s),
-                "label": m["label"],
-                "answer_text": m["answer_text"],
-                "source_title": m.get("source_title")
+                "label_id": ref.metadata.label_id(idx)
             })
 
-    # 6) Compute identity scores vectorized using primary_embs stored (models.primary_embs)
-    # primary_embs_q shape (n, d). models.primary_embs shape (M, d)
-    # id_sims = np.dot(primary_embs_q, models.primary_embs.T)  # (n, M)
-    # identity_scores = np.max(id_sims, axis=1).astype(float)  # (n,)
-
-    # 7) Margin + final score and assemble output
+    # 6) Margin + final score and assemble output
     outputs = []
     for qi in range(n):
         sem_scores = [m["score"] for m in top_matches_per_query[qi]]
@@ -364,7 +503,10 @@ def score_clauses_batch(texts: List[str]) -> List[dict]:
             "identity": float(identity_scores[qi]),
             "semantic": float(semantic),
             "margin": float(margin),
-            "top_matches": top_matches_per_query[qi][:TOP_K_RERANK]
+            "top_matches": top_matches_per_query[qi][:TOP_K_RERANK],
+            # label_id -> name table of the generation that produced top_matches
+            "label_names": ref.metadata.label_names
         })
 
+    report(progress, "rerank", "done")
     return outputs
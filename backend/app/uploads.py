@@ -0,0 +1,196 @@
+# app/uploads.py
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.analysis_store import discard_pdf
+from app.exceptions import InvalidFileError
+
+logger = logging.getLogger(__name__)
+
+
+class SpooledUpload(NamedTuple):
+    filename: str
+    path: str
+    size: int
+    sha256: str
+
+
+# Validates a part's filename before its data arrives and returns the
+# spool file suffix and the part's size limit in bytes (raise
+# InvalidFileError to refuse the upload).
+FileCheck = Callable[[str], Tuple[str, int]]
+
+
+def too_large(name: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{name}: file too large. Maximum size: {limit / (1024 * 1024):.0f}MB"
+    )
+
+
+def _request_too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request too large. Maximum size: {limit / (1024 * 1024):.0f}MB"
+    )
+
+
+def new_spool_file(suffix: str, spool_dir: str = ""):
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=spool_dir or None)
+    return os.fdopen(fd, "wb"), path
+
+
+class _Part:
+    __slots__ = ("name", "filename", "out", "path", "size", "digest", "limit")
+
+    def __init__(self):
+        self.name = None
+        self.filename = None
+        self.out = None
+        self.path = None
+        self.size = 0
+        self.digest = None
+        self.limit = 0
+
+
+class _MultipartSpooler:
+    """
+    python-multipart callbacks that write the file parts of one form
+    field straight to spool files as the body arrives. Other fields are
+    skipped.
+    """
+
+    def __init__(self, field: str, check: FileCheck, max_files: int, spool_dir: str):
+        self.field = field
+        self.check = check
+        self.max_files = max_files
+        self.spool_dir = spool_dir
+
+        self.uploads: List[SpooledUpload] = []
+        self._part: Optional[_Part] = None
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        }
+
+    def _on_part_begin(self):
+        self._part = _Part()
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        part = self._part
+        part.name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        # browsers send an empty file part when nothing was selected
+        if part.name != self.field or not filename:
+            return
+
+        part.filename = filename.decode("utf-8", "replace")
+        if len(self.uploads) >= self.max_files:
+            raise InvalidFileError(f"Too many files. Maximum per request: {self.max_files}")
+        suffix, part.limit = self.check(part.filename)
+        part.out, part.path = new_spool_file(suffix, self.spool_dir)
+        part.digest = hashlib.sha256()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part.out is None:
+            return
+        part.size += end - start
+        if part.size > part.limit:
+            raise too_large(part.filename, part.limit)
+        chunk = data[start:end]
+        part.out.write(chunk)
+        part.digest.update(chunk)
+
+    def _on_part_end(self):
+        part, self._part = self._part, None
+        if part is None or part.out is None:
+            return
+        part.out.close()
+        self.uploads.append(SpooledUpload(part.filename, part.path, part.size, part.digest.hexdigest()))
+        if part.size == 0:
+            raise InvalidFileError(f"{part.filename}: empty file")
+
+    def discard(self):
+        """Remove every spool file, finished or not."""
+        part = self._part
+        if part is not None and part.out is not None:
+            part.out.close()
+            discard_pdf(part.path)
+        for upload in self.uploads:
+            discard_pdf(upload.path)
+
+
+async def spool_multipart_files(
+    request: Request,
+    field: str,
+    check: FileCheck,
+    body_limit: int,
+    max_files: int = 1,
+    spool_dir: str = ""
+) -> List[SpooledUpload]:
+    """
+    Receive a multipart/form-data request, writing each file part of
+    `field` to its own spool file as it arrives: one copy on disk, and no
+    full in-memory buffer.
+
+    Receiving stops with 413 as soon as one file exceeds the limit `check`
+    gave it or the body exceeds `body_limit`, so chunked uploads without a
+    Content-Length are refused without being read to the end. The caller
+    owns (and must discard) the returned files.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidFileError("Expected a multipart/form-data upload")
+
+    spooler = _MultipartSpooler(field, check, max_files, spool_dir)
+    parser = MultipartParser(boundary, spooler.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_limit:
+                raise _request_too_large(body_limit)
+            # Parsing writes to disk; keep it off the event loop
+            await asyncio.to_thread(parser.write, chunk)
+        parser.finalize()
+        if spooler._part is not None:
+            raise InvalidFileError("Incomplete multipart upload")
+    except BaseException:
+        spooler.discard()
+        raise
+
+    if not spooler.uploads:
+        raise InvalidFileError(f"No file uploaded in field '{field}'")
+    return spooler.uploads
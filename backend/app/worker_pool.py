@@ -0,0 +1,313 @@
+# app/worker_pool.py
+
+import asyncio
+import itertools
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.exceptions import ConfigurationError, ServiceBusyError
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the moving average of run time
+_EWMA_ALPHA = 0.2
+
+
+def _init_process_worker():
+    from app import models
+    models.initialize_models()
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Runs in the worker; reports when the task actually started."""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return started_at, time.time(), result
+
+
+def _timed_process_call(fn: Callable, args: tuple, kwargs: dict):
+    # Worker processes don't run the lifespan reload watcher; pick up a
+    # newer reference generation before each task instead.
+    from app import models
+    models.reload_reference_set()
+    return _timed_call(fn, args, kwargs)
+
+
+class _RelayedCallback:
+    """
+    Stands in for a server-process callable inside a worker process:
+    each call is put on the relay queue as (token, name, args).
+    """
+
+    def __init__(self, queue, token: int, name: str):
+        self.queue = queue
+        self.token = token
+        self.name = name
+
+    def __call__(self, *args):
+        self.queue.put((self.token, self.name, args))
+
+
+class _CallbackRelay:
+    """
+    Carries callback calls from worker processes back to this one.
+
+    Workers put their calls on a Manager queue; one thread here takes them
+    off in order and makes them. A task is closed by a marker queued after
+    it has returned, which sits behind every call the task made, so all of
+    them have run by the time `then` resolves the task's Future.
+    """
+
+    def __init__(self, mp_context):
+        self._manager = mp_context.Manager()
+        self._queue = self._manager.Queue()
+        self._tokens = itertools.count()
+        self._tasks: Dict[int, Dict[str, Callable]] = {}
+        self._closers: Dict[int, Callable[[], None]] = {}
+        self._thread = threading.Thread(target=self._run, name="analysis-relay", daemon=True)
+        self._thread.start()
+
+    def register(self, callbacks: Dict[str, Callable]) -> Dict[str, _RelayedCallback]:
+        """Picklable stand-ins for `callbacks`, to pass to the task."""
+        token = next(self._tokens)
+        self._tasks[token] = callbacks
+        return {name: _RelayedCallback(self._queue, token, name) for name in callbacks}
+
+    def close(self, relayed: Dict[str, _RelayedCallback], then: Callable[[], None]):
+        """Call `then` once every call the task made has been relayed."""
+        token = next(iter(relayed.values())).token
+        self._closers[token] = then
+        try:
+            self._queue.put((token, None, None))
+        except Exception:
+            # Relay already shut down; nothing more will arrive
+            self._tasks.pop(token, None)
+            self._closers.pop(token, None)
+            then()
+
+    def _run(self):
+        while True:
+            try:
+                message = self._queue.get()
+            except Exception:
+                return
+            if message is None:
+                return
+            token, name, args = message
+            if name is None:
+                self._tasks.pop(token, None)
+                self._closers.pop(token)()
+                continue
+            try:
+                self._tasks[token][name](*args)
+            except Exception as e:
+                logger.error(f"Relayed {name} callback failed: {e}", exc_info=True)
+
+    def shutdown(self):
+        try:
+            self._queue.put(None)
+            self._thread.join(5)
+        finally:
+            self._manager.shutdown()
+
+
+class AnalysisPool:
+    """
+    Bounded executor for blocking analysis work.
+
+    At most `workers` tasks run at once and at most `max_queue` more wait
+    for a slot; anything beyond that is rejected with ServiceBusyError so
+    the caller can answer 503 + Retry-After instead of piling up requests.
+    """
+
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ConfigurationError(f"ANALYSIS_POOL_KIND must be 'thread' or 'process', got {kind!r}")
+        if workers < 1:
+            raise ConfigurationError("ANALYSIS_WORKERS must be >= 1")
+
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max(0, max_queue)
+
+        self._executor: Executor
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._relay: Optional[_CallbackRelay] = None
+        if kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        else:
+            # Each process loads its own copy of the models. Spawned, not
+            # forked: the server process already runs threads (event loop,
+            # schedulers, reload watcher) whose locks a fork would copy held.
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_process_worker,
+                mp_context=self._mp_context
+            )
+        self._call = _timed_call if kind == "thread" else _timed_process_call
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._last_wait_s = 0.0
+        self._max_wait_s = 0.0
+        self._total_wait_s = 0.0
+        self._avg_run_s: Optional[float] = None
+
+        logger.info(f"Analysis pool: {workers} {kind} worker(s), queue limit {self.max_queue}")
+
+    # ---- admission ----
+
+    def _retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up."""
+        run_s = self._avg_run_s or 1.0
+        waves = (self._in_flight - self.workers) / self.workers + 1
+        return max(1, math.ceil(run_s * max(waves, 1.0)))
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise ServiceBusyError(
+                    "Analysis queue is full. Please retry later.",
+                    retry_after=self._retry_after()
+                )
+            self._in_flight += 1
+            self._submitted += 1
+
+    def _finish(self, enqueued_at: float, future: Future):
+        # Runs when the task itself ends, even if the awaiting request was
+        # cancelled, so in_flight always reflects work the pool still holds.
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+                return
+            started_at, finished_at, _ = future.result()
+            wait_s = max(0.0, started_at - enqueued_at)
+            run_s = max(0.0, finished_at - started_at)
+            self._completed += 1
+            self._last_wait_s = wait_s
+            self._max_wait_s = max(self._max_wait_s, wait_s)
+            self._total_wait_s += wait_s
+            if self._avg_run_s is None:
+                self._avg_run_s = run_s
+            else:
+                self._avg_run_s += _EWMA_ALPHA * (run_s - self._avg_run_s)
+
+    def _get_relay(self) -> _CallbackRelay:
+        # The Manager is a process of its own; only start it once needed
+        with self._lock:
+            if self._relay is None:
+                self._relay = _CallbackRelay(self._mp_context)
+            return self._relay
+
+    # ---- public API ----
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        callbacks: Optional[Dict[str, Callable]] = None,
+        **kwargs
+    ) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` and return a Future of its result.
+        Raises ServiceBusyError immediately when the pool is saturated.
+
+        `callbacks` are keyword arguments that must run in this process,
+        such as progress reporters. Thread workers get them as they are;
+        process workers get stand-ins whose calls are relayed back here,
+        in order, and all made before the returned Future resolves.
+        """
+        self._admit()
+        enqueued_at = time.time()
+        relayed: Dict[str, _RelayedCallback] = {}
+        try:
+            if callbacks and self.kind == "process":
+                relayed = self._get_relay().register(callbacks)
+                kwargs.update(relayed)
+            elif callbacks:
+                kwargs.update(callbacks)
+            inner = self._executor.submit(self._call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+                self._submitted -= 1
+            raise
+
+        outer: Future = Future()
+
+        def _settle(f: Future):
+            if f.cancelled():
+                outer.cancel()
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                outer.set_result(f.result()[2])
+
+        def _done(f: Future):
+            self._finish(enqueued_at, f)
+            if relayed:
+                self._relay.close(relayed, lambda: _settle(f))
+            else:
+                _settle(f)
+
+        inner.add_done_callback(_done)
+        return outer
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` on the pool and await its result without
+        blocking the event loop. Raises ServiceBusyError when saturated.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._relay is not None:
+            self._relay.shutdown()
+
+    def stats(self) -> Dict:
+        # One snapshot under the lock: submitted == in_flight + completed + failed
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "queue_limit": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "last_wait_s": round(self._last_wait_s, 3),
+                "max_wait_s": round(self._max_wait_s, 3),
+                "avg_wait_s": round(self._total_wait_s / self._completed, 3) if self._completed else 0.0,
+                "avg_run_s": round(self._avg_run_s, 3) if self._avg_run_s is not None else None
+            }
+
+
+# Created in the app lifespan
+pool: Optional[AnalysisPool] = None
+
+
+def start_pool(kind: str, workers: int, max_queue: int) -> AnalysisPool:
+    global pool
+    pool = AnalysisPool(kind, workers, max_queue)
+    return pool
+
+
+def shutdown_pool():
+    global pool
+    if pool is not None:
+        pool.shutdown()
+        pool = None
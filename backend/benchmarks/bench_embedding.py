@@ -0,0 +1,96 @@
+"""
+Benchmark: end-to-end embedding time per document.
+
+Compares the old embedding stage of score_clauses_batch (clause primary
+and CONTEXT: passes, then two encode calls per clause for its probes)
+against the single document-wide plan in app.scoring.embed_document.
+
+Run from backend/:
+    python -m benchmarks.bench_embedding [PDF ...]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app import models
+from app.chunking import chunk_pages, deduplicate_chunks
+from app.document_io import extract_pages_from_pdf_bytes
+from app.scoring import _make_subclauses, embed_document
+
+SAMPLE_PDF = (
+    Path(__file__).resolve().parents[2]
+    / "MEDALISTDIVERSIFIEDREIT%2CINC_05_18_2020-EX-10.1-CONSULTING%20AGREEMENT.PDF"
+)
+
+
+def _embed_per_clause(texts):
+    """Reference implementation: the pre-planning embedding stage."""
+    primary_q = models.embed_model.encode(
+        texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=32
+    ).astype("float32")
+    models.embed_model.encode(
+        ["CONTEXT:\n" + t for t in texts],
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        batch_size=32
+    )
+
+    out = []
+    for text in texts:
+        probes = _make_subclauses(text)
+        primary = models.embed_model.encode(
+            probes, convert_to_numpy=True, normalize_embeddings=True
+        ).astype("float32")
+        secondary = models.embed_model.encode(
+            ["CONTEXT:\n" + p for p in probes],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype("float32")
+        out.append(np.hstack([primary, secondary]))
+    return primary_q, np.vstack(out)
+
+
+def _time(fn, *args, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path, default=[SAMPLE_PDF])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    models.load_embedding_model()
+
+    print(f"{'document':40s} {'clauses':>7s} {'probes':>7s} {'before_s':>9s} {'after_s':>9s} {'speedup':>8s}")
+    for path in args.pdfs:
+        pages = extract_pages_from_pdf_bytes(path.read_bytes())
+        texts = [c["clause_text"] for c in deduplicate_chunks(chunk_pages(pages))]
+
+        before, (ref_q, ref_probes) = _time(_embed_per_clause, texts, repeat=args.repeat)
+        after, (q, vecs, _) = _time(embed_document, texts, repeat=args.repeat)
+
+        # Same vectors, different batching: only float noise is allowed.
+        max_diff = max(
+            float(np.max(np.abs(ref_q - q))) if len(q) else 0.0,
+            float(np.max(np.abs(ref_probes - vecs))) if len(vecs) else 0.0
+        )
+
+        print(
+            f"{path.name[:40]:40s} {len(texts):7d} {len(vecs):7d} "
+            f"{before:9.3f} {after:9.3f} {before / max(after, 1e-9):7.2f}x"
+            f"  (max |diff|={max_diff:.2e})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: per-page embedded-text extraction latency, pdfplumber vs PyMuPDF.
+
+Runs both engines of app.document_io over the same PDFs and reports the
+best-of-N time per page and whether the extracted text is identical.
+
+Run from backend/:
+    python -m benchmarks.bench_extract [PDF ...] [--repeat 5]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from app.document_io import _extract_with_pdfplumber, _extract_with_pymupdf
+
+SAMPLE_PDF = (
+    Path(__file__).resolve().parents[2]
+    / "MEDALISTDIVERSIFIEDREIT%2CINC_05_18_2020-EX-10.1-CONSULTING%20AGREEMENT.PDF"
+)
+
+
+def _time(fn, *args, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path, default=[SAMPLE_PDF])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'document':40s} {'pages':>5s} {'pdfplumber_ms/pg':>16s} "
+        f"{'pymupdf_ms/pg':>13s} {'speedup':>8s} {'same_text':>9s}"
+    )
+    for path in args.pdfs:
+        before, plumber_pages = _time(_extract_with_pdfplumber, str(path), repeat=args.repeat)
+        after, fitz_pages = _time(_extract_with_pymupdf, str(path), repeat=args.repeat)
+        n = max(len(fitz_pages), 1)
+        same = sum(a["text"] == b["text"] for a, b in zip(plumber_pages, fitz_pages))
+
+        print(
+            f"{path.name[:40]:40s} {len(fitz_pages):5d} {before / n * 1000:16.2f} "
+            f"{after / n * 1000:13.2f} {before / max(after, 1e-9):7.1f}x "
+            f"{same:>4d}/{len(fitz_pages)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
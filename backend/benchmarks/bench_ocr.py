@@ -0,0 +1,95 @@
+"""
+Benchmark: OCR throughput (pages/second) against OCR worker count.
+
+Builds a synthetic scanned PDF locally (text pages rendered to images and
+re-inserted as image-only pages, so there is no embedded text) and OCRs
+every page with app.document_io._extract_with_ocr at each worker count.
+
+Run from backend/ (needs the tesseract binary on PATH):
+    python -m benchmarks.bench_ocr [--pages 16] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from app import document_io
+
+CLAUSES = [
+    "The Consultant shall not, during the term of this Agreement and for twelve months "
+    "thereafter, directly or indirectly compete with the Company.",
+    "The Company shall indemnify and hold harmless the Consultant against all losses, "
+    "claims and expenses arising out of the services.",
+    "Either party may terminate this Agreement upon thirty days written notice to the "
+    "other party.",
+    "All confidential information disclosed under this Agreement shall remain the "
+    "property of the disclosing party."
+]
+
+
+def build_scanned_pdf(path: str, pages: int, dpi: int = 150) -> None:
+    """Image-only PDF: every page is a rendered bitmap of a text page."""
+    out = fitz.open()
+    for i in range(pages):
+        src = fitz.open()
+        page = src.new_page()
+        body = f"Section {i + 1}.\n\n" + "\n\n".join(CLAUSES * 3)
+        page.insert_textbox(fitz.Rect(72, 72, 540, 760), body, fontsize=11)
+        pix = page.get_pixmap(dpi=dpi)
+        scanned = out.new_page(width=page.rect.width, height=page.rect.height)
+        scanned.insert_image(scanned.rect, stream=pix.tobytes("png"))
+        src.close()
+    out.save(path)
+    out.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=16)
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        build_scanned_pdf(path, args.pages)
+        pages = list(range(1, args.pages + 1))
+        # every run OCRs the same pages; measure OCR, not cache hits
+        document_io.set_ocr_cache(None)
+
+        print(f"{'workers':>7s} {'seconds':>8s} {'pages/s':>8s} {'speedup':>8s}")
+        baseline_s = None
+        reference = None
+        for workers in args.workers:
+            document_io.set_ocr_workers(workers)
+            # the per-document cap would hide the scaling being measured
+            document_io.OCR_MAX_WORKERS_PER_DOC = workers
+            if workers > 1:
+                # start the pool outside the timed run
+                document_io._extract_with_ocr(path, pages[:workers])
+
+            start = time.perf_counter()
+            result = document_io._extract_with_ocr(path, pages)
+            elapsed = time.perf_counter() - start
+
+            texts = [p["text"] for p in result]
+            if reference is None:
+                reference, baseline_s = texts, elapsed
+            same = "" if texts == reference else "  (text differs from 1 worker!)"
+            print(
+                f"{workers:7d} {elapsed:8.2f} {len(pages) / elapsed:8.2f} "
+                f"{baseline_s / elapsed:7.2f}x{same}"
+            )
+    finally:
+        document_io.shutdown_ocr_pool()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# ---------------------------------------
+# Model doubles
+# ---------------------------------------
+
+
+class HashEmbedder:
+    """
+    Deterministic SentenceTransformer double: each distinct text maps to
+    a fixed unit vector, so identical texts embed identically.
+    """
+
+    def __init__(self, dim: int = 16):
+        self.dim = dim
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=32):
+        texts = list(texts)
+        self.calls.append(texts)
+        if not texts:
+            return np.empty((0, self.dim), dtype="float32")
+        return np.stack([self.vector(t) for t in texts])
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        return v / np.linalg.norm(v)
+
+
+class OverlapCrossEncoder:
+    """CrossEncoder double: the raw score is the shared word count, case-sensitive."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        pairs = [list(p) for p in pairs]
+        self.calls.append(pairs)
+        return np.array(
+            [len(set(a.split()) & set(b.split())) - 3.0 for a, b in pairs],
+            dtype="float32"
+        )
+
+
+REFERENCE_RECORDS = [
+    {
+        "label": "non_compete",
+        "answer_text": "The Consultant shall not compete with the Company for twelve months.",
+        "source_title": "A"
+    },
+    {
+        "label": "indemnification",
+        "answer_text": "The Company shall indemnify the Consultant against all losses.",
+        "source_title": "B"
+    },
+    {
+        "label": "termination",
+        "answer_text": "Either party may terminate this Agreement upon thirty days notice.",
+        "source_title": "C"
+    },
+    {
+        "label": "confidentiality",
+        "answer_text": "All confidential information shall remain the property of the disclosing party.",
+        "source_title": "D"
+    }
+]
+
+
+def make_reference(models, embedder, directory, records=REFERENCE_RECORDS, manifest=None, identity_index=None):
+    """A ReferenceSet over `records`, embedded the way app.build_index does."""
+    import faiss
+    from app.metadata_store import MetadataStore
+
+    MetadataStore.write(records, str(directory))
+    store = MetadataStore(str(directory))
+    texts = [r["answer_text"] for r in records]
+    primary = embedder.encode(texts)
+    context = embedder.encode(["CONTEXT:\n" + t for t in texts])
+    index = faiss.IndexFlatIP(2 * embedder.dim)
+    index.add(np.hstack([primary, context]))
+    return models.ReferenceSet(
+        index, primary, store, identity_index,
+        manifest or {"reference_id": "test-ref", "generation": 1}
+    )
+
+
+@pytest.fixture
+def scoring_models(monkeypatch, tmp_path):
+    """app.models populated with the doubles above and a small reference set."""
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from app import models
+
+    embedder = HashEmbedder()
+    reranker = OverlapCrossEncoder()
+    ref = make_reference(models, embedder, tmp_path / "metadata_store")
+    embedder.calls.clear()
+
+    monkeypatch.setattr(models, "embed_model", embedder)
+    monkeypatch.setattr(models, "reranker", reranker)
+    for name in ("embedding_cache", "rerank_cache", "result_cache", "embed_scheduler", "rerank_scheduler"):
+        monkeypatch.setattr(models, name, None)
+    for name in ("reference", "faiss_index", "primary_embs", "metadata", "identity_index", "manifest"):
+        monkeypatch.setattr(models, name, None)
+    models._publish_reference(ref)
+
+    return SimpleNamespace(models=models, embedder=embedder, reranker=reranker, reference=ref)
+
+
+# ---------------------------------------
+# API
+# ---------------------------------------
+
+ANALYSIS_RESULT = {
+    "document_risk": "low_risk",
+    "doc_score": 2,
+    "label_summary": {},
+    "clauses": []
+}
+
+
+def fake_analyze_document(pdf_path, progress=None):
+    """analyze_document double: walks the stages and returns ANALYSIS_RESULT."""
+    from app.progress import STAGES, report
+
+    with open(pdf_path, "rb") as f:
+        f.read()
+    for stage in STAGES:
+        report(progress, stage, "running")
+        report(progress, stage, "done")
+    return dict(ANALYSIS_RESULT)
+
+
+@pytest.fixture
+def api(scoring_models, monkeypatch, tmp_path):
+    """TestClient over app.main with the model doubles, a stub pipeline and an in-memory analysis store."""
+    from fastapi.testclient import TestClient
+    from app import analysis_cache, main
+    from app.analysis_store import MemoryAnalysisStore
+
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    monkeypatch.setattr(scoring_models.models, "initialize_models", lambda: None)
+    monkeypatch.setattr(main, "analyze_document", fake_analyze_document)
+    monkeypatch.setattr(main, "REFERENCE_RELOAD_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "ANALYSIS_CACHE_SWEEP_SECONDS", 0)
+    monkeypatch.setattr(main, "UPLOAD_SPOOL_DIR", str(spool_dir))
+    monkeypatch.setattr(analysis_cache, "_store", MemoryAnalysisStore(1 << 30, 100))
+    monkeypatch.setattr(analysis_cache, "_JOB_PDFS", {})
+
+    with TestClient(main.app) as client:
+        yield SimpleNamespace(client=client, main=main, spool_dir=spool_dir)
@@ -0,0 +1,151 @@
+import os
+
+import pytest
+
+from app import analysis_cache
+from app.analysis_store import MemoryAnalysisStore
+from app.progress import STAGES
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(analysis_cache, "_store", None)
+    monkeypatch.setattr(analysis_cache, "_JOB_PDFS", {})
+    s = MemoryAnalysisStore(max_bytes=1 << 30, max_entries=100)
+    analysis_cache.set_store(s)
+    return s
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    return str(path)
+
+
+RESULT = {"document_summary": {"labels": []}, "clauses": []}
+
+
+def test_job_reports_progress_then_result(store, pdf_path):
+    analysis_id = analysis_cache.create_job_entry(pdf_path)
+    status = analysis_cache.get_job_status(analysis_id)
+    assert status["status"] == "queued" and status["stage"] is None
+    assert status["stages"] == {stage: "pending" for stage in STAGES}
+
+    analysis_cache.update_job_stage(analysis_id, "extract", "done")
+    analysis_cache.update_job_stage(analysis_id, "chunk", "running")
+    status = analysis_cache.get_job_status(analysis_id)
+    assert status["status"] == "running" and status["stage"] == "chunk"
+    assert status["stages"]["extract"] == "done" and status["stages"]["embed"] == "pending"
+    assert analysis_cache.get_analysis_pdf(analysis_id) is None
+
+    analysis_cache.complete_job(analysis_id, RESULT)
+    status = analysis_cache.get_job_status(analysis_id)
+    assert status["status"] == "done" and set(status["stages"].values()) == {"done"}
+    assert analysis_cache.get_analysis_entry(analysis_id)["result"] == RESULT
+    assert analysis_cache.get_analysis_pdf(analysis_id) == b"%PDF-1.4 test"
+    assert analysis_cache.cache_stats()["running_job_pdfs"] == 0
+
+
+def test_job_that_outlives_the_ttl_still_completes(store, pdf_path):
+    analysis_id = analysis_cache.create_job_entry(pdf_path, ttl_seconds=60)
+    # the job has been queued longer than its TTL
+    store.update(analysis_id, lambda entry: entry.update(expires_at=0))
+    assert analysis_cache.cleanup_expired_entries() == 0
+    assert analysis_cache.get_job_status(analysis_id)["status"] == "queued"
+
+    # no progress reported (e.g. a process-pool job) before it finishes
+    analysis_cache.complete_job(analysis_id, RESULT)
+
+    assert analysis_cache.get_job_status(analysis_id)["status"] == "done"
+    assert analysis_cache.get_analysis_entry(analysis_id)["result"] == RESULT
+    assert analysis_cache.get_analysis_pdf(analysis_id) == b"%PDF-1.4 test"
+
+
+def test_late_progress_does_not_reopen_a_finished_job(store, pdf_path):
+    analysis_id = analysis_cache.create_job_entry(pdf_path)
+    analysis_cache.complete_job(analysis_id, RESULT)
+    analysis_cache.update_job_stage(analysis_id, "rerank", "running")
+    assert analysis_cache.get_job_status(analysis_id)["status"] == "done"
+
+
+def test_failed_job_keeps_the_error_and_drops_the_pdf(store, pdf_path):
+    analysis_id = analysis_cache.create_job_entry(pdf_path)
+    analysis_cache.fail_job(analysis_id, "Could not extract text")
+
+    status = analysis_cache.get_job_status(analysis_id)
+    assert status["status"] == "failed" and status["error"] == "Could not extract text"
+    assert not os.path.exists(pdf_path)
+
+
+def test_synchronous_entry_owns_its_pdf_until_deleted(store, pdf_path):
+    analysis_id = analysis_cache.create_analysis_entry(pdf_path, RESULT)
+    assert analysis_cache.get_job_status(analysis_id)["status"] == "done"
+
+    analysis_cache.delete_analysis_entry(analysis_id)
+    assert analysis_cache.get_job_status(analysis_id) is None
+    assert not os.path.exists(pdf_path)
+
+
+def test_unknown_or_expired_ids_have_no_status(store, pdf_path):
+    assert analysis_cache.get_job_status("missing") is None
+    analysis_id = analysis_cache.create_analysis_entry(pdf_path, RESULT, ttl_seconds=-1)
+    assert analysis_cache.get_job_status(analysis_id) is None
+    assert not os.path.exists(pdf_path)
+
+
+# ---------------------------------------
+# Budget and expiry
+# ---------------------------------------
+
+def _spooled(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_least_recently_used_entries_are_evicted_over_the_entry_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis_cache, "_store", MemoryAnalysisStore(max_bytes=1 << 30, max_entries=2))
+    pdfs = [_spooled(tmp_path, f"{i}.pdf", 10) for i in range(3)]
+    first, second = (analysis_cache.create_analysis_entry(p, RESULT) for p in pdfs[:2])
+
+    # reading the first entry makes the second the least recently used
+    assert analysis_cache.get_analysis_entry(first) is not None
+    third = analysis_cache.create_analysis_entry(pdfs[2], RESULT)
+
+    assert analysis_cache.get_analysis_entry(second) is None and not os.path.exists(pdfs[1])
+    assert analysis_cache.get_analysis_entry(first) and analysis_cache.get_analysis_entry(third)
+    assert analysis_cache.cache_stats()["evictions"] == 1
+
+
+def test_byte_budget_counts_results_and_pdfs_but_spares_running_jobs(monkeypatch, tmp_path):
+    store = MemoryAnalysisStore(max_bytes=1000, max_entries=100)
+    monkeypatch.setattr(analysis_cache, "_store", store)
+    monkeypatch.setattr(analysis_cache, "_JOB_PDFS", {})
+
+    job = analysis_cache.create_job_entry(_spooled(tmp_path, "job.pdf", 10))
+    done = analysis_cache.create_analysis_entry(_spooled(tmp_path, "done.pdf", 400), RESULT)
+    stats = analysis_cache.cache_stats()
+    assert stats["pdf_bytes"] == 400 and stats["bytes"] == stats["pdf_bytes"] + stats["result_bytes"]
+
+    # over budget: the finished entry goes, the queued job stays
+    analysis_cache.create_analysis_entry(_spooled(tmp_path, "big.pdf", 700), RESULT)
+    assert analysis_cache.get_analysis_entry(done) is None
+    assert analysis_cache.get_job_status(job)["status"] == "queued"
+
+    # the entry just stored is kept even when it alone is over budget
+    huge = analysis_cache.create_analysis_entry(_spooled(tmp_path, "huge.pdf", 2000), RESULT)
+    assert analysis_cache.get_analysis_pdf(huge) == b"x" * 2000
+
+
+def test_sweep_removes_expired_entries_and_their_pdfs(store, tmp_path):
+    stale = _spooled(tmp_path, "stale.pdf", 10)
+    fresh = _spooled(tmp_path, "fresh.pdf", 10)
+    analysis_cache.create_analysis_entry(stale, RESULT, ttl_seconds=-1)
+    kept = analysis_cache.create_analysis_entry(fresh, RESULT)
+
+    assert analysis_cache.cleanup_expired_entries() == 1
+    assert not os.path.exists(stale) and os.path.exists(fresh)
+    assert analysis_cache.get_analysis_entry(kept) is not None
+    stats = analysis_cache.cache_stats()
+    assert stats["entries"] == 1 and stats["expirations"] == 1
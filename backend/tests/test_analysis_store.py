@@ -0,0 +1,208 @@
+import fnmatch
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import analysis_store
+from app.analysis_store import DiskAnalysisStore, MemoryAnalysisStore, RedisAnalysisStore
+
+PDF = b"%PDF-1.4 stored"
+
+
+class FakeRedis:
+    """The slice of redis-py the store uses, with expiry checked on read."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self.data[key] = (value, time.time() + ex if ex else None)
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires < time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        return [k for k in list(self.data) if fnmatch.fnmatch(k, match) and self.get(k) is not None]
+
+
+@pytest.fixture(params=["memory", "disk", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryAnalysisStore(max_bytes=1 << 30, max_entries=100)
+    if request.param == "disk":
+        return DiskAnalysisStore(str(tmp_path / "store"), max_bytes=1 << 30, max_entries=100)
+    return RedisAnalysisStore("redis://unused", "test:", client=FakeRedis())
+
+
+def _spooled(tmp_path, name="upload.pdf", data=PDF):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _entry(status="done", ttl=60, **fields):
+    return {"status": status, "expires_at": time.time() + ttl, **fields}
+
+
+# ---------------------------------------
+# Every backend
+# ---------------------------------------
+
+def test_entries_round_trip_and_the_store_takes_the_pdf(store, tmp_path):
+    pdf_path = _spooled(tmp_path)
+    store.put("a", _entry(result={"doc_score": 3}), pdf_path=pdf_path)
+
+    assert store.get("a")["result"] == {"doc_score": 3}
+    assert store.pdf("a") == PDF
+    assert store.get("missing") is None and store.pdf("missing") is None
+    if store.name != "memory":
+        # moved into the store's own blob storage
+        assert not (tmp_path / "upload.pdf").exists()
+
+
+def test_update_applies_in_place_and_can_attach_the_pdf(store, tmp_path):
+    store.put("job", _entry(status="running", stage="embed"))
+    assert store.pdf("job") is None
+
+    def finish(entry):
+        entry["status"] = "done"
+        entry["result"] = {"clauses": []}
+
+    assert store.update("job", finish, pdf_path=_spooled(tmp_path))
+    entry = store.get("job")
+    assert entry["status"] == "done" and entry["stage"] == "embed" and entry["result"] == {"clauses": []}
+    assert store.pdf("job") == PDF
+
+    # updating a vanished entry drops the handed-over PDF
+    late = _spooled(tmp_path, "late.pdf")
+    assert not store.update("gone", finish, pdf_path=late)
+    assert not (tmp_path / "late.pdf").exists()
+
+
+def test_deleted_and_expired_entries_are_gone(store, tmp_path):
+    store.put("a", _entry(), pdf_path=_spooled(tmp_path))
+    store.put("old", _entry(ttl=-1))
+
+    store.delete("a")
+    assert store.get("a") is None and store.pdf("a") is None
+    assert store.get("old") is None
+
+
+def test_pdf_copy_outlives_the_entry(store, tmp_path):
+    store.put("a", _entry(), pdf_path=_spooled(tmp_path))
+    pdf = store.pdf("a")
+    store.delete("a")
+    assert pdf == PDF
+
+
+# ---------------------------------------
+# Disk
+# ---------------------------------------
+
+def test_disk_entries_are_shared_between_workers(tmp_path):
+    directory = str(tmp_path / "store")
+    first = DiskAnalysisStore(directory, max_bytes=1 << 30, max_entries=100)
+    second = DiskAnalysisStore(directory, max_bytes=1 << 30, max_entries=100)
+
+    first.put("a", _entry(result={"doc_score": 1}), pdf_path=_spooled(tmp_path))
+
+    assert second.get("a")["result"] == {"doc_score": 1}
+    assert second.pdf("a") == PDF
+    second.delete("a")
+    assert first.get("a") is None
+
+
+def test_disk_blobs_are_shared_and_collected_with_the_last_entry(tmp_path):
+    store = DiskAnalysisStore(str(tmp_path / "store"), max_bytes=1 << 30, max_entries=100)
+    store.put("a", _entry(), pdf_path=_spooled(tmp_path, "a.pdf"))
+    store.put("b", _entry(), pdf_path=_spooled(tmp_path, "b.pdf"))
+    assert store.stats()["pdf_blobs"] == 1 and store.stats()["pdf_bytes"] == len(PDF)
+
+    store.delete("a")
+    assert store.pdf("b") == PDF
+    store.delete("b")
+    assert store.stats()["pdf_blobs"] == 0
+    assert list((tmp_path / "store" / "blobs").rglob("*.pdf")) == []
+
+
+def test_disk_evicts_least_recently_used_finished_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_store, "_TOUCH_INTERVAL_SECONDS", 0)
+    store = DiskAnalysisStore(str(tmp_path / "store"), max_bytes=1 << 30, max_entries=3)
+    store.put("job", _entry(status="running"))
+    store.put("a", _entry())
+    time.sleep(0.01)
+    store.put("b", _entry())
+    time.sleep(0.01)
+
+    store.get("a")
+    store.put("c", _entry())
+
+    assert store.get("b") is None
+    assert store.get("job") and store.get("a") and store.get("c")
+    assert store.stats()["evictions"] == 1
+
+
+def test_disk_reads_do_not_wait_for_a_writer(tmp_path):
+    directory = tmp_path / "store"
+    store = DiskAnalysisStore(str(directory), max_bytes=1 << 30, max_entries=100)
+    store.put("a", _entry(), pdf_path=_spooled(tmp_path))
+
+    # another worker holds the write lock
+    writer = sqlite3.connect(str(directory / "index.sqlite"), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    reads = []
+    try:
+        reader = threading.Thread(target=lambda: reads.extend([store.get("a"), store.pdf("a")]))
+        reader.start()
+        reader.join(5)
+        assert not reader.is_alive()
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert reads[0]["status"] == "done" and reads[1] == PDF
+
+
+# ---------------------------------------
+# Redis
+# ---------------------------------------
+
+def test_redis_keys_expire_with_the_entry_and_pdfs_are_shared(tmp_path):
+    client = FakeRedis()
+    store = RedisAnalysisStore("redis://unused", "test:", client=client)
+    store.put("a", _entry(ttl=120), pdf_path=_spooled(tmp_path, "a.pdf"))
+    store.put("b", _entry(ttl=120), pdf_path=_spooled(tmp_path, "b.pdf"))
+
+    pdf_keys = [k for k in client.data if k.startswith("test:pdf:")]
+    assert len(pdf_keys) == 1
+    for value, expires in client.data.values():
+        assert 100 < expires - time.time() <= 120
+    assert store.stats() == {"backend": "redis", "entries": 2}
+
+    # the PDF key may be shared, so deleting an entry leaves it to expire
+    store.delete("a")
+    assert store.pdf("b") == PDF and store.stats()["entries"] == 1
+
+
+def test_active_jobs_outlive_their_ttl_until_they_finish(store, tmp_path):
+    store.put("job", _entry(status="running", ttl=-1))
+
+    assert store.cleanup() == 0
+    assert store.get("job")["status"] == "running"
+
+    def finish(entry):
+        entry["status"] = "done"
+
+    # finished, but still past expires_at: from now on it expires as usual
+    assert store.update("job", finish, pdf_path=_spooled(tmp_path))
+    assert store.get("job") is None and store.pdf("job") is None
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+
+import pytest
+
+from tests.conftest import ANALYSIS_RESULT
+
+PDF = b"%PDF-1.4\n" + b"0" * 4096
+
+
+def _upload(name="contract.pdf", data=PDF):
+    return {"file": (name, data, "application/pdf")}
+
+
+def _wait_for_job(client, analysis_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/jobs/{analysis_id}").json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {analysis_id} did not finish")
+
+
+# ---------------------------------------
+# Uploads
+# ---------------------------------------
+
+def test_oversized_upload_is_refused_and_leaves_no_spool_file(api, monkeypatch):
+    monkeypatch.setattr(api.main, "MAX_FILE_SIZE_BYTES", 1024)
+
+    r = api.client.post("/analyze", files=_upload())
+
+    assert r.status_code == 413 and "contract.pdf" in r.json()["message"]
+    assert list(api.spool_dir.iterdir()) == []
+
+
+def test_chunked_upload_over_the_route_limit_is_refused(api, monkeypatch):
+    monkeypatch.setitem(api.main._UPLOAD_ROUTE_LIMITS, "/analyze", 1024)
+    body = b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n" + PDF
+
+    # a generator body is sent chunked, without Content-Length
+    r = api.client.post(
+        "/analyze",
+        content=(body[i:i + 512] for i in range(0, len(body), 512)),
+        headers={"content-type": "multipart/form-data; boundary=b"}
+    )
+
+    assert r.status_code == 413 and r.json()["message"].startswith("Request too large")
+    assert list(api.spool_dir.iterdir()) == []
+
+
+def test_repeat_upload_is_served_from_the_result_cache(api, monkeypatch, tmp_path):
+    from app.result_cache import ResultCache
+
+    calls = []
+    monkeypatch.setattr(api.main, "analyze_document", lambda path: calls.append(path) or dict(ANALYSIS_RESULT))
+    monkeypatch.setattr(api.main.models, "result_cache", ResultCache(str(tmp_path / "results.db"), 10))
+
+    first = api.client.post("/analyze", files=_upload()).json()
+    second = api.client.post("/analyze", files=_upload(name="copy.pdf")).json()
+    third = api.client.post("/analyze", files=_upload(data=PDF + b"edit")).json()
+
+    assert len(calls) == 2 and first["doc_score"] == second["doc_score"] == third["doc_score"]
+    assert api.main.models.result_cache.stats()["hits"] == 1
+
+
+# ---------------------------------------
+# Analysis cache
+# ---------------------------------------
+
+def test_sweeper_removes_expired_entries_on_its_interval(api, monkeypatch):
+    sweeps = []
+    monkeypatch.setattr(api.main, "cleanup_expired_entries", lambda: sweeps.append(1) or 2)
+
+    async def run_briefly():
+        task = asyncio.create_task(api.main._sweep_analysis_cache(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_briefly())
+    assert len(sweeps) >= 2
+
+
+# ---------------------------------------
+# Jobs
+# ---------------------------------------
+
+def test_job_is_queued_then_served_from_the_cache(api):
+    r = api.client.post("/jobs", files=_upload())
+    assert r.status_code == 202 and r.json()["status"] == "queued"
+    analysis_id = r.json()["analysis_id"]
+
+    status = _wait_for_job(api.client, analysis_id)
+    assert status["status"] == "done" and set(status["stages"].values()) == {"done"}
+
+    r = api.client.get(f"/jobs/{analysis_id}/result")
+    assert r.status_code == 200
+    assert r.json() == {"analysis_id": analysis_id, **ANALYSIS_RESULT}
+
+
+def test_unfinished_job_result_is_a_conflict(api, monkeypatch):
+    release = threading.Event()
+
+    def slow(pdf_path, progress=None):
+        release.wait(5)
+        return dict(ANALYSIS_RESULT)
+
+    monkeypatch.setattr(api.main, "analyze_document", slow)
+    analysis_id = api.client.post("/jobs", files=_upload()).json()["analysis_id"]
+    try:
+        assert api.client.get(f"/jobs/{analysis_id}/result").status_code == 409
+    finally:
+        release.set()
+    assert _wait_for_job(api.client, analysis_id)["status"] == "done"
+
+
+def test_failed_job_reports_its_error(api, monkeypatch):
+    def broken(pdf_path, progress=None):
+        raise ValueError("no text layer")
+
+    monkeypatch.setattr(api.main, "analyze_document", broken)
+    analysis_id = api.client.post("/jobs", files=_upload()).json()["analysis_id"]
+
+    status = _wait_for_job(api.client, analysis_id)
+    assert status["status"] == "failed" and "no text layer" in status["error"]
+    assert api.client.get(f"/jobs/{analysis_id}/result").status_code == 422
+    assert list(api.spool_dir.iterdir()) == []
+
+
+@pytest.mark.parametrize("path", ["/jobs/missing", "/jobs/missing/result"])
+def test_unknown_job_is_not_found(api, path):
+    assert api.client.get(path).status_code == 404
+
+
+# ---------------------------------------
+# Streaming
+# ---------------------------------------
+
+def test_stream_emits_clauses_then_a_stored_summary(api, monkeypatch):
+    clause = {
+        "page_no": 1, "clause_text": "Either party may terminate.", "final_score": 0.9,
+        "identity": 0.5, "semantic": 0.9, "margin": 0.1, "labels": [], "boxes": None
+    }
+
+    def emit_document_events(pdf_path, emit):
+        emit({"event": "start", "pages": 1, "chunks": 1})
+        emit({"event": "clause", "clause": clause})
+        emit({"event": "summary", "document_risk": "high_risk", "doc_score": 9, "label_summary": {}})
+
+    monkeypatch.setattr(api.main, "emit_document_events", emit_document_events)
+    r = api.client.post("/analyze/stream", files=_upload())
+
+    assert r.status_code == 200 and r.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in r.text.splitlines()]
+    assert [e["event"] for e in events] == ["start", "clause", "summary"]
+    analysis_id = events[-1]["analysis_id"]
+    assert api.client.get(f"/jobs/{analysis_id}/result").json()["clauses"] == [clause]
+
+
+# ---------------------------------------
+# Batch
+# ---------------------------------------
+
+def test_batch_accepts_pdfs_and_zips_and_reports_per_document(api, monkeypatch):
+    seen = []
+
+    def analyze_documents(paths):
+        seen.extend(open(p, "rb").read() for p in paths)
+        return [dict(ANALYSIS_RESULT), {"error": "Failed to process document: boom"}, dict(ANALYSIS_RESULT)]
+
+    monkeypatch.setattr(api.main, "analyze_documents", analyze_documents)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("b.pdf", PDF + b"b")
+        z.writestr("notes.txt", b"ignored")
+        z.writestr("c.pdf", PDF + b"c")
+
+    r = api.client.post(
+        "/analyze/batch",
+        files=[("files", ("a.pdf", PDF, "application/pdf")), ("files", ("more.zip", archive.getvalue(), "application/zip"))]
+    )
+
+    assert r.status_code == 200
+    assert seen == [PDF, PDF + b"b", PDF + b"c"]
+    docs = r.json()["documents"]
+    assert [d["filename"] for d in docs] == ["a.pdf", "more.zip/b.pdf", "more.zip/c.pdf"]
+    assert "analysis_id" in docs[0] and docs[1]["error"].endswith("boom")
+    # the failed document's spooled copy is gone; the others belong to the cache
+    assert len(list(api.spool_dir.iterdir())) == 2
+
+
+def test_batch_rejects_other_file_types(api):
+    r = api.client.post("/analyze/batch", files=[("files", ("a.docx", b"x", "application/octet-stream"))])
+    assert r.status_code == 400
+    assert list(api.spool_dir.iterdir()) == []
@@ -0,0 +1,95 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app import build_index, models  # noqa: E402
+from tests.conftest import REFERENCE_RECORDS, HashEmbedder  # noqa: E402
+
+NEW_RECORD = {"label": "governing_law", "answer_text": "This Agreement is governed by the laws of Delaware."}
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def out_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(models, "embed_model", HashEmbedder())
+    monkeypatch.setattr(models, "embed_scheduler", None)
+    monkeypatch.setattr(models, "DEFAULT_FAISS_DIR", str(tmp_path / "FAISS"))
+    for name in ("reference", "faiss_index", "primary_embs", "metadata", "identity_index", "manifest"):
+        monkeypatch.setattr(models, name, None)
+    return str(tmp_path / "FAISS")
+
+
+def _generations(out_dir):
+    return sorted(os.listdir(os.path.join(out_dir, models.GENERATIONS_DIR)))
+
+
+def test_build_publishes_a_generation_and_points_current_at_it(out_dir, tmp_path):
+    manifest = build_index.build(_write_jsonl(tmp_path / "corpus.jsonl", REFERENCE_RECORDS), out_dir, 8, 3)
+
+    paths = models.served_artifact_paths()
+    assert paths.manifest == os.path.join(out_dir, "generations", "000001", "manifest.json")
+    assert models.read_manifest(paths.manifest) == manifest
+    assert manifest["generation"] == 1 and manifest["count"] == len(REFERENCE_RECORDS)
+    assert np.load(paths.primary_embs).shape == (len(REFERENCE_RECORDS), 16)
+    assert not os.path.exists(os.path.join(out_dir, ".build"))
+
+
+def test_append_and_rebuild_keep_one_previous_generation(out_dir, tmp_path):
+    corpus = _write_jsonl(tmp_path / "corpus.jsonl", REFERENCE_RECORDS)
+    first = build_index.build(corpus, out_dir, 8, 100)
+    appended = build_index.append(_write_jsonl(tmp_path / "new.jsonl", [NEW_RECORD]), out_dir, 8)
+
+    assert appended["generation"] == 2 and appended["count"] == len(REFERENCE_RECORDS) + 1
+    assert appended["reference_id"] == first["reference_id"]
+    assert appended["parent_checksum"] == first["checksum"]
+    assert _generations(out_dir) == ["000001", "000002"]
+
+    rebuilt = build_index.build(corpus, out_dir, 8, 100)
+    assert rebuilt["generation"] == 3
+    assert _generations(out_dir) == ["000002", "000003"]
+
+
+def test_crash_before_switch_leaves_previous_generation_current(out_dir, tmp_path, monkeypatch):
+    build_index.build(_write_jsonl(tmp_path / "corpus.jsonl", REFERENCE_RECORDS), out_dir, 8, 100)
+
+    switch_current = build_index._switch_current
+
+    def crash(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(build_index, "_switch_current", crash)
+    with pytest.raises(OSError):
+        build_index.append(_write_jsonl(tmp_path / "new.jsonl", [NEW_RECORD]), out_dir, 8)
+
+    paths = models.served_artifact_paths()
+    assert models.read_manifest(paths.manifest)["generation"] == 1
+    assert len(models.MetadataStore.load(paths.metadata, paths.metadata_store)) == len(REFERENCE_RECORDS)
+
+    monkeypatch.setattr(build_index, "_switch_current", switch_current)
+    assert build_index.append(str(tmp_path / "new.jsonl"), out_dir, 8)["generation"] == 2
+
+
+def test_service_hot_swaps_to_the_published_generation(out_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(models, "IDENTITY_INDEX", "blocked")
+    build_index.build(_write_jsonl(tmp_path / "corpus.jsonl", REFERENCE_RECORDS), out_dir, 8, 100)
+    assert models.reload_reference_set()
+    assert not models.reload_reference_set()
+    old = models.reference
+
+    build_index.append(_write_jsonl(tmp_path / "new.jsonl", [NEW_RECORD]), out_dir, 8)
+    assert models.reload_reference_set()
+
+    assert models.reference.generation == 2
+    assert len(models.reference.metadata) == models.reference.faiss_index.ntotal == len(REFERENCE_RECORDS) + 1
+    assert len(old.metadata) == old.faiss_index.ntotal == len(REFERENCE_RECORDS)
@@ -0,0 +1,52 @@
+import json
+
+from app.bulk_analyze import extract_document, iter_pdfs, load_skip_ids, recover_output, save_skip_ids
+
+
+def _line(doc_id):
+    return json.dumps({"id": doc_id, "doc_score": 1}) + "\n"
+
+
+def test_skip_ids_round_trip(tmp_path):
+    skip = tmp_path / "out.jsonl.processed"
+    assert load_skip_ids(skip) == set()
+    save_skip_ids(skip, ["a.pdf", "b/c.pdf"])
+    save_skip_ids(skip, ["d.pdf"])
+    assert load_skip_ids(skip) == {"a.pdf", "b/c.pdf", "d.pdf"}
+
+
+def test_resume_counts_written_but_unmarked_documents_as_processed(tmp_path):
+    out, skip = tmp_path / "out.jsonl", tmp_path / "out.jsonl.processed"
+    out.write_text(_line("a.pdf") + _line("b.pdf"))
+    save_skip_ids(skip, ["a.pdf"])
+
+    assert recover_output(out, skip) == {"a.pdf", "b.pdf"}
+    assert load_skip_ids(skip) == {"a.pdf", "b.pdf"}
+    assert skip.read_text().count("a.pdf") == 1
+
+
+def test_resume_drops_a_torn_last_line(tmp_path):
+    out, skip = tmp_path / "out.jsonl", tmp_path / "out.jsonl.processed"
+    out.write_text(_line("a.pdf") + '{"id": "b.pdf", "doc_sc')
+
+    assert recover_output(out, skip) == {"a.pdf"}
+    assert out.read_text() == _line("a.pdf")
+
+
+def test_resume_without_output_is_empty(tmp_path):
+    assert recover_output(tmp_path / "out.jsonl", tmp_path / "out.jsonl.processed") == set()
+
+
+def test_pdfs_are_walked_in_a_stable_order(tmp_path):
+    for name in ("b.pdf", "a/z.PDF", "a/notes.txt", "c.pdf"):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"%PDF")
+    assert [str(p.relative_to(tmp_path)) for p in iter_pdfs(tmp_path)] == ["b.pdf", "c.pdf", "a/z.PDF"]
+
+
+def test_extraction_failures_are_returned_not_raised(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+    doc = extract_document(str(tmp_path), str(path))
+    assert doc["id"] == "broken.pdf" and doc["error"].startswith("Failed to process document")
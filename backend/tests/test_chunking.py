@@ -0,0 +1,81 @@
+import fitz
+
+from app.chunking import _normalize, chunk_page_text, chunk_pages
+from app.document_io import extract_pages_from_pdf
+from app.pdf_highlight import highlight_clauses_in_pdf
+
+CLAUSES = [
+    "The Consultant shall keep confidential all information received from the Company.",
+    "Either party may terminate this Agreement on thirty days written notice to the other.",
+]
+
+
+def _contract_pdf():
+    """Two clauses, the second hyphenated across a line break."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 100), CLAUSES[0], fontsize=9)
+    page.insert_text((72, 130), "Either party may terminate this Agree-", fontsize=9)
+    page.insert_text((72, 145), "ment on thirty days written notice to the other.", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _words_in(page, box):
+    rect = fitz.Rect(box)
+    return [w[4] for w in page.get_text("words") if fitz.Rect(w[:4]).intersects(rect)]
+
+
+def test_normalize_tracks_where_each_char_came_from():
+    text = "indemni-\n  fication   of\tthe Company"
+
+    normalized, offsets = _normalize(text, list(range(len(text))))
+
+    assert normalized == "indemnification of the Company"
+    assert len(offsets) == len(normalized)
+    assert all(text[src] == char for char, src in zip(normalized, offsets) if char != " ")
+
+
+def test_clauses_are_unchanged_by_word_boxes():
+    pages = extract_pages_from_pdf(_contract_pdf(), with_boxes=True)
+    plain = [dict(p, words=None) for p in pages]
+
+    with_boxes = chunk_pages(pages)
+
+    assert [c["clause_text"] for c in with_boxes] == [c["clause_text"] for c in chunk_pages(plain)]
+    assert [c["clause_text"] for c in with_boxes] == CLAUSES
+    assert all("boxes" not in c for c in chunk_pages(plain))
+
+
+def test_clause_boxes_cover_its_words_one_rectangle_per_line():
+    data = _contract_pdf()
+    (page,) = extract_pages_from_pdf(data, with_boxes=True)
+
+    first, second = chunk_page_text(page["text"], 1, page["words"])
+
+    assert len(first["boxes"]) == 1 and len(second["boxes"]) == 2
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        assert " ".join(_words_in(doc[0], first["boxes"][0])) == CLAUSES[0]
+        covered = [w for box in second["boxes"] for w in _words_in(doc[0], box)]
+    assert " ".join(covered) == "Either party may terminate this Agree- ment on thirty days written notice to the other."
+
+
+def test_highlights_are_drawn_from_boxes_and_fall_back_to_search():
+    data = _contract_pdf()
+    (page,) = extract_pages_from_pdf(data, with_boxes=True)
+    searched, boxed = chunk_page_text(page["text"], 1, page["words"])
+    searched.pop("boxes")
+    # a box the text search would never produce
+    boxed["boxes"] = [[300.0, 400.0, 350.0, 410.0]]
+
+    highlighted = highlight_clauses_in_pdf(data, [boxed, searched])
+
+    with fitz.open(stream=highlighted, filetype="pdf") as doc:
+        rects = [annot.rect for annot in doc[0].annots()]
+    assert len(rects) == 2
+    # highlight annotations pad their rectangle a little
+    box = fitz.Rect(boxed["boxes"][0])
+    assert rects[0].contains(box) and (box + (-5, -5, 5, 5)).contains(rects[0])
+    # the first line, found by searching for the clause text
+    assert 85 < rects[1].y0 < rects[1].y1 < 110
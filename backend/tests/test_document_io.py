@@ -0,0 +1,267 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from app import document_io
+from app.document_io import extract_pages_from_pdf
+
+LONG_TEXT = (
+    "The Consultant shall keep confidential all information disclosed by the "
+    "Company under this Agreement. Either party may terminate this Agreement on "
+    "thirty days written notice."
+)
+
+
+def _text_page(doc, text=LONG_TEXT):
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 540, 300), text, fontsize=11)
+    return page
+
+
+def _scanned_page(doc, text="SCANNED"):
+    """A page that only shows a picture of `text`, as a scanner produces."""
+    with fitz.open() as source:
+        _text_page(source, text)
+        pix = source[0].get_pixmap(dpi=50)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pix)
+    return page
+
+
+def _pdf(*kinds):
+    doc = fitz.open()
+    for kind in kinds:
+        if kind == "text":
+            _text_page(doc)
+        elif kind == "scan":
+            _scanned_page(doc)
+        elif kind == "text+image":
+            _scanned_page(doc)
+            doc[-1].insert_textbox(fitz.Rect(72, 400, 540, 600), LONG_TEXT, fontsize=11)
+        else:
+            doc.new_page()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """Inline OCR without tesseract or the OCR cache; records the pages read."""
+    calls = []
+
+    def ocr_doc_page(doc, page_no):
+        calls.append(page_no)
+        return f"Text recovered by OCR from page {page_no} of the scanned agreement, long enough to use."
+
+    monkeypatch.setattr(document_io, "_ocr_doc_page", ocr_doc_page)
+    monkeypatch.setattr(document_io, "_ocr_workers", 1)
+    monkeypatch.setattr(document_io, "_ocr_cache", None)
+    monkeypatch.setattr(document_io, "_ocr_cache_loaded", True)
+    return calls
+
+
+# ---------------------------------------
+# OCR routing
+# ---------------------------------------
+
+def test_only_scanned_pages_are_ocred(fake_ocr):
+    pages = extract_pages_from_pdf(_pdf("text", "scan", "blank", "text+image", "scan"))
+
+    # a blank page has nothing to read; a page with enough text keeps it
+    assert fake_ocr == [2, 5]
+    assert [p["page_no"] for p in pages] == [1, 2, 3, 4, 5]
+    assert pages[0]["text"].startswith("The Consultant") and pages[3]["text"].startswith("The Consultant")
+    assert pages[1]["text"].endswith("page 2 of the scanned agreement, long enough to use.")
+    assert pages[2]["text"] == ""
+    assert all("needs_ocr" not in p for p in pages)
+
+
+def test_text_documents_never_reach_ocr(fake_ocr, monkeypatch):
+    monkeypatch.setattr(document_io, "_extract_with_ocr", pytest.fail)
+    pages = extract_pages_from_pdf(_pdf("text", "text"))
+    assert [p["page_no"] for p in pages] == [1, 2] and fake_ocr == []
+
+
+def test_embedded_text_is_kept_when_ocr_recovers_less(fake_ocr, monkeypatch):
+    # route the text+image page to OCR, which then returns almost nothing
+    monkeypatch.setattr(document_io, "_ocr_doc_page", lambda doc, page_no: "x")
+    monkeypatch.setattr(
+        document_io, "_page_needs_ocr", lambda text, has_images: has_images and len(text) < 10_000
+    )
+
+    pages = extract_pages_from_pdf(_pdf("text+image"), with_boxes=True)
+
+    assert pages[0]["text"].startswith("The Consultant") and pages[0]["words"]
+
+
+# ---------------------------------------
+# OCR pool
+# ---------------------------------------
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    """The OCR pool on threads, so a patched _ocr_page is what workers run."""
+    pool = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(document_io, "_get_ocr_pool", lambda: pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_keeps_page_order_and_the_per_document_window(thread_pool, monkeypatch):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def ocr_page(path, page_no):
+        with lock:
+            running.append(page_no)
+            peak.append(len(running))
+        time.sleep(0.01 * (page_no % 3))
+        with lock:
+            running.remove(page_no)
+        return f"page {page_no}"
+
+    monkeypatch.setattr(document_io, "_ocr_page", ocr_page)
+
+    texts = document_io._ocr_in_pool("doc.pdf", [9, 2, 5, 7, 1, 4], window=2)
+
+    assert texts == ["page 9", "page 2", "page 5", "page 7", "page 1", "page 4"]
+    assert max(peak) == 2
+
+
+def test_pool_failure_propagates_and_cancels_queued_pages(thread_pool, monkeypatch):
+    started = []
+
+    def ocr_page(path, page_no):
+        started.append(page_no)
+        if page_no == 1:
+            raise RuntimeError("tesseract crashed")
+        return "ok"
+
+    monkeypatch.setattr(document_io, "_ocr_page", ocr_page)
+
+    with pytest.raises(RuntimeError, match="tesseract crashed"):
+        document_io._ocr_in_pool("doc.pdf", [1, 2, 3, 4, 5, 6], window=2)
+    assert len(started) < 6
+
+
+def test_in_memory_pdfs_reach_the_pool_through_a_temp_file(fake_ocr, thread_pool, monkeypatch):
+    seen = []
+
+    def ocr_page(path, page_no):
+        seen.append((path, os.path.exists(path)))
+        with fitz.open(path) as doc:
+            return f"Text recovered by OCR from page {page_no} of {doc.page_count}, long enough to use here."
+
+    monkeypatch.setattr(document_io, "_ocr_page", ocr_page)
+    monkeypatch.setattr(document_io, "_ocr_workers", 4)
+
+    pages = extract_pages_from_pdf(_pdf("scan", "text", "scan", "scan"))
+
+    for n in (1, 3, 4):
+        assert pages[n - 1]["text"].endswith(f"page {n} of 4, long enough to use here.")
+    assert fake_ocr == [] and all(exists for _, exists in seen)
+    assert not os.path.exists(seen[0][0])
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract is not installed")
+def test_spawned_pool_matches_inline_ocr(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_io, "_ocr_cache", None)
+    monkeypatch.setattr(document_io, "_ocr_cache_loaded", True)
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(_pdf("scan", "scan", "scan"))
+
+    document_io.set_ocr_workers(1)
+    inline = document_io._extract_with_ocr(str(path))
+    document_io.set_ocr_workers(2)
+    try:
+        pooled = document_io._extract_with_ocr(str(path))
+    finally:
+        document_io.set_ocr_workers(document_io.OCR_WORKERS)
+
+    assert pooled == inline and [p["page_no"] for p in pooled] == [1, 2, 3]
+
+
+# ---------------------------------------
+# Embedded text
+# ---------------------------------------
+
+def _placed_words_pdf(*placements):
+    """One page with each (x, y, text) drawn where given, in the order given."""
+    doc = fitz.open()
+    page = doc.new_page()
+    for x, y, text in placements:
+        page.insert_text((x, y), text, fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_lines_follow_the_page_not_the_drawing_order():
+    pdf = _placed_words_pdf(
+        (72, 160, "Second line of the clause."),
+        (110, 100, "the Company shall indemnify"),
+        (72, 101, "(i)"),  # a list marker set apart, a point lower
+    )
+
+    (page,) = document_io._extract_with_pymupdf(pdf)
+
+    assert page["text"] == "(i) the Company shall indemnify\nSecond line of the clause."
+    assert page["needs_ocr"] is False
+
+
+def test_paths_and_bytes_read_the_same(tmp_path):
+    data = _pdf("text", "blank", "scan")
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+
+    from_bytes = document_io._extract_with_pymupdf(data)
+
+    assert document_io._extract_with_pymupdf(str(path)) == from_bytes
+    assert [p["needs_ocr"] for p in from_bytes] == [False, False, True]
+
+
+def test_pymupdf_text_matches_pdfplumber():
+    pytest.importorskip("pdfplumber")
+    data = _pdf("text", "blank")
+
+    def words(pages):
+        return [p["text"].split() for p in pages]
+
+    assert words(document_io._extract_with_pymupdf(data)) == words(document_io._extract_with_pdfplumber(data))
+
+
+def test_the_other_engine_reads_what_the_first_cannot(monkeypatch):
+    pytest.importorskip("pdfplumber")
+
+    def broken(source, with_boxes=False):
+        raise RuntimeError("cannot parse")
+
+    monkeypatch.setattr(document_io, "_extract_with_pymupdf", broken)
+
+    pages = document_io._extract_embedded_text(_pdf("text"), with_boxes=True)
+
+    # pdfplumber has no word boxes
+    assert pages[0]["text"].startswith("The Consultant") and "words" not in pages[0]
+
+
+# ---------------------------------------
+# Word boxes
+# ---------------------------------------
+
+def test_word_boxes_index_the_page_text(fake_ocr):
+    pages = extract_pages_from_pdf(_pdf("text", "scan"), with_boxes=True)
+
+    text, words = pages[0]["text"], pages[0]["words"]
+    assert [text[start:end] for start, end, *_ in words] == text.split()
+    assert [line for *_, line in words] == sorted(line for *_, line in words)
+    for _, _, x0, y0, x1, y1, _ in words:
+        assert 72 <= x0 < x1 <= 540 and 72 <= y0 < y1 <= 300
+    # OCRed text has no boxes
+    assert "words" not in pages[1]
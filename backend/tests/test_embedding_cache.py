@@ -0,0 +1,89 @@
+import multiprocessing
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache, embedding_key
+
+DIM = 4
+
+
+def _vec(i: float) -> np.ndarray:
+    return np.full(DIM, i, dtype="float32")
+
+
+def _cache(tmp_path, max_entries=10, model_name="model-a"):
+    return EmbeddingCache(str(tmp_path / "emb"), model_name, DIM, max_entries)
+
+
+def test_round_trip_and_miss(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many(["alpha", "beta"], np.stack([_vec(1), _vec(2)]))
+
+    vecs, hit = cache.get_many(["beta", "gamma", "alpha"])
+
+    assert hit.tolist() == [True, False, True]
+    np.testing.assert_array_equal(vecs[0], _vec(2))
+    np.testing.assert_array_equal(vecs[2], _vec(1))
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_key_normalizes_whitespace_but_not_case():
+    assert embedding_key("a  b\n c", "m") == embedding_key("a b c", "m")
+    assert embedding_key("Term", "m") != embedding_key("term", "m")
+    assert embedding_key("a", "m1") != embedding_key("a", "m2")
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put_many(["a"], _vec(1)[None])
+    cache.put_many(["b"], _vec(2)[None])
+    cache.get_many(["a"])
+
+    cache.put_many(["c"], _vec(3)[None])
+
+    _, hit = cache.get_many(["a", "b", "c"])
+    assert hit.tolist() == [True, False, True]
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_instances_sharing_a_directory_see_each_other(tmp_path):
+    first, second = _cache(tmp_path), _cache(tmp_path)
+    first.put_many(["shared"], _vec(7)[None])
+
+    vecs, hit = second.get_many(["shared"])
+
+    assert hit.all()
+    np.testing.assert_array_equal(vecs[0], _vec(7))
+
+
+def test_other_model_misses(tmp_path):
+    _cache(tmp_path).put_many(["text"], _vec(1)[None])
+    _, hit = _cache(tmp_path, model_name="model-b").get_many(["text"])
+    assert not hit.any()
+
+
+def _writer(directory: str, worker: int):
+    cache = EmbeddingCache(directory, "model-a", DIM, 1000)
+    for i in range(20):
+        cache.put_many([f"w{worker}-{i}"], _vec(worker * 100 + i)[None])
+
+
+def test_concurrent_writers_keep_every_vector_under_its_key(tmp_path):
+    directory = str(tmp_path / "emb")
+    _cache(tmp_path, max_entries=1000)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_writer, args=(directory, w)) for w in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    cache = _cache(tmp_path, max_entries=1000)
+    texts = [f"w{w}-{i}" for w in range(3) for i in range(20)]
+    vecs, hit = cache.get_many(texts)
+
+    assert hit.all()
+    expected = np.stack([_vec(w * 100 + i) for w in range(3) for i in range(20)])
+    np.testing.assert_array_equal(vecs, expected)
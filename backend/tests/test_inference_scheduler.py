@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.inference_scheduler import MicroBatcher
+
+
+class Recorder:
+    """run_batch double: doubles each item and records the batches it saw."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail_on is not None and self.fail_on in items:
+            raise RuntimeError("model crashed")
+        return np.array([[2 * x] for x in items])
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def _make(run_batch, max_batch_size=4, max_wait_ms=1000):
+        b = MicroBatcher("test", run_batch, max_batch_size, max_wait_ms)
+        batchers.append(b)
+        return b
+
+    yield _make
+    for b in batchers:
+        b.close()
+
+
+def test_lone_request_is_split_into_full_batches(make_batcher):
+    run = Recorder()
+    batcher = make_batcher(run, max_batch_size=4, max_wait_ms=0)
+
+    out = batcher.submit(list(range(10))).result(5)
+
+    np.testing.assert_array_equal(out[:, 0], 2 * np.arange(10))
+    assert [len(b) for b in run.batches] == [4, 4, 2]
+
+
+def test_concurrent_requests_share_a_batch(make_batcher):
+    run = Recorder()
+    batcher = make_batcher(run, max_batch_size=4, max_wait_ms=5000)
+
+    first = batcher.submit([1, 2])
+    second = batcher.submit([3, 4])
+
+    np.testing.assert_array_equal(first.result(5)[:, 0], [2, 4])
+    np.testing.assert_array_equal(second.result(5)[:, 0], [6, 8])
+    assert run.batches == [[1, 2, 3, 4]]
+    stats = batcher.stats()
+    assert stats["requests"] == 2 and stats["batches"] == 1 and stats["avg_batch_size"] == 4.0
+
+
+def test_partial_batch_runs_after_max_wait(make_batcher):
+    run = Recorder()
+    batcher = make_batcher(run, max_batch_size=64, max_wait_ms=20)
+
+    np.testing.assert_array_equal(batcher.submit([5]).result(5)[:, 0], [10])
+    assert run.batches == [[5]]
+
+
+def test_failed_batch_fails_its_requests_and_drops_their_rest(make_batcher):
+    gate = threading.Event()
+    run = Recorder(fail_on=1)
+
+    def gated(items):
+        gate.wait(5)
+        return run(items)
+
+    batcher = make_batcher(gated, max_batch_size=2, max_wait_ms=0)
+    failing = batcher.submit([0, 1, 2, 3])
+    healthy = batcher.submit([7])
+    gate.set()
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        failing.result(5)
+    np.testing.assert_array_equal(healthy.result(5)[:, 0], [14])
+    assert [0, 1] in run.batches and [2, 3] not in run.batches
+    assert batcher.stats()["queued_items"] == 0
+
+
+def test_empty_request_and_closed_scheduler(make_batcher):
+    batcher = make_batcher(Recorder())
+    assert len(batcher.submit([]).result(1)) == 0
+
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit([1])
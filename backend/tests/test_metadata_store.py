@@ -0,0 +1,88 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app.metadata_store import MetadataStore
+
+RECORDS = [
+    {"label": "Non-Compete", "answer_text": "Shall not compete.", "source_title": "A"},
+    {"label": "termination", "answer_text": "May terminate on notice.", "source_title": ""},
+    {"label": "non compete", "answer_text": "", "source_title": "C"}
+]
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+
+def test_round_trip_with_interned_labels(tmp_path):
+    assert MetadataStore.write(RECORDS, str(tmp_path / "store")) == 3
+    store = MetadataStore(str(tmp_path / "store"))
+
+    assert len(store) == 3
+    assert store.label_names == ["non_compete", "termination"]
+    assert [store.label_id(i) for i in range(3)] == [0, 1, 0]
+    assert store[0] == {"label": "non_compete", "answer_text": "Shall not compete.", "source_title": "A"}
+    assert store.answer_text(2) == "" and store.source_title(1) == ""
+    assert store.id_for_label("Non Compete") == 0
+    assert store.id_for_label("unknown") is None
+
+
+def test_rewrite_leaves_no_staging_files_and_old_readers_keep_working(tmp_path):
+    directory = str(tmp_path / "store")
+    MetadataStore.write(RECORDS, directory)
+    old = MetadataStore(directory)
+
+    MetadataStore.write(RECORDS[:1], directory)
+
+    assert len(MetadataStore(directory)) == 1
+    assert old[1]["answer_text"] == "May terminate on notice."
+    assert sorted(os.listdir(tmp_path)) == ["store", "store.lock"]
+
+
+def test_load_rebuilds_only_when_jsonl_changes(tmp_path):
+    jsonl = tmp_path / "metadata.jsonl"
+    directory = str(tmp_path / "store")
+    _write_jsonl(jsonl, RECORDS)
+
+    assert len(MetadataStore.load(str(jsonl), directory)) == 3
+    built = os.stat(os.path.join(directory, "meta.json")).st_mtime_ns
+    assert len(MetadataStore.load(str(jsonl), directory)) == 3
+    assert os.stat(os.path.join(directory, "meta.json")).st_mtime_ns == built
+
+    _write_jsonl(jsonl, RECORDS[:2])
+    assert len(MetadataStore.load(str(jsonl), directory)) == 2
+
+
+def test_load_without_jsonl_or_store_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        MetadataStore.load(str(tmp_path / "missing.jsonl"), str(tmp_path / "store"))
+
+
+def _load_repeatedly(jsonl, directory, rounds):
+    for _ in range(rounds):
+        MetadataStore.from_jsonl(jsonl, directory)
+        store = MetadataStore.load(jsonl, directory)
+        assert [store[i]["label"] for i in range(len(store))] == ["non_compete", "termination", "non_compete"]
+
+
+def test_concurrent_rebuilds_never_expose_a_mixed_store(tmp_path):
+    jsonl = str(tmp_path / "metadata.jsonl")
+    directory = str(tmp_path / "store")
+    _write_jsonl(jsonl, RECORDS)
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_load_repeatedly, args=(jsonl, directory, 10)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(60)
+    assert [w.exitcode for w in workers] == [0, 0, 0]
+
+    store = MetadataStore(directory)
+    assert [store[i]["label"] for i in range(len(store))] == ["non_compete", "termination", "non_compete"]
+    assert sorted(os.listdir(tmp_path)) == ["metadata.jsonl", "store", "store.lock"]
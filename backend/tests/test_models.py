@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+import faiss  # noqa: E402
+
+from app import models  # noqa: E402
+from tests.conftest import REFERENCE_RECORDS, HashEmbedder  # noqa: E402
+
+
+@pytest.fixture
+def artifacts(monkeypatch, tmp_path):
+    """Reference artifacts on disk, laid out the way app.build_index writes them."""
+    embedder = HashEmbedder()
+    texts = [r["answer_text"] for r in REFERENCE_RECORDS]
+    primary = embedder.encode(texts)
+    index = faiss.IndexFlatIP(2 * embedder.dim)
+    index.add(np.hstack([primary, embedder.encode(["CONTEXT:\n" + t for t in texts])]))
+
+    faiss.write_index(index, str(tmp_path / "clauses.index"))
+    np.save(tmp_path / "primary_embs.npy", primary)
+    with open(tmp_path / "metadata.jsonl", "w", encoding="utf-8") as f:
+        for rec in REFERENCE_RECORDS:
+            f.write(json.dumps(rec) + "\n")
+
+    monkeypatch.setattr(models, "DEFAULT_FAISS_DIR", str(tmp_path))
+    monkeypatch.setattr(models, "FAISS_INDEX_PATH", str(tmp_path / "clauses.index"))
+    monkeypatch.setattr(models, "PRIMARY_EMBS_PATH", str(tmp_path / "primary_embs.npy"))
+    monkeypatch.setattr(models, "METADATA_PATH", str(tmp_path / "metadata.jsonl"))
+    monkeypatch.setattr(models, "METADATA_STORE_DIR", str(tmp_path / "metadata_store"))
+    monkeypatch.setattr(models, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    return primary
+
+
+# ---------------------------------------
+# Memory-mapped loading
+# ---------------------------------------
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_artifacts_load_with_and_without_mmap(artifacts, monkeypatch, mmap):
+    monkeypatch.setattr(models, "MMAP_ARTIFACTS", mmap)
+
+    paths = models.served_artifact_paths()
+    index = models._read_faiss_index(paths)
+    store, embs = models._read_metadata_and_embeddings(paths)
+
+    assert isinstance(embs, np.memmap) is mmap
+    np.testing.assert_array_equal(np.asarray(embs), artifacts)
+    assert index.ntotal == len(store) == len(REFERENCE_RECORDS)
+    assert [store[i]["label"] for i in range(len(store))] == [r["label"] for r in REFERENCE_RECORDS]
+
+    distances, ids = index.search(np.hstack([artifacts[:1], artifacts[:1]]), 1)
+    assert ids[0, 0] == 0
+
+
+def test_load_report_records_rss_around_each_artifact(monkeypatch):
+    monkeypatch.setattr(models, "load_report", [])
+    models._load_with_report("blob", lambda: bytearray(1 << 20))
+
+    (entry,) = models.load_report
+    assert entry["artifact"] == "blob"
+    assert entry["rss_before_mb"] > 0 and entry["rss_after_mb"] > 0
@@ -0,0 +1,121 @@
+import fitz
+import pytest
+
+from app import document_io
+from app.ocr_cache import OcrCache, page_key
+
+
+def _scan(doc, text, shift=0):
+    """Append a page showing a picture of `text`."""
+    with fitz.open() as source:
+        page = source.new_page()
+        page.insert_text((72, 100 + shift), text, fontsize=14)
+        pix = page.get_pixmap(dpi=40)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pix)
+
+
+def _keys(doc, scope="300"):
+    return [page_key(doc, page, scope) for page in doc]
+
+
+# ---------------------------------------
+# Page keys
+# ---------------------------------------
+
+def test_same_scan_has_the_same_key_in_any_document():
+    with fitz.open() as a, fitz.open() as b:
+        _scan(a, "EXHIBIT A")
+        _scan(a, "EXHIBIT B")
+        _scan(b, "COVER PAGE")
+        _scan(b, "EXHIBIT A")
+
+        assert _keys(a)[0] == _keys(b)[1]
+        assert len({*_keys(a), *_keys(b)}) == 3
+
+
+def test_key_changes_with_the_image_and_the_scope():
+    with fitz.open() as doc:
+        _scan(doc, "EXHIBIT A")
+        _scan(doc, "EXHIBIT A", shift=40)
+
+        assert _keys(doc)[0] != _keys(doc)[1]
+        assert _keys(doc, "300")[0] != _keys(doc, "200")[0]
+
+
+# ---------------------------------------
+# Store
+# ---------------------------------------
+
+def test_round_trip_is_shared_and_counted(tmp_path):
+    db_path = str(tmp_path / "ocr.sqlite")
+    OcrCache(db_path, max_bytes=1 << 20).put_many([("a", "text a"), ("b", "text b")])
+
+    cache = OcrCache(db_path, max_bytes=1 << 20)
+    assert cache.get_many(["a", "missing", "b"]) == {"a": "text a", "b": "text b"}
+    assert cache.get_many([]) == {}
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (2, 12, 2, 1)
+
+
+def test_least_recently_used_pages_are_evicted_by_size(tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"), max_bytes=25)
+    cache.put_many([("a", "x" * 10), ("b", "x" * 10)])
+    cache.get_many(["a"])
+
+    cache.put_many([("c", "é" * 5)])  # 10 bytes in UTF-8
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["bytes"] == 20 and cache.stats()["evictions"] == 1
+
+
+# ---------------------------------------
+# OCR through the cache
+# ---------------------------------------
+
+def test_cached_pages_are_not_ocred_again(tmp_path, monkeypatch):
+    calls = []
+
+    def ocr_doc_page(doc, page_no):
+        calls.append(page_no)
+        return f"raw\ntext of\npage {page_no}"
+
+    monkeypatch.setattr(document_io, "_ocr_doc_page", ocr_doc_page)
+    monkeypatch.setattr(document_io, "_ocr_workers", 1)
+    monkeypatch.setattr(document_io, "_ocr_cache_scope", "test")
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"), max_bytes=1 << 20)
+    monkeypatch.setattr(document_io, "_ocr_cache", cache)
+    monkeypatch.setattr(document_io, "_ocr_cache_loaded", True)
+
+    with fitz.open() as first, fitz.open() as second:
+        _scan(first, "EXHIBIT A")
+        _scan(first, "EXHIBIT B")
+        _scan(second, "EXHIBIT B")
+        _scan(second, "SIGNATURES")
+        pages = document_io._extract_with_ocr(first.tobytes())
+        again = document_io._extract_with_ocr(second.tobytes())
+
+    # the second document only OCRs its new page 2; its "EXHIBIT B" is cached
+    assert calls == [1, 2, 2]
+    # cached raw output is normalized on the way out, like fresh output
+    assert pages[1]["text"] == again[0]["text"] == "raw text of page 2"
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("pages", [[2], []])
+def test_only_requested_pages_are_looked_up(tmp_path, monkeypatch, pages):
+    monkeypatch.setattr(document_io, "_ocr_doc_page", lambda doc, page_no: f"page {page_no}")
+    monkeypatch.setattr(document_io, "_ocr_workers", 1)
+    monkeypatch.setattr(document_io, "_ocr_cache_scope", "test")
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"), max_bytes=1 << 20)
+    monkeypatch.setattr(document_io, "_ocr_cache", cache)
+    monkeypatch.setattr(document_io, "_ocr_cache_loaded", True)
+
+    with fitz.open() as doc:
+        _scan(doc, "ONE")
+        _scan(doc, "TWO")
+        result = document_io._extract_with_ocr(doc.tobytes(), pages)
+
+    assert [p["page_no"] for p in result] == pages
+    assert cache.stats()["entries"] == len(pages)
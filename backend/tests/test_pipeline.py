@@ -0,0 +1,109 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app import pipeline, scoring  # noqa: E402
+from tests.conftest import REFERENCE_RECORDS  # noqa: E402
+
+
+def _chunks(texts, page_no=1):
+    return [{"page_no": page_no, "clause_text": t, "boxes": None} for t in texts]
+
+
+REFERENCE_TEXTS = [r["answer_text"] for r in REFERENCE_RECORDS]
+# the second copy differs only in case, so analyze_clauses merges the two
+DOC_TEXTS = REFERENCE_TEXTS + [REFERENCE_TEXTS[2].upper(), "Unrelated boilerplate about notices."]
+
+
+@pytest.fixture
+def pipeline_models(scoring_models, monkeypatch):
+    monkeypatch.setattr(scoring, "TOP_K_RETRIEVAL", 3)
+    return scoring_models
+
+
+@pytest.fixture
+def batch_calls(monkeypatch):
+    calls = []
+    score = pipeline.score_clauses_batch
+
+    def counting(texts, progress=None):
+        calls.append(list(texts))
+        return score(texts, progress=progress)
+
+    monkeypatch.setattr(pipeline, "score_clauses_batch", counting)
+    return calls
+
+
+def _by_text(clauses):
+    return sorted(clauses, key=lambda c: c["clause_text"])
+
+
+# ---------------------------------------
+# Streaming
+# ---------------------------------------
+
+def test_streamed_clauses_match_analyze_clauses(pipeline_models, batch_calls):
+    chunks = _chunks(DOC_TEXTS)
+    expected = pipeline.analyze_clauses(chunks)
+    assert expected, "the reference clauses should come out risky"
+
+    batch_calls.clear()
+    streamed = list(pipeline.iter_analyze_clauses(chunks, block_size=2))
+
+    assert _by_text(streamed) == _by_text(expected)
+    assert len(batch_calls) > 1 and max(len(c) for c in batch_calls) <= 3
+
+
+def test_stream_events_end_with_the_document_summary(pipeline_models, monkeypatch):
+    pages = [{"page_no": 1, "text": "", "words": None}]
+    monkeypatch.setattr(pipeline, "extract_pages_from_pdf", lambda pdf, with_boxes=True: pages)
+    monkeypatch.setattr(pipeline, "chunk_pages", lambda pages: _chunks(DOC_TEXTS))
+
+    events = list(pipeline.analyze_document_stream(b"%PDF", block_size=2))
+    full = pipeline.analyze_document(b"%PDF")
+
+    # deduplicate_chunks drops the upper-case copy
+    assert events[0] == {"event": "start", "pages": 1, "chunks": len(DOC_TEXTS) - 1}
+    clauses = [e["clause"] for e in events[1:-1]]
+    assert {e["event"] for e in events[1:-1]} == {"clause"}
+    assert _by_text(clauses) == _by_text(full["clauses"])
+    summary = dict(events[-1])
+    assert summary.pop("event") == "summary"
+    assert summary == {k: full[k] for k in ("document_risk", "doc_score", "label_summary")}
+    emitted = []
+    pipeline.emit_document_events(b"%PDF", emitted.append)
+    assert emitted == events
+
+
+# ---------------------------------------
+# Batches of documents
+# ---------------------------------------
+
+def test_documents_are_scored_in_one_deduplicated_pass(pipeline_models, batch_calls):
+    docs = [_chunks(REFERENCE_TEXTS[:3]), _chunks(REFERENCE_TEXTS[1:], page_no=2)]
+    expected = []
+    for chunks in docs:
+        clauses = pipeline.analyze_clauses(chunks)
+        expected.append({**pipeline.summarize_document(clauses), "clauses": clauses})
+
+    batch_calls.clear()
+    results = pipeline.analyze_chunked_documents(docs)
+
+    assert results == expected
+    assert batch_calls == [REFERENCE_TEXTS]
+
+
+def test_a_document_that_fails_extraction_keeps_its_slot(pipeline_models, monkeypatch):
+    def extract(pdf, with_boxes=True):
+        if pdf == b"broken":
+            raise ValueError("not a PDF")
+        return [{"page_no": 1, "text": "", "words": None}]
+
+    monkeypatch.setattr(pipeline, "extract_pages_from_pdf", extract)
+    monkeypatch.setattr(pipeline, "chunk_pages", lambda pages: _chunks(REFERENCE_TEXTS))
+
+    good, bad = pipeline.analyze_documents([b"%PDF", b"broken"])
+
+    assert good == pipeline.analyze_document(b"%PDF")
+    assert bad == {"error": "Failed to process document: not a PDF"}
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+
+from app.rerank_cache import RerankScoreCache, clause_key
+
+
+def test_clause_key_keeps_case_and_normalizes_whitespace():
+    assert clause_key("The  Company\n shall ") == clause_key("The Company shall")
+    assert clause_key("The Company") != clause_key("the company")
+
+
+def test_memory_round_trip_is_scoped_by_namespace():
+    cache = RerankScoreCache("ce", max_entries=10)
+    cache.put_many([("fp", 1), ("fp", 2)], np.array([0.5, -1.0]), namespace="ref-a")
+
+    scores, hit = cache.get_many([("fp", 2), ("fp", 3)], namespace="ref-a")
+    assert hit.tolist() == [True, False]
+    assert scores[0] == -1.0
+
+    _, hit = cache.get_many([("fp", 2)], namespace="ref-b")
+    assert not hit.any()
+
+
+def test_memory_tier_is_bounded():
+    cache = RerankScoreCache("ce", max_entries=2)
+    cache.put_many([("a", 1), ("b", 1), ("c", 1)], np.array([1.0, 2.0, 3.0]))
+    _, hit = cache.get_many([("a", 1), ("b", 1), ("c", 1)])
+    assert hit.tolist() == [False, True, True]
+
+
+def test_sqlite_tier_survives_restart_and_is_shared(tmp_path):
+    db_path = str(tmp_path / "rerank.sqlite")
+    RerankScoreCache("ce", 10, db_path=db_path).put_many([("fp", 7)], np.array([2.5]), namespace="r")
+
+    other = RerankScoreCache("ce", 10, db_path=db_path)
+    scores, hit = other.get_many([("fp", 7)], namespace="r")
+    assert hit.all() and scores[0] == 2.5
+
+    _, hit = RerankScoreCache("other-ce", 10, db_path=db_path).get_many([("fp", 7)], namespace="r")
+    assert not hit.any()
+
+
+def test_sqlite_tier_is_bounded(tmp_path):
+    cache = RerankScoreCache("ce", 1, db_path=str(tmp_path / "r.sqlite"), db_max_entries=2)
+    for i in range(4):
+        cache.put_many([("fp", i)], np.array([float(i)]))
+    fresh = RerankScoreCache("ce", 1, db_path=str(tmp_path / "r.sqlite"))
+    _, hit = fresh.get_many([("fp", i) for i in range(4)])
+    assert hit.tolist() == [False, False, True, True]
+
+
+def test_concurrent_threads(tmp_path):
+    cache = RerankScoreCache("ce", 1000, db_path=str(tmp_path / "r.sqlite"))
+    errors = []
+
+    def worker(w):
+        try:
+            keys = [(f"w{w}", i) for i in range(50)]
+            cache.put_many(keys, np.arange(50, dtype="float32") + w)
+            scores, hit = cache.get_many(keys)
+            assert hit.all()
+            np.testing.assert_array_equal(scores, np.arange(50, dtype="float32") + w)
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
@@ -0,0 +1,46 @@
+import pytest
+
+from app import config, result_cache
+from app.result_cache import ResultCache, result_key
+
+
+@pytest.fixture
+def fresh_key(monkeypatch):
+    """result_key recomputing its fingerprint after each patch."""
+    def key(*args):
+        monkeypatch.setattr(result_cache, "_static_fingerprint", None)
+        return result_key(*args)
+    return key
+
+
+@pytest.mark.parametrize("module, name, value", [
+    (result_cache, "RESULT_VERSION", result_cache.RESULT_VERSION + 1),
+    (config, "EMBED_MODEL_NAME", "another-embedder"),
+    (config, "RERANKER_MODEL_NAME", "another-reranker"),
+    (config, "WEIGHTS", {"identity": 1.0}),
+    (config, "OCR_RESOLUTION", 150)
+])
+def test_version_and_result_config_change_the_key(monkeypatch, fresh_key, module, name, value):
+    before = fresh_key("sha", "ref", 1)
+    monkeypatch.setattr(module, name, value)
+    assert fresh_key("sha", "ref", 1) != before
+
+
+def test_key_follows_the_pdf_and_the_reference_set(fresh_key):
+    key = fresh_key("sha", "ref", 1)
+    assert fresh_key("sha", "ref", 1) == key
+    assert len({key, fresh_key("other", "ref", 1), fresh_key("sha", "other", 1), fresh_key("sha", "ref", 2)}) == 4
+
+
+def test_results_survive_reopening_and_stay_bounded(tmp_path):
+    db_path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(db_path, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, {"doc_score": key})
+    assert cache.get("a") == {"doc_score": "a"}
+    cache.put("c", {"doc_score": "c"})
+
+    reopened = ResultCache(db_path, max_entries=2)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == {"doc_score": "a"} and reopened.get("c") == {"doc_score": "c"}
+    assert reopened.stats()["entries"] == 2 and reopened.stats()["hits"] == 2
@@ -0,0 +1,258 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app import scoring  # noqa: E402
+
+LONG_CLAUSE = (
+    "The Consultant shall not, during the term of this Agreement and for twelve months "
+    "thereafter, directly or indirectly compete with the Company or solicit any of its "
+    "employees, customers or suppliers, whether as owner, partner, employee or consultant, "
+    "anywhere in the territory in which the Company does business, nor induce any person "
+    "to terminate or adversely modify their relationship with the Company, except with the "
+    "prior written consent of the Board."
+)
+SHORT_CLAUSE = "Either party may terminate this Agreement upon thirty days notice."
+
+
+# ---------------------------------------
+# Probe planning and batched embedding
+# ---------------------------------------
+
+def test_plan_probes_offsets_cover_each_clause():
+    texts = [SHORT_CLAUSE, LONG_CLAUSE, "Short."]
+    probes, offsets = scoring._plan_probes(texts)
+
+    assert offsets[0] == 0 and offsets[-1] == len(probes)
+    for qi, text in enumerate(texts):
+        assert probes[offsets[qi]:offsets[qi + 1]] == scoring._make_subclauses(text)
+    assert offsets[2] - offsets[1] > 1
+
+
+def test_encode_sorted_keeps_input_order(scoring_models):
+    embedder = scoring_models.embedder
+    texts = [LONG_CLAUSE, "b", SHORT_CLAUSE, "ccc", "dd"]
+
+    out = scoring._encode_sorted(texts, batch_size=2)
+
+    np.testing.assert_array_equal(out, np.stack([embedder.vector(t) for t in texts]))
+    # one length-sorted pass, in batches of at most batch_size
+    assert [len(c) for c in embedder.calls] == [2, 2, 1]
+    lengths = [len(t) for call in embedder.calls for t in call]
+    assert lengths == sorted(lengths)
+
+
+def test_embed_document_matches_embed_clause(scoring_models):
+    texts = [LONG_CLAUSE, SHORT_CLAUSE]
+    dim = scoring_models.embedder.dim
+
+    primary, probe_vecs, offsets = scoring.embed_document(texts)
+
+    for qi, text in enumerate(texts):
+        expected = scoring.embed_clause(text)
+        np.testing.assert_allclose(primary[qi], expected[0, :dim])
+        probes = scoring._make_subclauses(text)
+        assert offsets[qi + 1] - offsets[qi] == len(probes)
+        np.testing.assert_allclose(
+            probe_vecs[offsets[qi]],
+            np.hstack([scoring_models.embedder.vector(probes[0]), scoring_models.embedder.vector("CONTEXT:\n" + probes[0])])
+        )
+
+
+# ---------------------------------------
+# Blocked FAISS retrieval
+# ---------------------------------------
+
+def test_retrieve_candidates_matches_per_probe_search(scoring_models, monkeypatch):
+    monkeypatch.setattr(scoring, "FAISS_SEARCH_BLOCK", 2)
+    texts = [LONG_CLAUSE, SHORT_CLAUSE, "The Company shall indemnify the Consultant."]
+    _, probe_vecs, offsets = scoring.embed_document(texts)
+    index = scoring_models.reference.faiss_index
+
+    candidates = scoring.retrieve_candidates(probe_vecs, offsets)
+
+    for qi in range(len(texts)):
+        expected = set()
+        for p in range(offsets[qi], offsets[qi + 1]):
+            _, I = index.search(probe_vecs[p:p + 1], scoring.TOP_K_RETRIEVAL)
+            expected.update(int(i) for i in I[0] if i >= 0)
+        assert candidates[qi].tolist() == sorted(expected)
+
+
+def test_retrieve_candidates_without_probes():
+    offsets = np.zeros(3, dtype=np.int64)
+    out = scoring.retrieve_candidates(np.empty((0, 4), dtype="float32"), offsets, ref=object())
+    assert [c.tolist() for c in out] == [[], []]
+
+
+# ---------------------------------------
+# One embedding per distinct string
+# ---------------------------------------
+
+def test_short_clause_is_embedded_once(scoring_models):
+    embedder = scoring_models.embedder
+
+    scoring.embed_document([SHORT_CLAUSE, SHORT_CLAUSE])
+
+    embedded = [t for call in embedder.calls for t in call]
+    # the clause doubles as its own only probe: one primary, one CONTEXT: vector
+    assert sorted(embedded) == sorted([SHORT_CLAUSE, "CONTEXT:\n" + SHORT_CLAUSE])
+
+
+def test_encode_unique_expands_duplicates(scoring_models):
+    texts = ["a", "b", "a", "c", "b"]
+    out = scoring._encode_unique(texts)
+
+    assert len([t for call in scoring_models.embedder.calls for t in call]) == 3
+    np.testing.assert_array_equal(out[0], out[2])
+    np.testing.assert_array_equal(out[1], out[4])
+
+
+def test_encode_unique_serves_repeats_from_embedding_cache(scoring_models, monkeypatch, tmp_path):
+    from app.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path / "emb"), "test-model", scoring_models.embedder.dim, 100)
+    monkeypatch.setattr(scoring_models.models, "embedding_cache", cache)
+
+    first = scoring._encode_unique(["a", "b"])
+    calls = len(scoring_models.embedder.calls)
+    second = scoring._encode_unique(["b", "a"])
+
+    assert len(scoring_models.embedder.calls) == calls
+    np.testing.assert_array_equal(second, first[::-1])
+
+
+# ---------------------------------------
+# Rerank score cache
+# ---------------------------------------
+
+def test_rerank_cache_does_not_mix_case_variants(scoring_models, monkeypatch):
+    from app.rerank_cache import RerankScoreCache
+
+    monkeypatch.setattr(scoring_models.models, "rerank_cache", RerankScoreCache("ce", 100))
+    upper = "The Company shall indemnify the Consultant."
+    lower = upper.lower()
+    idx_map = [(0, 1), (0, 2)]
+
+    cold = scoring._rerank_pairs([upper], idx_map)
+    cased = scoring._rerank_pairs([lower], idx_map)
+    warm = scoring._rerank_pairs([upper], idx_map)
+
+    direct = scoring_models.reranker.predict
+    np.testing.assert_array_equal(cased, direct([[lower, scoring_models.reference.metadata.answer_text(i)] for _, i in idx_map]))
+    np.testing.assert_array_equal(warm, cold)
+    assert len(scoring_models.reranker.calls) == 3  # two misses + the direct check
+
+
+# ---------------------------------------
+# Identity scoring
+# ---------------------------------------
+
+def _primary_embs_file(tmp_path, n, dim=8):
+    rng = np.random.default_rng(0)
+    embs = rng.standard_normal((n, dim)).astype("float32")
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    path = tmp_path / "primary_embs.npy"
+    np.save(path, embs)
+    return np.load(path, mmap_mode="r")
+
+
+def test_auto_identity_backend_follows_threshold_when_memory_mapped(scoring_models, monkeypatch, tmp_path):
+    models = scoring_models.models
+    embs = _primary_embs_file(tmp_path, 50)
+    monkeypatch.setattr(models, "IDENTITY_INDEX", "auto")
+
+    monkeypatch.setattr(models, "IDENTITY_MATMUL_MAX_REFS", 100)
+    assert models._make_identity_index(embs) is None
+
+    monkeypatch.setattr(models, "IDENTITY_MATMUL_MAX_REFS", 10)
+    monkeypatch.setattr(models, "IDENTITY_BLOCK_ROWS", 16)
+    index = models._make_identity_index(embs)
+    assert index is not None and index.ntotal == 50
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_identity_index_matches_blocked_matmul(scoring_models, monkeypatch, tmp_path, kind):
+    models = scoring_models.models
+    embs = _primary_embs_file(tmp_path, 200)
+    queries = np.ascontiguousarray(embs[::7] + 0.01, dtype="float32")
+    monkeypatch.setattr(scoring, "IDENTITY_BLOCK_ROWS", 64)
+    monkeypatch.setattr(models, "IDENTITY_INDEX", kind)
+
+    blocked = scoring.compute_identity_scores(queries, models.ReferenceSet(None, embs, None, None, None))
+    indexed = scoring.compute_identity_scores(
+        queries, models.ReferenceSet(None, embs, None, models._make_identity_index(embs), None)
+    )
+
+    np.testing.assert_allclose(indexed, (queries @ np.asarray(embs).T).max(axis=1), rtol=1e-5)
+    np.testing.assert_allclose(blocked, indexed, rtol=1e-5)
+
+
+# ---------------------------------------
+# Single-clause scoring
+# ---------------------------------------
+
+def test_score_clause_matches_batch_and_ignores_legacy_globals(scoring_models, monkeypatch):
+    models = scoring_models.models
+    monkeypatch.setattr(scoring, "TOP_K_RETRIEVAL", 3)
+    for name in ("faiss_index", "primary_embs", "metadata", "identity_index"):
+        monkeypatch.setattr(models, name, None)
+
+    single = scoring.score_clause(SHORT_CLAUSE)
+    (batch,) = scoring.score_clauses_batch([SHORT_CLAUSE])
+
+    assert single["top_matches"] == batch["top_matches"]
+    assert single["final_score"] == pytest.approx(batch["final_score"])
+    assert single["label_names"][single["top_matches"][0]["label_id"]] == "termination"
+
+
+def test_score_clause_keeps_its_reference_across_a_hot_swap(scoring_models, monkeypatch, tmp_path):
+    from tests.conftest import make_reference
+
+    models = scoring_models.models
+    monkeypatch.setattr(scoring, "TOP_K_RETRIEVAL", 3)
+    swapped = make_reference(
+        models, scoring_models.embedder, tmp_path / "swapped",
+        records=[{"label": "other", "answer_text": "Unrelated text.", "source_title": "Z"}] * 4,
+        manifest={"reference_id": "test-ref-2", "generation": 2}
+    )
+    predict = scoring_models.reranker.predict
+
+    def predict_then_swap(pairs, batch_size=32):
+        models._publish_reference(swapped)
+        return predict(pairs, batch_size)
+
+    monkeypatch.setattr(scoring_models.reranker, "predict", predict_then_swap)
+    out = scoring.score_clause(SHORT_CLAUSE)
+
+    assert models.reference is swapped
+    assert out["label_names"] is scoring_models.reference.metadata.label_names
+    assert out["label_names"][out["top_matches"][0]["label_id"]] == "termination"
+
+
+# ---------------------------------------
+# Inference scheduler
+# ---------------------------------------
+
+def test_scores_are_unchanged_behind_the_inference_schedulers(scoring_models, monkeypatch):
+    models = scoring_models.models
+    monkeypatch.setattr(scoring, "TOP_K_RETRIEVAL", 3)
+    texts = [LONG_CLAUSE, SHORT_CLAUSE]
+    direct = scoring.score_clauses_batch(texts)
+
+    monkeypatch.setattr(models, "INFERENCE_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(models, "INFERENCE_MAX_WAIT_MS", 0)
+    models.load_inference_schedulers()
+    try:
+        batched = scoring.score_clauses_batch(texts)
+        assert models.embed_scheduler.stats()["requests"] >= 1
+        assert models.rerank_scheduler.stats()["requests"] >= 1
+    finally:
+        models.embed_scheduler.close()
+        models.rerank_scheduler.close()
+
+    for a, b in zip(direct, batched):
+        assert [m["index_id"] for m in a["top_matches"]] == [m["index_id"] for m in b["top_matches"]]
+        assert a["final_score"] == pytest.approx(b["final_score"], abs=1e-6)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.exceptions import InvalidFileError
+from app.uploads import spool_multipart_files
+
+BOUNDARY = "testboundary"
+MB = 1024 * 1024
+
+
+def _part(field, filename, data):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + b"\r\n"
+
+
+def _body(*parts):
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _check_pdf(name, limit=MB):
+    if not name.endswith(".pdf"):
+        raise InvalidFileError("Only PDF files are supported")
+    return ".pdf", limit
+
+
+def _spool(body, tmp_path, check=_check_pdf, body_limit=10 * MB, max_files=1, received=None):
+    """Feed `body` through a Starlette request in 64KB messages, logging each read in `received`."""
+    chunks = [body[i:i + 64 * 1024] for i in range(0, len(body), 64 * 1024)]
+    received = [] if received is None else received
+
+    async def receive():
+        received.append(None)
+        if len(received) > len(chunks):
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": chunks[len(received) - 1], "more_body": len(received) < len(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/upload",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    }
+    request = Request(scope, receive)
+    return asyncio.run(spool_multipart_files(request, "file", check, body_limit, max_files, str(tmp_path)))
+
+
+def test_file_parts_land_in_one_spool_file_each(tmp_path):
+    data = bytes(range(256)) * 1000
+    body = _body(
+        _part("note", "ignored.txt", b"other field"),
+        _part("file", "a.pdf", data),
+        _part("file", "b.pdf", b"second")
+    )
+
+    a, b = _spool(body, tmp_path, max_files=2)
+
+    assert (a.filename, a.size, a.sha256) == ("a.pdf", len(data), hashlib.sha256(data).hexdigest())
+    assert open(a.path, "rb").read() == data and open(b.path, "rb").read() == b"second"
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([a.path.split("/")[-1], b.path.split("/")[-1]])
+
+
+def test_oversized_file_is_refused_before_the_body_ends(tmp_path):
+    body = _body(_part("file", "a.pdf", b"x" * (4 * MB)))
+    received = []
+
+    with pytest.raises(HTTPException) as excinfo:
+        _spool(body, tmp_path, check=lambda name: _check_pdf(name, limit=MB), received=received)
+
+    assert excinfo.value.status_code == 413 and "a.pdf" in excinfo.value.detail
+    assert len(received) <= MB // (64 * 1024) + 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_chunked_body_over_the_limit_stops_receiving(tmp_path):
+    body = _body(_part("file", "a.pdf", b"x" * (4 * MB)))
+    received = []
+
+    # the per-file limit is generous; only the body limit can stop this one
+    with pytest.raises(HTTPException) as excinfo:
+        _spool(body, tmp_path, check=lambda name: _check_pdf(name, limit=8 * MB), body_limit=MB, received=received)
+
+    assert excinfo.value.status_code == 413 and excinfo.value.detail.startswith("Request too large")
+    assert len(received) <= MB // (64 * 1024) + 1
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (_body(_part("file", "a.docx", b"data")), "Only PDF"),
+        (_body(_part("file", "a.pdf", b"")), "empty file"),
+        (_body(_part("other", "a.pdf", b"data")), "No file uploaded"),
+        (_body(_part("file", "a.pdf", b"1"), _part("file", "b.pdf", b"2")), "Too many files"),
+        (_part("file", "a.pdf", b"x" * 1000), "Incomplete")
+    ]
+)
+def test_invalid_uploads_leave_nothing_behind(tmp_path, body, message):
+    with pytest.raises(InvalidFileError, match=message):
+        _spool(body, tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from app.exceptions import ConfigurationError, ServiceBusyError
+from app.worker_pool import AnalysisPool, _timed_call
+
+
+@pytest.fixture
+def pool():
+    p = AnalysisPool("thread", workers=2, max_queue=1)
+    yield p
+    p.shutdown()
+
+
+def test_admits_workers_plus_queue_then_rejects(pool):
+    release = threading.Event()
+    futures = [pool.submit(release.wait) for _ in range(3)]
+
+    with pytest.raises(ServiceBusyError) as excinfo:
+        pool.submit(release.wait)
+    assert excinfo.value.retry_after >= 1
+    stats = pool.stats()
+    assert stats["in_flight"] == 3 and stats["queue_depth"] == 1 and stats["rejected"] == 1
+
+    release.set()
+    assert [f.result(5) for f in futures] == [True, True, True]
+    assert pool.stats()["in_flight"] == 0 and pool.stats()["completed"] == 3
+    assert pool.submit(lambda: "again").result(5) == "again"
+
+
+def test_failures_free_their_slot_and_propagate(pool):
+    def boom():
+        raise ValueError("bad document")
+
+    with pytest.raises(ValueError, match="bad document"):
+        pool.submit(boom).result(5)
+    stats = pool.stats()
+    assert stats["failed"] == 1 and stats["in_flight"] == 0
+
+
+def test_stats_are_one_consistent_snapshot():
+    p = AnalysisPool("thread", workers=4, max_queue=4)
+    snapshots = []
+    done = threading.Event()
+
+    def poll():
+        while not done.is_set():
+            snapshots.append(p.stats())
+
+    def task(i):
+        if i % 3 == 0:
+            raise ValueError("bad document")
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    try:
+        for i in range(300):
+            try:
+                p.submit(task, i)
+            except ServiceBusyError:
+                pass
+    finally:
+        done.set()
+        poller.join(5)
+        p.shutdown()
+
+    snapshots.append(p.stats())
+    assert snapshots[-1]["submitted"] + snapshots[-1]["rejected"] == 300
+    for s in snapshots:
+        assert s["submitted"] == s["in_flight"] + s["completed"] + s["failed"]
+
+
+def test_run_awaits_without_blocking_the_loop(pool):
+    async def main():
+        ticks = 0
+        task = asyncio.ensure_future(pool.run(sum, [1, 2, 3]))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0)
+        return await task, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result == 6 and ticks >= 1
+
+
+def test_process_workers_are_spawned_not_forked():
+    p = AnalysisPool("process", workers=1, max_queue=0)
+    try:
+        assert p._executor._mp_context.get_start_method() == "spawn"
+    finally:
+        p.shutdown()
+
+
+def _report_stages(name, progress):
+    for stage in ("extract", "embed"):
+        progress(stage, "running")
+        progress(stage, "done")
+    return name
+
+
+def test_thread_workers_call_callbacks_directly(pool):
+    calls = []
+    future = pool.submit(_report_stages, "doc", callbacks={"progress": lambda *args: calls.append(args)})
+
+    assert future.result(5) == "doc"
+    assert calls == [("extract", "running"), ("extract", "done"), ("embed", "running"), ("embed", "done")]
+
+
+def test_process_callbacks_are_relayed_before_the_result():
+    p = AnalysisPool("process", workers=2, max_queue=2)
+    # Same pool, minus the model loading its workers would do
+    p._executor.shutdown()
+    p._executor = ProcessPoolExecutor(max_workers=2, mp_context=p._mp_context)
+    p._call = _timed_call
+    calls = {"a": [], "b": []}
+    seen_at_result = {}
+
+    def submit(name):
+        future = p.submit(
+            _report_stages, name,
+            callbacks={"progress": lambda *args: calls[name].append((threading.current_thread().name, args))}
+        )
+        future.add_done_callback(lambda f: seen_at_result.update({name: len(calls[name])}))
+        return future
+
+    try:
+        futures = [submit("a"), submit("b")]
+        assert [f.result(60) for f in futures] == ["a", "b"]
+    finally:
+        p.shutdown()
+
+    for name in ("a", "b"):
+        assert [args for _, args in calls[name]] == [
+            ("extract", "running"), ("extract", "done"), ("embed", "running"), ("embed", "done")
+        ]
+        assert {thread for thread, _ in calls[name]} == {"analysis-relay"}
+        assert seen_at_result[name] == 4
+
+
+@pytest.mark.parametrize("kind, workers", [("fiber", 1), ("thread", 0)])
+def test_rejects_bad_configuration(kind, workers):
+    with pytest.raises(ConfigurationError):
+        AnalysisPool(kind, workers, 0)